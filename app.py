@@ -7,7 +7,7 @@ from config.styles import CSS_STYLES
 from config.settings import PAGE_CONFIG
 from utils.dependencies import PDF_AVAILABLE
 from components.sidebar import render_file_type_sidebar, render_tools_sidebar
-from components.file_list import render_file_list
+from components.file_list import render_paginated_file_list
 from components.file_upload import render_upload_section
 from components.file_preview import render_file_preview_modal
 from components.industry_view import render_industry_view, render_industry_view_sidebar
@@ -271,56 +271,24 @@ else:
     # File list area
     st.markdown(f"### 📁 {get_text('my_files')}")
 
-    # Get files in current folder
+    # Get files in current folder (one page at a time; the file type filter is applied in SQL)
     current_folder_id = st.session_state.current_folder_id
-    files = storage_manager.get_files(current_folder_id)
+    selected_file_type = st.session_state.get('selected_file_type')
 
-    print(f"[DEBUG] app.py: current_folder_id={current_folder_id}, selected_file_type={st.session_state.get('selected_file_type')}, files_count={len(files)}")
-    if files:
-        print(f"[DEBUG] app.py: Sample files - {[(f['id'], f['filename'], f['file_type']) for f in files[:3]]}")
-    else:
-        print(f"[DEBUG] app.py: No files found! Checking database...")
-        # Debug: Check if files exist in database
-        import sqlite3
-        conn = sqlite3.connect(storage_manager.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT COUNT(*) FROM files WHERE folder_id IS NULL')
-        total_count = cursor.fetchone()[0]
-        print(f"[DEBUG] app.py: Total files in database (folder_id IS NULL): {total_count}")
-        conn.close()
-
-    # Filter by file type (only if a filter is selected)
-    if st.session_state.get('selected_file_type'):
-        print(f"[DEBUG] app.py: Filtering by file type: {st.session_state.selected_file_type}")
-        filtered_files = []
-        for file in files:
-            file_type = file.get('file_type', 'unknown')
-            filename = file.get('filename', '')
-            
-            if st.session_state.selected_file_type == 'image' and file_type == 'image':
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'application' and file_type == 'application':
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'excel' and filename.endswith(('.xlsx', '.xls', '.csv')):
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'text' and file_type == 'text':
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'video' and file_type == 'video':
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'audio' and file_type == 'audio':
-                filtered_files.append(file)
-            elif st.session_state.selected_file_type == 'unknown' and file_type == 'unknown':
-                filtered_files.append(file)
-        
-        print(f"[DEBUG] app.py: After filtering: {len(filtered_files)} files")
-        files = filtered_files
+    def fetch_home_page(cursor):
+        return storage_manager.get_files_page(
+            current_folder_id, cursor=cursor, file_type=selected_file_type, count_mode="estimate"
+        )
 
-    # Display file list
-    if files:
-        render_file_list(storage_manager, files, st.session_state.view_mode)
-    else:
-        st.info(f"📁 {get_text('no_files_yet')}")
+    page = render_paginated_file_list(
+        storage_manager,
+        fetch_home_page,
+        st.session_state.view_mode,
+        key=f"home_{current_folder_id}_{selected_file_type}"
+    )
+    print(f"[DEBUG] app.py: current_folder_id={current_folder_id}, selected_file_type={selected_file_type}, page_files={len(page['files'])}, has_more={page['has_more']}")
 
     # Bottom information
     st.markdown("---")
-    st.caption(f"💾 {get_text('total_files').format(len(files))}")
+    total = page['total'] if page['total_is_exact'] else f"{page['total']}+"
+    st.caption(f"💾 {get_text('total_files').format(total)}")
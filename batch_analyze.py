@@ -0,0 +1,144 @@
+"""批量分析命令行工具 - 不经过界面，用多进程对大量文件做本地分析（夜间批量重建索引）
+
+每个工作进程在启动时创建一个 CloudStorageManager（只加载一次分类模型与OCR），
+并行执行文本提取、OCR、行业分类与关键短语提取；主进程收集结果，
+每 --batch-size 条在一个事务中写入 ai_analysis 表与分析缓存。
+不调用DeepSeek：结果与界面中未配置API时的本地分析相同。
+
+OCR进程池与内存预算是每个进程各自一份：并行度由 --workers 决定，每个工作进程的OCR进程池
+固定为1个工作进程（OCR_POOL_WORKERS=1），OCR_MEMORY_BUDGET_MB 由各工作进程平分。
+
+用法（在应用目录下运行，与 app.py 使用同一个 cloud_storage 数据库）:
+    python batch_analyze.py                          # 所有尚未分析的文件
+    python batch_analyze.py --all --type image       # 重新分析全部图片
+    python batch_analyze.py --folder-id 3 --since 2024-01-01 --until 2024-06-30
+    python batch_analyze.py --workers 8 --batch-size 100 --limit 5000
+    python batch_analyze.py --dry-run                # 只列出将要分析的文件
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+from core.storage_manager import CloudStorageManager
+from utils.ocr_manager import DEFAULT_OCR_MEMORY_BUDGET_MB, PAGE_OCR_MEMORY_MB
+
+FILE_TYPES = ['image', 'application', 'text', 'excel', 'video', 'audio', 'unknown']
+
+# 工作进程中的 CloudStorageManager（由 _init_worker 创建）
+_worker_storage_manager: Optional[CloudStorageManager] = None
+
+
+def _init_worker(ocr_memory_budget_mb: int):
+    global _worker_storage_manager
+    # OCR管理器在首次使用时读取这两个环境变量；OCR进程池继承本进程的环境
+    os.environ["OCR_POOL_WORKERS"] = "1"
+    os.environ["OCR_MEMORY_BUDGET_MB"] = str(ocr_memory_budget_mb)
+    _worker_storage_manager = CloudStorageManager()
+
+
+def _analyze(file_id: int) -> Dict[str, Any]:
+    return _worker_storage_manager.analyze_file_locally(file_id)
+
+
+def select_files(storage_manager: CloudStorageManager, args: argparse.Namespace) -> List[tuple]:
+    """按命令行条件选出待分析文件，返回 [(id, filename), ...]（按ID排序）"""
+    conditions, params = [], []
+    if not args.all:
+        conditions.append('NOT EXISTS (SELECT 1 FROM ai_analysis a WHERE a.file_id = f.id)')
+    if args.folder_id is not None:
+        conditions.append('f.folder_id = ?')
+        params.append(args.folder_id)
+    type_clause, type_params = storage_manager._file_type_clause(args.type, prefix="f.")
+    if type_clause:
+        conditions.append(type_clause)
+        params.extend(type_params)
+    if args.since:
+        conditions.append('f.upload_time >= ?')
+        params.append(args.since)
+    if args.until:
+        # --until 包含当天
+        conditions.append("f.upload_time < date(?, '+1 day')")
+        params.append(args.until)
+
+    sql = 'SELECT f.id, f.filename FROM files f'
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql += ' ORDER BY f.id'
+    if args.limit:
+        sql += ' LIMIT ?'
+        params.append(args.limit)
+    return storage_manager.db.connect().execute(sql, params).fetchall()
+
+
+def run(args: argparse.Namespace) -> int:
+    storage_manager = CloudStorageManager()
+    files = select_files(storage_manager, args)
+    print(f"待分析文件: {len(files)} 个")
+    if args.dry_run:
+        for file_id, filename in files:
+            print(f"  #{file_id} {filename}")
+        return 0
+    if not files:
+        return 0
+
+    workers = min(args.workers, len(files))
+    ocr_memory_budget_mb = max(int(os.getenv('OCR_MEMORY_BUDGET_MB', DEFAULT_OCR_MEMORY_BUDGET_MB)) // workers,
+                               PAGE_OCR_MEMORY_MB)
+    print(f"工作进程: {workers}（每个OCR内存预算 {ocr_memory_budget_mb}MB），每批写入: {args.batch_size} 条")
+    started = time.perf_counter()
+    batch: List[Dict[str, Any]] = []
+    saved = cached = failed = 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(ocr_memory_budget_mb,)) as executor:
+        futures = {executor.submit(_analyze, file_id): (file_id, filename) for file_id, filename in files}
+        for done, future in enumerate(as_completed(futures), 1):
+            file_id, filename = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "file_id": file_id, "error": str(e)}
+
+            if result.get("success"):
+                cached += bool(result.get("cached"))
+                batch.append(result)
+            else:
+                failed += 1
+                print(f"  失败 #{file_id} {filename}: {result.get('error')}")
+
+            if len(batch) >= args.batch_size:
+                saved += storage_manager.save_local_analyses(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                print(f"  进度 {done}/{len(files)}，已写入 {saved}，{done / elapsed:.1f} 个/秒")
+
+    if batch:
+        saved += storage_manager.save_local_analyses(batch)
+
+    elapsed = time.perf_counter() - started
+    print(f"完成: 写入 {saved} 条（缓存命中 {cached}），失败 {failed}，耗时 {elapsed:.1f} 秒")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="批量本地分析文件（文本提取、OCR、行业分类、关键短语）")
+    parser.add_argument("--all", action="store_true", help="包括已分析过的文件（默认只分析没有分析记录的文件）")
+    parser.add_argument("--folder-id", type=int, help="只分析该文件夹中的文件")
+    parser.add_argument("--type", choices=FILE_TYPES, help="只分析该类型的文件（与侧边栏筛选相同）")
+    parser.add_argument("--since", help="上传日期不早于 YYYY-MM-DD")
+    parser.add_argument("--until", help="上传日期不晚于 YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, help="最多分析的文件数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="工作进程数（默认CPU核数；每个工作进程只用1个OCR进程）")
+    parser.add_argument("--batch-size", type=int, default=50, help="每个写入事务包含的结果数")
+    parser.add_argument("--dry-run", action="store_true", help="只列出将要分析的文件")
+    args = parser.parse_args(argv)
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers 与 --batch-size 必须大于0")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""元数据查询基准：有/无热点索引时，列表与分析查询随文件数量的增长情况
+
+用法:
+    python benchmarks/db_index_benchmark.py [--sizes 1000 10000 100000] [--repeat 200]
+
+对每个规模分别构建两个临时数据库：迁移到 v2（无二级索引）与迁移到最新版本，
+插入相同的数据，然后测量：
+- 列表：WHERE folder_id = ? ORDER BY upload_time DESC LIMIT 50（get_files首屏）
+- 分析：WHERE file_id = ? ORDER BY analysis_time DESC LIMIT 1（get_ai_analysis）
+- 文件夹：WHERE folder_name = ?（create_industry_folder）
+有索引时耗时应随规模近似对数增长（B树查找），无索引时随规模线性增长。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.database import Database  # noqa: E402
+from core.migrations import migrate, LATEST_VERSION  # noqa: E402
+
+FOLDERS = 50
+
+QUERIES = {
+    "list": ('''
+        SELECT id, filename, file_size, file_type, upload_time, is_cached
+        FROM files WHERE folder_id = ?
+        ORDER BY upload_time DESC LIMIT 50
+    ''', lambda n: (random.randint(1, FOLDERS),)),
+    "analysis": ('''
+        SELECT analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, analysis_time
+        FROM ai_analysis WHERE file_id = ? ORDER BY analysis_time DESC LIMIT 1
+    ''', lambda n: (random.randint(1, n),)),
+    "folder": ('SELECT id FROM folders WHERE folder_name = ?',
+               lambda n: (f"AI_folder_{random.randint(1, FOLDERS)}",)),
+}
+
+
+def populate(db: Database, n_files: int):
+    """插入 n_files 个文件（分布在 FOLDERS 个文件夹中），每个文件一条分析记录"""
+    start = datetime(2024, 1, 1)
+    with db.transaction() as conn:
+        conn.executemany(
+            'INSERT INTO folders (id, folder_name) VALUES (?, ?)',
+            [(i, f"AI_folder_{i}") for i in range(1, FOLDERS + 1)]
+        )
+        conn.executemany(
+            '''INSERT INTO files (id, filename, file_path, file_size, file_type, folder_id, upload_time, checksum)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+            ((i, f"report_{i}.pdf", f"cloud_storage/{i}.pdf", 1024 * i, "application",
+              (i % FOLDERS) + 1, (start + timedelta(seconds=i * 37)).strftime('%Y-%m-%d %H:%M:%S'), f"{i:032x}")
+             for i in range(1, n_files + 1))
+        )
+        conn.executemany(
+            '''INSERT INTO ai_analysis (file_id, analysis_type, industry_category, extracted_text, key_phrases,
+                                        summary, confidence_score, method, analysis_time)
+               VALUES (?, 'full_analysis', 'Planting', 'text', '[]', 'summary', 0.5, 'Local Analysis', ?)''',
+            ((i, (start + timedelta(seconds=i * 37 + 5)).strftime('%Y-%m-%d %H:%M:%S'))
+             for i in range(1, n_files + 1))
+        )
+    db.connect().execute('ANALYZE')
+
+
+def time_query(db: Database, sql: str, make_params, n_files: int, repeat: int) -> float:
+    """返回单次查询的平均耗时（微秒）"""
+    conn = db.connect()
+    random.seed(42)
+    params = [make_params(n_files) for _ in range(repeat)]
+    conn.execute(sql, params[0]).fetchall()  # 预热页缓存
+    t0 = time.perf_counter()
+    for p in params:
+        conn.execute(sql, p).fetchall()
+    return (time.perf_counter() - t0) / repeat * 1e6
+
+
+def query_plan(db: Database, sql: str, params) -> str:
+    rows = db.connect().execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    return '; '.join(row[-1] for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            for label, version in (("v2 (no index)", 2), (f"v{LATEST_VERSION} (indexed)", LATEST_VERSION)):
+                db = Database(os.path.join(tmp, f"bench_{n}_{version}.db"))
+                migrate(db, target_version=version)
+                populate(db, n)
+                for name, (sql, make_params) in QUERIES.items():
+                    results[(n, label, name)] = time_query(db, sql, make_params, n, args.repeat)
+                if n == args.sizes[-1]:
+                    for name, (sql, make_params) in QUERIES.items():
+                        print(f"[plan] {label:<16} {name:<9} {query_plan(db, sql, make_params(n))}")
+                db.close()
+
+    labels = ["v2 (no index)", f"v{LATEST_VERSION} (indexed)"]
+    print()
+    print(f"{'files':>8}  {'query':<9}" + ''.join(f"{label:>20}" for label in labels))
+    for n in args.sizes:
+        for name in QUERIES:
+            row = ''.join(f"{results[(n, label, name)]:>17.1f} us" for label in labels)
+            print(f"{n:>8}  {name:<9}{row}")
+
+
+if __name__ == '__main__':
+    main()
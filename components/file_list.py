@@ -3,7 +3,7 @@ import streamlit as st
 import pandas as pd
 from core.storage_manager import CloudStorageManager
 from config.languages import get_text
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 
 
 def render_file_list(
@@ -82,9 +82,15 @@ def render_thumbnail_view(storage_manager: CloudStorageManager, files: List[Dict
                     file_icon = storage_manager.get_file_icon(file.get('file_type', 'unknown'))
                     filename = file.get('filename', 'Unknown')
                     
+                    # Precomputed WebP thumbnail (images and PDFs); other files show the type icon
+                    thumbnail_path = storage_manager.get_rendition(file['id'], "thumb")
+                    
                     # File card container
                     with st.container():
+                        if thumbnail_path:
+                            st.image(thumbnail_path, use_container_width=True)
                         # File icon and name
+                        icon_html = "" if thumbnail_path else f'<div style="font-size: 48px; margin-bottom: 8px;">{file_icon}</div>'
                         st.markdown(f"""
                         <div style="
                             background: white;
@@ -94,7 +100,7 @@ def render_thumbnail_view(storage_manager: CloudStorageManager, files: List[Dict
                             text-align: center;
                             margin-bottom: 8px;
                         ">
-                            <div style="font-size: 48px; margin-bottom: 8px;">{file_icon}</div>
+                            {icon_html}
                             <div style="font-size: 12px; color: #333; overflow: hidden; text-overflow: ellipsis; white-space: nowrap;">
                                 {filename[:20] + '...' if len(filename) > 20 else filename}
                             </div>
@@ -119,3 +125,56 @@ def render_thumbnail_view(storage_manager: CloudStorageManager, files: List[Dict
                         with col_more:
                             if st.button("⚙️", key=f"thumb_more_{file['id']}"):
                                 st.session_state[f"show_menu_{file['id']}"] = True
+
+
+def render_paginated_file_list(
+    storage_manager: CloudStorageManager,
+    fetch_page: Callable[[Optional[str]], Dict[str, Any]],
+    view_mode: str = "list",
+    key: str = "files"
+) -> Dict[str, Any]:
+    """Render one page of files with Previous/Next navigation
+
+    Pages are fetched with keyset cursors (see CloudStorageManager.get_files_page),
+    so only the visible page is read from the database. The cursors of the pages
+    already visited are kept in session state under ``key``; use a key that
+    identifies the folder/filter so that each listing keeps its own position.
+
+    Args:
+        storage_manager: Storage manager instance
+        fetch_page: Callable taking a cursor (None for the first page) and returning a page dict
+        view_mode: View mode ("list" or "thumbnail")
+        key: Session state key for this listing
+
+    Returns:
+        The page dict that was rendered
+    """
+    stack_key = f"page_cursors_{key}"
+    if stack_key not in st.session_state:
+        st.session_state[stack_key] = [None]
+    cursors = st.session_state[stack_key]
+
+    page = fetch_page(cursors[-1])
+    # The page we were on may have disappeared (e.g. files deleted): restart from the first page
+    if not page["files"] and len(cursors) > 1:
+        st.session_state[stack_key] = cursors = [None]
+        page = fetch_page(None)
+
+    render_file_list(storage_manager, page["files"], view_mode)
+
+    if len(cursors) > 1 or page["has_more"]:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            if st.button(f"← {get_text('previous')}", key=f"{key}_prev", disabled=len(cursors) <= 1,
+                         use_container_width=True):
+                cursors.pop()
+                st.rerun()
+        with col_page:
+            st.caption(get_text("page_number").format(len(cursors)))
+        with col_next:
+            if st.button(f"{get_text('next')} →", key=f"{key}_next", disabled=not page["has_more"],
+                         use_container_width=True):
+                cursors.append(page["next_cursor"])
+                st.rerun()
+
+    return page
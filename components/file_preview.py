@@ -1,7 +1,5 @@
 """File preview component"""
 import streamlit as st
-import pandas as pd
-import io
 import hashlib
 from core.storage_manager import CloudStorageManager
 from utils.dependencies import PDF_AVAILABLE, WHISPER_AVAILABLE, SPEECH_RECOGNITION_AVAILABLE
@@ -9,6 +7,24 @@ from utils.speech_to_text import transcribe_audio, get_available_methods, check_
 from config.languages import get_text
 
 
+@st.fragment(run_every=2)
+def render_analysis_job_progress(storage_manager: CloudStorageManager, file_id: int):
+    """Poll the background analysis job; only this fragment reruns while the job is active"""
+    job = storage_manager.get_analysis_job(file_id)
+    if not job or job["status"] in ("done", "failed"):
+        # Finished: rerun the whole page to show the results (or the error and retry button)
+        st.rerun(scope="app")
+        return
+
+    if job["status"] == "queued":
+        st.progress(0.0, text=get_text("analysis_queued"))
+    else:
+        message = job.get("message") or get_text("ai_is_analyzing")
+        st.progress(job["progress"], text=f"{get_text('ai_is_analyzing')} {message} ({job['progress']:.0%})")
+    if job["attempts"] > 1 and job.get("error"):
+        st.caption(get_text("analysis_retrying").format(job["attempts"], job["max_attempts"], job["error"]))
+
+
 def render_file_preview_modal(storage_manager: CloudStorageManager, file_id: int):
     """Render file preview page"""
     # Get file info directly by file_id (not dependent on folder)
@@ -53,61 +69,76 @@ def render_file_preview_modal(storage_manager: CloudStorageManager, file_id: int
     
     # Preview content
     st.markdown(f"### 👁️ {get_text('file_preview')}")
-    file_data = storage_manager.preview_file(file_id)
+    file_type = file.get('file_type', 'unknown')
+    filename = file.get('filename', '')
+    # Images and PDFs are shown from the precomputed preview rendition (bounded-size WebP);
+    # the original bytes are only read when there is no rendition
+    preview_path = storage_manager.get_rendition(file_id, "preview")
     
-    if file_data:
-        file_type = file.get('file_type', 'unknown')
-        filename = file.get('filename', '')
-        
+    if preview_path and file_type == 'image':
+        st.image(preview_path, caption=filename, use_container_width=True)
+    
+    elif preview_path and filename.endswith('.pdf'):
+        st.image(preview_path, caption=get_text("pdf_preview").format(filename), use_container_width=True)
+        page_count = storage_manager.get_pdf_page_count(file_id)
+        if page_count > 1:
+            st.caption(get_text("pdf_has_pages").format(page_count))
+    
+    elif file_type == 'application' and filename.endswith(('.xlsx', '.xls')):
+        # Sheet names and sizes come from workbook metadata; only the selected sheet is streamed,
+        # then served from the parse cache (Arrow IPC) on every rerun
+        sheets = storage_manager.list_sheets(file_id)
+        sheet = 0
+        if len(sheets) > 1:
+            sheet = st.selectbox(
+                get_text("excel_sheet"), [info["index"] for info in sheets], key=f"excel_sheet_{file_id}",
+                format_func=lambda index: get_text("excel_sheet_option").format(
+                    sheets[index]["name"], sheets[index]["rows"], sheets[index]["columns"])
+                if sheets[index]["rows"] else sheets[index]["name"])
+        try:
+            df, row_count = storage_manager.get_table_preview(file_id, rows=20, sheet=sheet)
+            if row_count:
+                st.dataframe(df, use_container_width=True)
+                st.caption(get_text("excel_preview").format(filename, row_count))
+            else:
+                st.warning(get_text("excel_file_empty"))
+        except Exception as e:
+            st.error(get_text("excel_preview_failed").format(str(e)))
+            st.download_button(f"📥 {get_text('download_excel')}", storage_manager.preview_file(file_id) or b"", filename, key=f"download_excel_{file_id}")
+    
+    elif filename.endswith('.csv'):
+        try:
+            df, row_count = storage_manager.get_table_preview(file_id, rows=20)
+            if row_count:
+                st.dataframe(df, use_container_width=True)
+                st.caption(get_text("csv_preview").format(filename, row_count))
+            else:
+                st.warning(get_text("csv_file_empty"))
+        except Exception as e:
+            st.error(get_text("csv_preview_failed").format(str(e)))
+            st.download_button(f"📥 {get_text('download_csv')}", storage_manager.preview_file(file_id) or b"", filename, key=f"download_csv_{file_id}")
+    
+    elif (file_data := storage_manager.preview_file(file_id)):
         if file_type == 'image':
             st.image(file_data, caption=filename, use_container_width=True)
         
         elif file_type == 'application' and filename.endswith('.pdf'):
             if PDF_AVAILABLE:
+                # No rendition (file without checksum, or generation failed): render the first page
+                # directly so the user sees either the page or the actual error
                 try:
                     import fitz
-                    pdf_stream = io.BytesIO(file_data)
-                    doc = fitz.open(stream=pdf_stream, filetype="pdf")
-                    
-                    if len(doc) > 0:
-                        page = doc[0]
-                        mat = fitz.Matrix(1.5, 1.5)
-                        pix = page.get_pixmap(matrix=mat)
-                        img_data = pix.tobytes("png")
-                        st.image(img_data, caption=get_text("pdf_preview").format(filename), use_container_width=True)
-                        if len(doc) > 1:
-                            st.caption(get_text("pdf_has_pages").format(len(doc)))
-                    doc.close()
+                    with fitz.open(stream=file_data, filetype="pdf") as doc:
+                        if len(doc) > 0:
+                            pix = doc[0].get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+                            st.image(pix.tobytes("png"), caption=get_text("pdf_preview").format(filename), use_container_width=True)
+                            if len(doc) > 1:
+                                st.caption(get_text("pdf_has_pages").format(len(doc)))
                 except Exception as e:
                     st.error(get_text("pdf_preview_failed").format(str(e)))
-                    st.download_button(f"📥 {get_text('download_pdf')}", file_data, filename, key=f"download_pdf_{file_id}")
             else:
                 st.info(get_text("pdf_preview_requires"))
-                st.download_button(f"📥 {get_text('download_pdf')}", file_data, filename, key=f"download_pdf_{file_id}")
-        
-        elif file_type == 'application' and filename.endswith(('.xlsx', '.xls')):
-            try:
-                df = pd.read_excel(io.BytesIO(file_data))
-                if not df.empty:
-                    st.dataframe(df.head(20), use_container_width=True)
-                    st.caption(get_text("excel_preview").format(filename, len(df)))
-                else:
-                    st.warning(get_text("excel_file_empty"))
-            except Exception as e:
-                st.error(get_text("excel_preview_failed").format(str(e)))
-                st.download_button(f"📥 {get_text('download_excel')}", file_data, filename, key=f"download_excel_{file_id}")
-        
-        elif filename.endswith('.csv'):
-            try:
-                df = pd.read_csv(io.BytesIO(file_data))
-                if not df.empty:
-                    st.dataframe(df.head(20), use_container_width=True)
-                    st.caption(get_text("csv_preview").format(filename, len(df)))
-                else:
-                    st.warning(get_text("csv_file_empty"))
-            except Exception as e:
-                st.error(get_text("csv_preview_failed").format(str(e)))
-                st.download_button(f"📥 {get_text('download_csv')}", file_data, filename, key=f"download_csv_{file_id}")
+            st.download_button(f"📥 {get_text('download_pdf')}", file_data, filename, key=f"download_pdf_{file_id}")
         
         elif file_type == 'text' or filename.endswith('.txt'):
             try:
@@ -133,16 +164,21 @@ def render_file_preview_modal(storage_manager: CloudStorageManager, file_id: int
     # Perform AI analysis first
     ai_analysis = storage_manager.get_ai_analysis(file_id)
     if not ai_analysis:
-        if st.button(f"🔍 {get_text('start_ai_analysis')}", key=f"start_ai_{file_id}"):
-            with st.spinner(get_text("ai_is_analyzing")):
-                result = storage_manager.analyze_file_with_ai(file_id)
-                if result.get("success"):
-                    st.success(get_text("ai_analysis_completed"))
-                    st.rerun()
-                else:
-                    st.error(get_text("ai_analysis_failed").format(result.get('error', get_text('unknown_error'))))
+        # Analysis runs in the background job queue; the page only enqueues and polls
+        analysis_job = storage_manager.get_analysis_job(file_id)
+        if analysis_job and analysis_job["status"] in ("queued", "running"):
+            render_analysis_job_progress(storage_manager, file_id)
+        else:
+            if analysis_job and analysis_job["status"] == "failed":
+                st.error(get_text("ai_analysis_failed").format(analysis_job.get('error') or get_text('unknown_error')))
+            if st.button(f"🔍 {get_text('start_ai_analysis')}", key=f"start_ai_{file_id}"):
+                storage_manager.enqueue_analysis(file_id)
+                st.rerun()
     else:
-        # Display existing analysis results
+        # Display existing analysis results; a background job reports problems (e.g. DeepSeek fallback) in its error column
+        analysis_job = storage_manager.get_analysis_job(file_id)
+        if analysis_job and analysis_job["status"] == "done" and analysis_job.get("error"):
+            st.warning(get_text("ai_analysis_warning").format(analysis_job["error"]))
         st.markdown(f"#### 📊 {get_text('analysis_results')}")
         col1, col2 = st.columns(2)
         with col1:
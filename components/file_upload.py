@@ -26,10 +26,7 @@ from docx import Document  # 处理Word
 from PyPDF2 import PdfReader  # 处理PDF
 from openpyxl import load_workbook  # 处理Excel
 from pptx import Presentation  # 处理PPT
-from paddleocr import PaddleOCR  # 替换pytesseract为PaddleOCR
-
-# 初始化PaddleOCR（支持中英文）
-ocr = PaddleOCR(use_angle_cls=True, lang="ch")
+from utils.ocr_manager import get_ocr_manager  # 与存储管理器共用OCR引擎（按需加载，受内存预算约束）
 
 # 设置页面配置
 st.set_page_config(page_title="AI文件处理助手", layout="wide")
@@ -77,23 +74,13 @@ def call_deepseek_api(prompt, system_message=None):
         return None
 
 
-def paddle_ocr_processing(image_path):
-    """使用PaddleOCR进行文本提取"""
+def ocr_processing(image_path):
+    """使用共享的OCR服务进行文本提取（引擎按可用内存自动选择，已加载的模型常驻复用）"""
     try:
-        # 调用PaddleOCR进行识别（移除cls=True参数）
-        result = ocr.ocr(image_path)  # 这里删除了cls=True
-        # 提取文本内容
-        text = ""
-        # 兼容不同版本的PaddleOCR返回格式
-        if result is not None:
-            for line in result:
-                if line is not None:  # 处理可能的空行
-                    for word_info in line:
-                        if len(word_info) >= 2 and isinstance(word_info[1], tuple):
-                            text += word_info[1][0] + "\n"
-        return text
+        results = get_ocr_manager().readtext(image_path, "image")
+        return "".join(result[1] + "\n" for result in results)
     except Exception as e:
-        st.error(f"PaddleOCR处理错误: {str(e)}")
+        st.error(f"OCR处理错误: {str(e)}")
         return None
 
 
@@ -182,7 +169,7 @@ def extract_text_from_file(file_info):
 
         # 图像文件（使用OCR）
         elif file_ext in ['.png', '.jpg', '.jpeg', '.bmp', '.gif']:
-            extracted_text = paddle_ocr_processing(file_path)
+            extracted_text = ocr_processing(file_path)
 
         # 其他无法直接转换的格式（尝试OCR）
         else:
@@ -190,7 +177,7 @@ def extract_text_from_file(file_info):
             try:
                 # 尝试以图像方式打开
                 img = Image.open(file_path)
-                extracted_text = paddle_ocr_processing(file_path)
+                extracted_text = ocr_processing(file_path)
             except:
                 extracted_text = f"无法提取文本 (文件格式: {file_ext})"
 
@@ -1,9 +1,9 @@
 """Industry view component"""
 import streamlit as st
 from core.storage_manager import CloudStorageManager
-from components.file_list import render_file_list
+from components.file_list import render_paginated_file_list
 from config.languages import get_text
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 
 def render_industry_view(storage_manager: CloudStorageManager):
@@ -72,10 +72,10 @@ def render_industry_view(storage_manager: CloudStorageManager):
             
             st.markdown("---")
             
-            # Get files for this category
-            files = get_files_by_category(storage_manager, category_key)
+            # Get the first page of files for this category
+            first_page = get_files_by_category(storage_manager, category_key)
             
-            if files:
+            if first_page["files"]:
                 # View mode selector
                 view_mode_col, _ = st.columns([1, 4])
                 with view_mode_col:
@@ -88,7 +88,12 @@ def render_industry_view(storage_manager: CloudStorageManager):
                     view_mode_value = "list" if view_mode == get_text("list") else "thumbnail"
                 
                 # Display files
-                render_file_list(storage_manager, files, view_mode_value)
+                render_paginated_file_list(
+                    storage_manager,
+                    lambda cursor: get_files_by_category(storage_manager, category_key, cursor=cursor),
+                    view_mode_value,
+                    key=f"industry_{category_key}"
+                )
             else:
                 st.info(get_text("no_files_in_category").format(category_info['name']))
         else:
@@ -175,9 +180,7 @@ def get_industry_categories() -> List[Dict[str, Any]]:
 def get_file_count_by_category(storage_manager: CloudStorageManager, category_key: str) -> int:
     """Get file count for a specific category"""
     try:
-        import sqlite3
-        conn_db = sqlite3.connect(storage_manager.db_path)
-        cursor = conn_db.cursor()
+        cursor = storage_manager.db.connect().cursor()
         
         # Get folder ID for this category
         folder_name = f"AI_{category_key}"
@@ -191,7 +194,6 @@ def get_file_count_by_category(storage_manager: CloudStorageManager, category_ke
         else:
             count = 0
         
-        conn_db.close()
         return count
     except Exception as e:
         print(f"[DEBUG] Error getting file count: {str(e)}")
@@ -219,42 +221,30 @@ def render_industry_view_sidebar(storage_manager: CloudStorageManager):
             st.rerun()
 
 
-def get_files_by_category(storage_manager: CloudStorageManager, category_key: str) -> List[Dict[str, Any]]:
-    """Get files for a specific category"""
+def get_files_by_category(
+    storage_manager: CloudStorageManager,
+    category_key: str,
+    cursor: Optional[str] = None,
+    page_size: int = CloudStorageManager.DEFAULT_PAGE_SIZE,
+    count_mode: str = "none"
+) -> Dict[str, Any]:
+    """Get one page of files for a specific category (see CloudStorageManager.get_files_page)"""
+    empty_page = {"files": [], "next_cursor": None, "has_more": False, "total": 0, "total_is_exact": True}
     try:
-        import sqlite3
-        conn = sqlite3.connect(storage_manager.db_path)
-        cursor = conn.cursor()
+        db_cursor = storage_manager.db.connect().cursor()
         
         # Get folder ID for this category
         folder_name = f"AI_{category_key}"
-        cursor.execute('SELECT id FROM folders WHERE folder_name = ?', (folder_name,))
-        folder_result = cursor.fetchone()
+        db_cursor.execute('SELECT id FROM folders WHERE folder_name = ?', (folder_name,))
+        folder_result = db_cursor.fetchone()
         
-        if folder_result:
-            folder_id = folder_result[0]
-            cursor.execute('''
-                SELECT id, filename, file_size, file_type, upload_time, is_cached
-                FROM files WHERE folder_id = ?
-                ORDER BY upload_time DESC
-            ''', (folder_id,))
-            
-            files = []
-            for row in cursor.fetchall():
-                files.append({
-                    "id": row[0],
-                    "filename": row[1],
-                    "file_size": row[2],
-                    "file_type": row[3],
-                    "upload_time": row[4],
-                    "is_cached": bool(row[5])
-                })
-        else:
-            files = []
+        if not folder_result:
+            return empty_page
         
-        conn.close()
-        return files
+        return storage_manager.get_files_page(
+            folder_result[0], cursor=cursor, page_size=page_size, count_mode=count_mode
+        )
     except Exception as e:
         print(f"[DEBUG] Error getting files by category: {str(e)}")
-        return []
+        return empty_page
 
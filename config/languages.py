@@ -29,6 +29,7 @@ TRANSLATIONS = {
         "back": "Back",
         "next": "Next",
         "previous": "Previous",
+        "page_number": "Page {}",
         "confirm": "Confirm",
         "yes": "Yes",
         "no": "No",
@@ -165,6 +166,8 @@ TRANSLATIONS = {
         "excel_preview": "Excel Preview: {} (Showing first 20 rows, total {} rows)",
         "excel_file_empty": "Excel file is empty",
         "excel_preview_failed": "Excel preview failed: {}",
+        "excel_sheet": "Sheet",
+        "excel_sheet_option": "{} ({} rows × {} columns)",
         "download_excel": "Download Excel",
         "csv_preview": "CSV Preview: {} (Showing first 20 rows, total {} rows)",
         "csv_file_empty": "CSV file is empty",
@@ -184,6 +187,9 @@ TRANSLATIONS = {
         "ai_is_analyzing": "AI is analyzing the file...",
         "ai_analysis_completed": "AI analysis completed!",
         "ai_analysis_failed": "AI analysis failed: {}",
+        "ai_analysis_warning": "AI analysis note: {}",
+        "analysis_queued": "Analysis queued, waiting for a worker...",
+        "analysis_retrying": "Attempt {}/{} (previous attempt failed: {})",
         "analysis_results": "Analysis Results",
         "industry_category": "Industry Category",
         "confidence": "Confidence",
@@ -260,6 +266,7 @@ TRANSLATIONS = {
         "back": "Rudi",
         "next": "Ifuatayo",
         "previous": "Iliyotangulia",
+        "page_number": "Ukurasa {}",
         "confirm": "Thibitisha",
         "yes": "Ndiyo",
         "no": "Hapana",
@@ -396,6 +403,8 @@ TRANSLATIONS = {
         "excel_preview": "Onyesho la Awali la Excel: {} (Inaonyesha safu 20 za kwanza, jumla ya safu {})",
         "excel_file_empty": "Faili ya Excel ni tupu",
         "excel_preview_failed": "Onyesho la awali la Excel limeshindwa: {}",
+        "excel_sheet": "Karatasi",
+        "excel_sheet_option": "{} (safu {} × safuwima {})",
         "download_excel": "Pakua Excel",
         "csv_preview": "Onyesho la Awali la CSV: {} (Inaonyesha safu 20 za kwanza, jumla ya safu {})",
         "csv_file_empty": "Faili ya CSV ni tupu",
@@ -415,6 +424,9 @@ TRANSLATIONS = {
         "ai_is_analyzing": "AI inachambua faili...",
         "ai_analysis_completed": "Uchambuzi wa AI umekamilika!",
         "ai_analysis_failed": "Uchambuzi wa AI umeshindwa: {}",
+        "ai_analysis_warning": "Maelezo ya uchambuzi wa AI: {}",
+        "analysis_queued": "Uchambuzi umewekwa kwenye foleni, unasubiri mfanyakazi...",
+        "analysis_retrying": "Jaribio {}/{} (jaribio lililopita limeshindwa: {})",
         "analysis_results": "Matokeo ya Uchambuzi",
         "industry_category": "Kategoria ya Sekta",
         "confidence": "Kujiamini",
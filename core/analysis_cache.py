@@ -0,0 +1,74 @@
+"""分析结果缓存 - 以文件内容校验和为键复用 文本提取 / OCR / AI分析 的结果
+
+同一份报告重复上传或重复分析时，不再重新提取文本、运行Tesseract、调用付费的DeepSeek接口。
+缓存键为 (checksum, kind, pipeline_version, model)：
+- checksum          files.checksum，内容相同即命中，与文件名、文件ID无关
+- kind              结果类型，如 "extraction" / "analysis" / "smart_report"
+- pipeline_version  由影响结果的配置（关键词表、提示词、OCR语言、代码版本号等）计算的摘要，
+                    任何一项变化都会得到新的版本号，旧结果自然失效
+- model             使用的模型，如 "deepseek-chat"、"local"、"tesseract-5.3.0"
+"""
+import json
+import sqlite3
+from typing import Any, Dict, Optional
+
+from core.blob_store import new_digest
+from core.database import Database
+
+
+def pipeline_version(*components: Any) -> str:
+    """把影响结果的配置序列化后取摘要（前16个十六进制字符）"""
+    digest = new_digest()
+    digest.update(json.dumps(components, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+class AnalysisCache:
+    """analysis_cache 表的读写（结果以JSON保存）"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def get(self, checksum: Optional[str], kind: str, version: str, model: str) -> Optional[Dict[str, Any]]:
+        if not checksum:
+            return None
+        row = self.db.connect().execute('''
+            SELECT result FROM analysis_cache
+            WHERE checksum = ? AND kind = ? AND pipeline_version = ? AND model = ?
+        ''', (checksum, kind, version, model)).fetchone()
+        if row is None:
+            return None
+        print(f"[DEBUG] AnalysisCache: 命中 {kind} ({model}) - {checksum[:12]}")
+        return json.loads(row[0])
+
+    def put(self, checksum: Optional[str], kind: str, version: str, model: str, result: Dict[str, Any],
+            conn: Optional[sqlite3.Connection] = None):
+        """写入缓存；传入 conn 时在调用方的事务中写入（批量写入时使用）"""
+        if not checksum:
+            return
+        if conn is None:
+            with self.db.transaction() as conn:
+                self.put(checksum, kind, version, model, result, conn=conn)
+            return
+        conn.execute('''
+            INSERT OR REPLACE INTO analysis_cache (checksum, kind, pipeline_version, model, result)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (checksum, kind, version, model, json.dumps(result, ensure_ascii=False, default=str)))
+
+    @staticmethod
+    def purge(conn: sqlite3.Connection, checksum: str) -> int:
+        """在调用方的事务中删除内容的全部缓存（内容的最后一个引用被删除后调用）"""
+        return conn.execute('DELETE FROM analysis_cache WHERE checksum = ?', (checksum,)).rowcount
+
+    def invalidate(self, checksum: Optional[str] = None, kind: Optional[str] = None) -> int:
+        """手动清除缓存（默认全部），返回删除的条数"""
+        conditions, params = [], []
+        if checksum:
+            conditions.append("checksum = ?")
+            params.append(checksum)
+        if kind:
+            conditions.append("kind = ?")
+            params.append(kind)
+        where = " AND ".join(conditions) if conditions else "1"
+        with self.db.transaction() as conn:
+            return conn.execute(f'DELETE FROM analysis_cache WHERE {where}', params).rowcount
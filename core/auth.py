@@ -5,6 +5,8 @@ import hashlib
 import secrets
 from typing import Optional, Dict, Any
 from pathlib import Path
+from core.database import get_database
+from core.migrations import migrate
 
 
 class AuthManager:
@@ -16,38 +18,12 @@ class AuthManager:
         db_path_obj.parent.mkdir(parents=True, exist_ok=True)
         
         self.db_path = str(db_path_obj)
+        self.db = get_database(self.db_path)
         self._init_database()
     
     def _init_database(self):
-        """Initialize authentication database tables"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Users table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                email TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Sessions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                session_token TEXT UNIQUE NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        """Initialize authentication database tables (shared schema migrations)"""
+        migrate(self.db)
     
     def _hash_password(self, password: str) -> str:
         """Hash password using SHA256"""
@@ -64,29 +40,25 @@ class AuthManager:
             
             password_hash = self._hash_password(password)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
             try:
-                cursor.execute('''
-                    INSERT INTO users (username, password_hash, email)
-                    VALUES (?, ?, ?)
-                ''', (username, password_hash, email))
-                
-                user_id = cursor.lastrowid
-                
-                # 注册成功后自动创建session（自动登录）
-                session_token = secrets.token_urlsafe(32)
-                import datetime
-                expires_at = datetime.datetime.now() + datetime.timedelta(days=7)
-                
-                cursor.execute('''
-                    INSERT INTO sessions (user_id, session_token, expires_at)
-                    VALUES (?, ?, ?)
-                ''', (user_id, session_token, expires_at))
-                
-                conn.commit()
-                conn.close()
+                with self.db.transaction() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute('''
+                        INSERT INTO users (username, password_hash, email)
+                        VALUES (?, ?, ?)
+                    ''', (username, password_hash, email))
+                    
+                    user_id = cursor.lastrowid
+                    
+                    # 注册成功后自动创建session（自动登录）
+                    session_token = secrets.token_urlsafe(32)
+                    import datetime
+                    expires_at = datetime.datetime.now() + datetime.timedelta(days=7)
+                    
+                    cursor.execute('''
+                        INSERT INTO sessions (user_id, session_token, expires_at)
+                        VALUES (?, ?, ?)
+                    ''', (user_id, session_token, expires_at))
                 
                 return {
                     "success": True,
@@ -96,7 +68,6 @@ class AuthManager:
                     "email": email
                 }
             except sqlite3.IntegrityError:
-                conn.close()
                 return {"success": False, "error": "Username already exists"}
         except Exception as e:
             return {"success": False, "error": str(e)}
@@ -106,8 +77,7 @@ class AuthManager:
         try:
             password_hash = self._hash_password(password)
             
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             
             cursor.execute('''
                 SELECT id, username, email FROM users
@@ -117,7 +87,6 @@ class AuthManager:
             user = cursor.fetchone()
             
             if not user:
-                conn.close()
                 return {"success": False, "error": "Invalid username or password"}
             
             user_id, username, email = user
@@ -129,13 +98,11 @@ class AuthManager:
             import datetime
             expires_at = datetime.datetime.now() + datetime.timedelta(days=7)
             
-            cursor.execute('''
-                INSERT INTO sessions (user_id, session_token, expires_at)
-                VALUES (?, ?, ?)
-            ''', (user_id, session_token, expires_at))
-            
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                conn.execute('''
+                    INSERT INTO sessions (user_id, session_token, expires_at)
+                    VALUES (?, ?, ?)
+                ''', (user_id, session_token, expires_at))
             
             return {
                 "success": True,
@@ -150,8 +117,7 @@ class AuthManager:
     def verify_session(self, session_token: str) -> Optional[Dict[str, Any]]:
         """Verify session token and return user info"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             
             cursor.execute('''
                 SELECT s.user_id, s.expires_at, u.username, u.email
@@ -161,7 +127,6 @@ class AuthManager:
             ''', (session_token,))
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 user_id, expires_at, username, email = result
@@ -179,12 +144,8 @@ class AuthManager:
     def logout_user(self, session_token: str) -> bool:
         """Logout user by deleting session"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                conn.execute('DELETE FROM sessions WHERE session_token = ?', (session_token,))
             
             return True
         except Exception as e:
@@ -193,8 +154,7 @@ class AuthManager:
     def get_user_info(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get user information by ID"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             
             cursor.execute('''
                 SELECT id, username, email, created_at
@@ -202,7 +162,6 @@ class AuthManager:
             ''', (user_id,))
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 return {
@@ -0,0 +1,150 @@
+"""内容寻址的文件存储 - 相同内容只保存一份
+
+文件内容按校验和存放在分片目录中：blobs/ab/cd/abcd...<扩展名>，
+blobs 表记录每个内容被多少条 files 记录引用（ref_count）。
+重复上传同一份报告时只增加引用计数并插入一条 files 元数据，不再保存第二份；
+删除文件时引用计数减一，归零后才删除物理文件（remove_orphan 在写锁下再次确认没有新的引用）。
+
+扩展名取第一次上传时的文件名，fitz / pandas 等按扩展名判断格式的读取方式不受影响。
+
+写入分两步：
+1. write_temp() 在事务外把上传流按大块写入临时文件，同时计算 BLAKE2b 摘要与字节数
+   （一次I/O、内存占用固定为一个块），并 fsync；
+2. put_file() 在调用方的写事务（Database.transaction()）中登记引用计数，新内容通过
+   os.replace 原子地放到最终路径并 fsync 目录，重复内容直接丢弃临时文件。
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Optional, Tuple
+
+INGEST_CHUNK_SIZE = 1024 * 1024  # 1MB
+
+
+def new_digest():
+    """文件校验和使用的摘要算法（BLAKE2b-256，比MD5更快且抗碰撞）"""
+    return hashlib.blake2b(digest_size=32)
+
+
+def _fsync_dir(path: Path):
+    """fsync目录，使 rename 本身持久化（Windows不支持打开目录，跳过）"""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class BlobStore:
+    """按校验和分片存放文件内容，并维护引用计数"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.tmp_dir = self.root / "tmp"  # 与最终路径在同一文件系统，os.replace 才是原子的
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _suffix(filename: str) -> str:
+        """规范化扩展名（小写，仅保留字母数字），无扩展名时返回空串"""
+        suffix = Path(filename).suffix.lower()
+        return suffix if re.fullmatch(r'\.[a-z0-9]{1,10}', suffix) else ''
+
+    def path_for(self, digest: str, filename: str) -> Path:
+        """校验和对应的分片路径：前两级目录各取2个十六进制字符，单目录文件数保持在可控范围"""
+        return self.root / digest[:2] / digest[2:4] / f"{digest}{self._suffix(filename)}"
+
+    def _acquire(self, conn: sqlite3.Connection, digest: str, filename: str, size: int):
+        """插入或引用已有的 blob，返回 (路径, 是否需要写入内容)
+
+        INSERT ... ON CONFLICT 是原子的，并发上传同一内容时只有一个会创建记录。
+        记录已存在但物理文件丢失时也需要重新写入。
+        """
+        path, ref_count = conn.execute('''
+            INSERT INTO blobs (digest, path, size, ref_count) VALUES (?, ?, ?, 1)
+            ON CONFLICT (digest) DO UPDATE SET ref_count = ref_count + 1
+            RETURNING path, ref_count
+        ''', (digest, str(self.path_for(digest, filename)), size)).fetchone()
+        path = Path(path)
+        return path, ref_count == 1 or not path.exists()
+
+    def write_temp(self, stream: BinaryIO) -> Tuple[Path, str, int]:
+        """把上传流写入临时文件，写入的同时计算摘要和字节数
+
+        按 INGEST_CHUNK_SIZE 复用同一块缓冲区读取，大文件也只占用一个块的内存。
+        写完后 fsync，保证之后 rename 到最终路径的内容已落盘。
+        应在数据库事务之外调用，避免写大文件时长时间持有写锁。
+
+        Returns:
+            (临时文件路径, 十六进制摘要, 字节数)
+        """
+        tmp_path = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        digest = new_digest()
+        size = 0
+        buffer = bytearray(INGEST_CHUNK_SIZE)
+        view = memoryview(buffer)
+        try:
+            with open(tmp_path, "wb", buffering=0) as f:
+                while True:
+                    n = stream.readinto(buffer)
+                    if not n:
+                        break
+                    digest.update(view[:n])
+                    f.write(view[:n])
+                    size += n
+                os.fsync(f.fileno())
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def put_file(self, conn: sqlite3.Connection, digest: str, src_path: Path, filename: str) -> str:
+        """把已写好的临时文件纳入存储（内容已存在时直接删除临时文件），返回存储路径"""
+        src_path = Path(src_path)
+        path, needs_write = self._acquire(conn, digest, filename, src_path.stat().st_size)
+        if needs_write:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src_path, path)
+            _fsync_dir(path.parent)
+        else:
+            print(f"[DEBUG] BlobStore: 内容已存在，删除临时文件 - {digest}")
+            src_path.unlink()
+        return str(path)
+
+    def release(self, conn: sqlite3.Connection, digest: Optional[str], file_path: str) -> Optional[str]:
+        """释放一条 files 记录对内容的引用
+
+        Returns:
+            不再被引用、可以删除的物理文件路径；仍被其他记录引用时返回 None。
+            不在 blobs 表中的旧文件（{timestamp}_{name} 布局）直接返回其路径。
+            调用方应在事务提交后再删除该文件。
+        """
+        row = conn.execute('''
+            UPDATE blobs SET ref_count = ref_count - 1
+            WHERE digest = ? AND path = ?
+            RETURNING ref_count
+        ''', (digest, file_path)).fetchone()
+        if row is None:
+            return file_path
+        if row[0] > 0:
+            return None
+        conn.execute('DELETE FROM blobs WHERE digest = ?', (digest,))
+        return file_path
+
+    @staticmethod
+    def remove_orphan(conn: sqlite3.Connection, digest: Optional[str], file_path: str) -> bool:
+        """在调用方的写事务中确认内容仍无引用后删除物理文件，返回是否已删除
+
+        release() 的事务提交后，并发上传的同一内容可能已重新登记并写回同一路径；
+        调用方须先在本事务中执行过写操作（持有写锁），上传的 put_file 因此与这里串行，
+        此时 blobs 中仍没有该内容才删除。
+        """
+        if digest and conn.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone():
+            print(f"[DEBUG] BlobStore: 内容已被重新上传，保留文件 - {digest}")
+            return False
+        Path(file_path).unlink(missing_ok=True)
+        return True
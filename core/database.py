@@ -0,0 +1,92 @@
+"""SQLite连接管理 - 线程本地长连接
+
+CloudStorageManager、AuthManager 以及各UI组件共用同一个数据库文件。
+原先每个方法都 sqlite3.connect() 再 close()，一次Streamlit rerun要建立十几次连接、
+重复设置PRAGMA并重新解析SQL。这里改为每个线程持有一个长连接：
+- 连接创建时统一设置 WAL、synchronous=NORMAL、mmap_size、busy_timeout
+- sqlite3模块按SQL文本缓存预编译语句（cached_statements），长连接上重复查询无需再次解析
+"""
+import os
+import sqlite3
+import threading
+import contextlib
+from pathlib import Path
+from typing import Dict, Iterator
+
+# 连接参数（可通过环境变量调整）
+BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))  # 256MB
+CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', str(16 * 1024)))  # 16MB页缓存
+STATEMENT_CACHE_SIZE = 256  # 每个连接缓存的预编译语句数量
+
+
+class Database:
+    """按数据库文件共享的连接管理器
+
+    Streamlit的每个会话在各自的脚本线程中运行，sqlite3连接不能跨线程使用，
+    因此连接保存在 threading.local 中：同一线程内复用，线程结束后随之回收。
+    进程fork后（如ProcessPoolExecutor）子进程会重新建立自己的连接。
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = str(db_path)
+        self._local = threading.local()
+
+    def _open(self) -> sqlite3.Connection:
+        """建立新连接并设置PRAGMA"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=STATEMENT_CACHE_SIZE,
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        conn.execute(f'PRAGMA mmap_size={MMAP_SIZE}')
+        conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def connect(self) -> sqlite3.Connection:
+        """获取当前线程的连接（不要手动close，由管理器复用）"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = self._open()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """写事务：正常退出时提交，异常时回滚，避免长连接上残留未结束的事务"""
+        conn = self.connect()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            finally:
+                self._local.conn = None
+
+
+_databases: Dict[str, Database] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(db_path: str) -> Database:
+    """获取数据库文件对应的共享 Database 实例（同一文件只创建一个）"""
+    key = str(Path(db_path).resolve())
+    with _databases_lock:
+        db = _databases.get(key)
+        if db is None:
+            db = Database(db_path)
+            _databases[key] = db
+        return db
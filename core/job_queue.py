@@ -0,0 +1,265 @@
+"""持久化后台任务队列 - jobs 表 + 线程/进程工作池
+
+文件分析（文本提取、OCR、分类、DeepSeek调用）原先在Streamlit脚本线程中同步执行，
+整个会话会卡住直到完成。现在页面只负责入队并轮询状态，由后台工作池执行：
+- 任务保存在 SQLite jobs 表中，进程重启后未完成的任务会继续执行
+- 每种任务登记一个处理函数，并指定在线程池（I/O密集，如网络请求）
+  或进程池（OCR、机器学习等CPU密集）中运行
+- 按优先级领取任务；失败后按指数退避重试，超过次数标记为 failed
+- 领取任务时设置租约，处理函数上报进度时续约；进程崩溃后租约过期的任务会被重新领取
+
+处理函数签名为 handler(ctx: JobContext, payload: dict) -> dict，必须是模块级函数
+（进程池需要pickle）。返回 {"success": False, "error": ...} 视为失败；成功但有需要提示的问题时
+返回 {"warning": ...}，记录在 error 列中。
+一个任务可以分阶段在不同执行方式中运行：处理函数用 ctx.enqueue_next() 登记下一阶段
+（如CPU密集的提取在进程池中完成后，网络请求在线程池中执行），下一阶段沿用同一 dedupe_key。
+"""
+import json
+import multiprocessing
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from core.database import Database, get_database
+
+JOB_LEASE_SECONDS = 15 * 60  # 租约时长，处理函数上报进度时续约
+JOB_POLL_INTERVAL = 1.0  # 空闲时轮询间隔（入队会立即唤醒本进程的工作线程）
+DEFAULT_MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = 5  # 第n次失败后等待 5 * 2**(n-1) 秒再重试
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+# kind -> (处理函数, "thread" | "process")
+_handlers: Dict[str, tuple] = {}
+
+
+def register_handler(kind: str, handler: Callable[["JobContext", Dict[str, Any]], Dict[str, Any]],
+                     executor: str = "thread"):
+    """登记任务处理函数，executor 为 "thread"（I/O密集）或 "process"（CPU密集）"""
+    if executor not in ("thread", "process"):
+        raise ValueError(f"未知的执行方式: {executor}")
+    _handlers[kind] = (handler, executor)
+
+
+class JobContext:
+    """传给处理函数的上下文（可pickle，在子进程中同样可用）"""
+
+    def __init__(self, db_path: str, job_id: int):
+        self.db_path = db_path
+        self.job_id = job_id
+
+    def progress(self, fraction: float, message: str = ""):
+        """上报进度（0~1）并续约"""
+        with get_database(self.db_path).transaction() as conn:
+            conn.execute('''
+                UPDATE jobs SET progress = ?, message = ?, lease_until = ?
+                WHERE id = ? AND status = 'running'
+            ''', (max(0.0, min(float(fraction), 1.0)), message, time.time() + JOB_LEASE_SECONDS, self.job_id))
+
+    def enqueue_next(self, kind: str, payload: Dict[str, Any]) -> int:
+        """登记本任务的下一阶段，沿用优先级、重试次数与 dedupe_key，返回新任务ID
+
+        本任务仍在运行，不做去重检查（否则会找到本任务自己）；新任务的ID更大，latest() 随即返回它。
+        """
+        with get_database(self.db_path).transaction() as conn:
+            priority, max_attempts, dedupe_key = conn.execute(
+                'SELECT priority, max_attempts, dedupe_key FROM jobs WHERE id = ?', (self.job_id,)).fetchone()
+            cursor = conn.execute('''
+                INSERT INTO jobs (kind, payload, priority, max_attempts, dedupe_key, run_after)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, json.dumps(payload, ensure_ascii=False, default=str), priority, max_attempts, dedupe_key,
+                  time.time()))
+            return cursor.lastrowid
+
+
+def _run_handler(handler: Callable, db_path: str, job_id: int, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """在工作线程或子进程中执行处理函数（处理函数按模块路径pickle，子进程中会自动导入）"""
+    return handler(JobContext(db_path, job_id), payload)
+
+
+def _row_to_job(row) -> Dict[str, Any]:
+    (job_id, kind, payload, status, priority, attempts, max_attempts,
+     progress, message, result, error, created_time, finished_time) = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "payload": json.loads(payload) if payload else {},
+        "status": status,
+        "priority": priority,
+        "attempts": attempts,
+        "max_attempts": max_attempts,
+        "progress": progress or 0.0,
+        "message": message,
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "created_time": created_time,
+        "finished_time": finished_time,
+    }
+
+
+_JOB_COLUMNS = '''id, kind, payload, status, priority, attempts, max_attempts,
+                  progress, message, result, error, created_time, finished_time'''
+
+
+class JobQueue:
+    """基于 jobs 表的任务队列，同一数据库在一个进程内只需一个实例（见 get_job_queue）"""
+
+    def __init__(self, db: Database, thread_workers: int = 4, process_workers: int = 1):
+        self.db = db
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    # ---------- 生产者 ----------
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], priority: int = PRIORITY_NORMAL,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, dedupe_key: Optional[str] = None) -> int:
+        """入队并返回任务ID；dedupe_key 相同的任务尚未完成时直接返回已有任务"""
+        with self.db.transaction() as conn:
+            if dedupe_key:
+                row = conn.execute('''
+                    SELECT id FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running')
+                    ORDER BY id DESC LIMIT 1
+                ''', (dedupe_key,)).fetchone()
+                if row:
+                    return row[0]
+            cursor = conn.execute('''
+                INSERT INTO jobs (kind, payload, priority, max_attempts, dedupe_key, run_after)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (kind, json.dumps(payload, ensure_ascii=False), priority, max_attempts, dedupe_key, time.time()))
+            job_id = cursor.lastrowid
+        self._wake.set()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        row = self.db.connect().execute(f'SELECT {_JOB_COLUMNS} FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def latest(self, dedupe_key: str) -> Optional[Dict[str, Any]]:
+        """dedupe_key 对应的最近一个任务（用于页面轮询状态）"""
+        row = self.db.connect().execute(f'''
+            SELECT {_JOB_COLUMNS} FROM jobs WHERE dedupe_key = ? ORDER BY id DESC LIMIT 1
+        ''', (dedupe_key,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    # ---------- 消费者 ----------
+
+    def start(self):
+        """启动工作线程（幂等）"""
+        with self._start_lock:
+            if self._threads:
+                return
+            for i in range(self.thread_workers):
+                self._spawn_worker(f"job-thread-{i}", "thread")
+            if self.process_workers > 0:
+                # spawn：Streamlit进程中有大量线程，fork可能复制到持有的锁
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers, mp_context=multiprocessing.get_context("spawn")
+                )
+                for i in range(self.process_workers):
+                    self._spawn_worker(f"job-process-dispatch-{i}", "process")
+
+    def stop(self, wait: bool = True):
+        self._stop.set()
+        self._wake.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        if self._process_pool:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+        self._threads = []
+
+    def _spawn_worker(self, name: str, executor: str):
+        thread = threading.Thread(target=self._worker_loop, args=(executor,), name=name, daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def _claim(self, kinds: List[str]) -> Optional[tuple]:
+        """原子地领取一个任务：排队中且到了执行时间的，或租约已过期的运行中任务"""
+        now = time.time()
+        placeholders = ','.join('?' * len(kinds))
+        with self.db.transaction() as conn:
+            rows = conn.execute(f'''
+                UPDATE jobs
+                SET status = 'running', attempts = attempts + 1, lease_until = ?,
+                    started_time = CURRENT_TIMESTAMP, progress = 0, message = NULL
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE kind IN ({placeholders})
+                      AND ((status = 'queued' AND run_after <= ?) OR (status = 'running' AND lease_until < ?))
+                    ORDER BY priority DESC, id
+                    LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts, max_attempts
+            ''', (now + JOB_LEASE_SECONDS, *kinds, now, now)).fetchall()
+        return rows[0] if rows else None
+
+    def _finish(self, job_id: int, result: Dict[str, Any]):
+        with self.db.transaction() as conn:
+            conn.execute('''
+                UPDATE jobs SET status = 'done', progress = 1, result = ?, error = ?,
+                                finished_time = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (json.dumps(result, ensure_ascii=False, default=str), result.get("warning"), job_id))
+
+    def _fail(self, job_id: int, attempts: int, max_attempts: int, error: str):
+        with self.db.transaction() as conn:
+            if attempts < max_attempts:
+                conn.execute('''
+                    UPDATE jobs SET status = 'queued', error = ?, run_after = ?
+                    WHERE id = ?
+                ''', (error, time.time() + RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1), job_id))
+            else:
+                conn.execute('''
+                    UPDATE jobs SET status = 'failed', error = ?, finished_time = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                ''', (error, job_id))
+
+    def _worker_loop(self, executor: str):
+        while not self._stop.is_set():
+            kinds = [kind for kind, (_, ex) in _handlers.items() if ex == executor]
+            job = self._claim(kinds) if kinds else None
+            if job is None:
+                self._wake.wait(JOB_POLL_INTERVAL)
+                self._wake.clear()
+                continue
+
+            job_id, kind, payload, attempts, max_attempts = job
+            print(f"[DEBUG] JobQueue: 开始任务 #{job_id} {kind}（第{attempts}次）")
+            try:
+                handler, _ = _handlers[kind]
+                args = (handler, self.db.db_path, job_id, json.loads(payload) if payload else {})
+                if executor == "process":
+                    result = self._process_pool.submit(_run_handler, *args).result()
+                else:
+                    result = _run_handler(*args)
+                result = result or {}
+                if result.get("success") is False:
+                    raise RuntimeError(result.get("error") or "任务返回失败")
+                self._finish(job_id, result)
+                print(f"[DEBUG] JobQueue: 任务 #{job_id} 完成")
+            except Exception as e:
+                print(f"[DEBUG] JobQueue: 任务 #{job_id} 失败: {e}\n{traceback.format_exc()}")
+                self._fail(job_id, attempts, max_attempts, str(e))
+
+
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(db: Database) -> JobQueue:
+    """获取数据库对应的共享队列（每个进程一个，首次使用时再调用 start()）"""
+    with _queues_lock:
+        queue = _queues.get(db.db_path)
+        if queue is None:
+            queue = JobQueue(db)
+            _queues[db.db_path] = queue
+        return queue
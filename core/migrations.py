@@ -0,0 +1,414 @@
+"""数据库结构迁移 - 以 PRAGMA user_version 记录已应用的版本
+
+每个迁移是一个 (版本号, 说明, 函数) 三元组，按版本号顺序在独立事务中执行，
+执行成功后把 user_version 更新为该版本。新增表/列/索引时在末尾追加新的迁移，
+不要修改已经发布的迁移。
+"""
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from core.database import Database
+
+
+def _table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+
+def _v1_base_schema(conn: sqlite3.Connection):
+    """基础表结构（对已有数据库是幂等的）"""
+    # 文件表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS files (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            file_path TEXT NOT NULL,
+            file_size INTEGER,
+            file_type TEXT,
+            folder_id INTEGER,
+            upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            checksum TEXT,
+            is_cached BOOLEAN DEFAULT FALSE,
+            FOREIGN KEY (folder_id) REFERENCES folders (id)
+        )
+    ''')
+
+    # 文件夹表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS folders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            folder_name TEXT NOT NULL,
+            parent_folder_id INTEGER,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (parent_folder_id) REFERENCES folders (id)
+        )
+    ''')
+
+    # 上传进度表（用于断点续传）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS upload_progress (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            total_size INTEGER,
+            uploaded_size INTEGER,
+            chunk_size INTEGER,
+            checksum TEXT,
+            upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # AI分析结果表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ai_analysis (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_id INTEGER,
+            analysis_type TEXT,
+            industry_category TEXT,
+            extracted_text TEXT,
+            key_phrases TEXT,
+            summary TEXT,
+            confidence_score REAL,
+            method TEXT,
+            analysis_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (file_id) REFERENCES files (id)
+        )
+    ''')
+
+    # 行业分类表
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS industry_categories (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            category_name TEXT UNIQUE,
+            keywords TEXT,
+            description TEXT,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # 用户与会话表（AuthManager）
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            email TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            session_token TEXT UNIQUE NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            expires_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+
+def _v2_ai_analysis_columns(conn: sqlite3.Connection):
+    """ai_analysis 增加 method 与 ocr_content（完整OCR内容）列"""
+    cols = _table_columns(conn, 'ai_analysis')
+    if 'method' not in cols:
+        conn.execute('ALTER TABLE ai_analysis ADD COLUMN method TEXT')
+    if 'ocr_content' not in cols:
+        conn.execute('ALTER TABLE ai_analysis ADD COLUMN ocr_content TEXT')
+
+
+def _v3_hot_path_indexes(conn: sqlite3.Connection):
+    """热点查询的复合索引
+
+    - get_files / get_files_by_category: WHERE folder_id ORDER BY upload_time DESC
+    - get_ai_analysis / generate_ai_report: WHERE file_id ORDER BY analysis_time DESC
+    - create_industry_folder / rename_folder: WHERE folder_name
+    - get_folders: WHERE parent_folder_id ORDER BY created_time DESC
+    - upload_file_with_resume: WHERE filename AND total_size ORDER BY upload_time DESC
+    sessions.session_token 已有 UNIQUE 自动索引，verify_session 无需额外索引。
+    """
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_files_folder_upload
+        ON files (folder_id, upload_time DESC, id DESC)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_ai_analysis_file_time
+        ON ai_analysis (file_id, analysis_time DESC)
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_folders_name ON folders (folder_name)')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_folders_parent_created
+        ON folders (parent_folder_id, created_time DESC)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_upload_progress_file
+        ON upload_progress (filename, total_size, upload_time DESC)
+    ''')
+
+
+def _v4_files_upload_order_index(conn: sqlite3.Connection):
+    """跨文件夹的 keyset 分页（search_files_page 的文件名匹配）按 (upload_time DESC, id DESC) 顺序扫描"""
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_files_upload
+        ON files (upload_time DESC, id DESC)
+    ''')
+
+
+def _v5_files_fts(conn: sqlite3.Connection):
+    """文件全文索引 files_fts（rowid = files.id）
+
+    覆盖文件名、完整提取文本与OCR内容，使用 trigram 分词：中英文及斯瓦希里语
+    无需分词即可做子串匹配，3个字符及以上的查询走索引。由触发器与 files / ai_analysis
+    保持同步，正文取该文件最新一条分析记录。
+    SQLite 未编译 FTS5（或版本低于3.34不支持trigram）时跳过，search_files 回退到 LIKE；
+    版本号照常升到5，之后每次启动由 _ensure_files_fts 重试，升级SQLite后即补建索引。
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS files_fts
+            USING fts5(filename, body, ocr, tokenize = 'trigram')
+        ''')
+    except sqlite3.OperationalError as e:
+        print(f"[DEBUG] 数据库迁移: 当前SQLite不支持FTS5 trigram，跳过全文索引: {e}")
+        return
+
+    latest_analysis = '''
+        (SELECT {column} FROM ai_analysis WHERE file_id = {file_id}
+         ORDER BY analysis_time DESC, id DESC LIMIT 1)
+    '''
+    conn.execute(f'''
+        INSERT INTO files_fts (rowid, filename, body, ocr)
+        SELECT f.id, f.filename,
+               coalesce({latest_analysis.format(column='extracted_text', file_id='f.id')}, ''),
+               coalesce({latest_analysis.format(column='ocr_content', file_id='f.id')}, '')
+        FROM files f
+    ''')
+
+    triggers = [
+        '''
+        CREATE TRIGGER IF NOT EXISTS files_fts_insert AFTER INSERT ON files BEGIN
+            INSERT INTO files_fts (rowid, filename, body, ocr) VALUES (new.id, new.filename, '', '');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS files_fts_rename AFTER UPDATE OF filename ON files BEGIN
+            UPDATE files_fts SET filename = new.filename WHERE rowid = new.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS files_fts_delete AFTER DELETE ON files BEGIN
+            DELETE FROM files_fts WHERE rowid = old.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS files_fts_analysis_insert AFTER INSERT ON ai_analysis BEGIN
+            UPDATE files_fts
+            SET body = coalesce(new.extracted_text, ''), ocr = coalesce(new.ocr_content, '')
+            WHERE rowid = new.file_id;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS files_fts_analysis_delete AFTER DELETE ON ai_analysis BEGIN
+            UPDATE files_fts
+            SET body = coalesce({latest_analysis.format(column='extracted_text', file_id='old.file_id')}, ''),
+                ocr = coalesce({latest_analysis.format(column='ocr_content', file_id='old.file_id')}, '')
+            WHERE rowid = old.file_id;
+        END
+        ''',
+    ]
+    # 不能用 executescript：它会先提交当前事务
+    for trigger in triggers:
+        conn.execute(trigger)
+
+
+def _v6_blobs(conn: sqlite3.Connection):
+    """内容寻址存储的引用计数表（BlobStore），已有的旧文件保持原路径不迁移"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def _v7_resumable_upload(conn: sqlite3.Connection):
+    """断点续传会话：upload_progress 以内容指纹为键，并记录每个分块的校验和（ResumableUploader）"""
+    cols = _table_columns(conn, 'upload_progress')
+    if 'fingerprint' not in cols:
+        conn.execute('ALTER TABLE upload_progress ADD COLUMN fingerprint TEXT')
+    if 'temp_path' not in cols:
+        conn.execute('ALTER TABLE upload_progress ADD COLUMN temp_path TEXT')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_upload_progress_fingerprint
+        ON upload_progress (fingerprint)
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS upload_chunks (
+            progress_id INTEGER NOT NULL,
+            chunk_index INTEGER NOT NULL,
+            chunk_offset INTEGER NOT NULL,
+            size INTEGER NOT NULL,
+            checksum TEXT NOT NULL,
+            PRIMARY KEY (progress_id, chunk_index),
+            FOREIGN KEY (progress_id) REFERENCES upload_progress (id)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _v8_jobs(conn: sqlite3.Connection):
+    """后台任务队列（JobQueue）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            payload TEXT,
+            status TEXT NOT NULL DEFAULT 'queued',
+            priority INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL DEFAULT 3,
+            progress REAL DEFAULT 0,
+            message TEXT,
+            result TEXT,
+            error TEXT,
+            dedupe_key TEXT,
+            run_after REAL NOT NULL DEFAULT 0,
+            lease_until REAL,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            started_time TIMESTAMP,
+            finished_time TIMESTAMP
+        )
+    ''')
+    # 领取任务：WHERE status ORDER BY priority DESC, id
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_claim
+        ON jobs (status, priority DESC, id)
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_jobs_dedupe
+        ON jobs (dedupe_key, id DESC)
+    ''')
+
+
+def _v9_analysis_cache(conn: sqlite3.Connection):
+    """按内容校验和缓存分析结果（AnalysisCache）"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS analysis_cache (
+            checksum TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            pipeline_version TEXT NOT NULL,
+            model TEXT NOT NULL,
+            result TEXT NOT NULL,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (checksum, kind, pipeline_version, model)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _v10_ocr_pages(conn: sqlite3.Connection):
+    """逐页保存PDF的OCR结果（OCRPageStore），长文档中断后可从未完成的页继续"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ocr_pages (
+            checksum TEXT NOT NULL,
+            pipeline_version TEXT NOT NULL,
+            model TEXT NOT NULL,
+            page_num INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (checksum, pipeline_version, model, page_num)
+        ) WITHOUT ROWID
+    ''')
+
+
+def _v11_ocr_layout(conn: sqlite3.Connection):
+    """ocr_pages 增加词级版面（utils/ocr_layout.py 的压缩二进制格式），图片的OCR结果以第0页保存"""
+    conn.execute('ALTER TABLE ocr_pages ADD COLUMN layout BLOB')
+
+
+def _v12_csv_dialect(conn: sqlite3.Connection):
+    """files 增加CSV探测结果（编码、分隔符、引号、表头，JSON，见 utils/csv_sniff.py），所有CSV读取方共用"""
+    conn.execute('ALTER TABLE files ADD COLUMN csv_dialect TEXT')
+
+
+def _v13_resniff_csv_encoding(conn: sqlite3.Connection):
+    """清除判定为UTF-8的CSV探测结果：开头64KB全是ASCII的GBK文件以前会被误判为UTF-8，下次读取时重新探测"""
+    conn.execute('''
+        UPDATE files SET csv_dialect = NULL
+        WHERE csv_dialect IS NOT NULL AND json_extract(csv_dialect, '$.encoding') = 'utf-8'
+    ''')
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "base schema", _v1_base_schema),
+    (2, "ai_analysis method/ocr_content columns", _v2_ai_analysis_columns),
+    (3, "hot path indexes", _v3_hot_path_indexes),
+    (4, "files upload order index", _v4_files_upload_order_index),
+    (5, "files full-text index", _v5_files_fts),
+    (6, "content-addressed blobs", _v6_blobs),
+    (7, "resumable upload sessions", _v7_resumable_upload),
+    (8, "background jobs", _v8_jobs),
+    (9, "analysis result cache", _v9_analysis_cache),
+    (10, "per-page OCR results", _v10_ocr_pages),
+    (11, "word-level OCR layout", _v11_ocr_layout),
+    (12, "csv encoding/dialect on files", _v12_csv_dialect),
+    (13, "re-sniff csv encoding for ascii-only prefixes", _v13_resniff_csv_encoding),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(db: Database) -> int:
+    return db.connect().execute('PRAGMA user_version').fetchone()[0]
+
+
+def _ensure_files_fts(conn: sqlite3.Connection):
+    """v5 因SQLite不支持FTS5 trigram跳过了建表时，在当前SQLite上重新尝试（已存在时只有一次 sqlite_master 查询）"""
+    def exists():
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'").fetchone() is not None
+
+    if exists():
+        return
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if not exists():
+            _v5_files_fts(conn)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def migrate(db: Database, target_version: Optional[int] = None) -> int:
+    """把数据库升级到 target_version（默认最新），返回升级后的版本号
+
+    每个迁移在 BEGIN IMMEDIATE 事务中执行，并在持有写锁后重新读取版本号，
+    多个会话/进程同时启动时只有一个会执行迁移。
+    """
+    target = LATEST_VERSION if target_version is None else target_version
+    conn = db.connect()
+    current = get_schema_version(db)
+
+    for version, description, apply in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version > current:
+                print(f"[DEBUG] 数据库迁移: v{version} {description}")
+                apply(conn)
+                conn.execute(f'PRAGMA user_version = {version}')
+                current = version
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    if current >= 5:
+        _ensure_files_fts(conn)
+
+    # 让查询规划器获得最新的统计信息（开销很小，只分析需要的表）
+    conn.execute('PRAGMA optimize')
+    return current
@@ -0,0 +1,89 @@
+"""逐页OCR结果存储 - 长PDF按页流式识别，每页完成即写入 ocr_pages 表
+
+原先PDF最多只识别前10页（避免内存溢出），长篇农业报告会被静默截断。现在：
+- 每次只渲染、识别一页（并行时每个工作进程一页），内存占用与总页数无关
+- 每页结果立即提交，任务崩溃或被中断后重新执行时，只识别尚未完成的页
+- 与分析缓存一样以 (checksum, pipeline_version, model) 为键，内容相同的文件共享结果；
+  model 是实际产生结果的引擎，读取时先用 models() 查出已有结果的引擎，不按当前内存会选哪个引擎查找
+- 下游（搜索、问答）可以用 iter_pages 分批读取，不必一次加载整份文档
+- 每页同时保存词级版面（框、置信度、行/段/块编号，见 utils/ocr_layout.py），
+  高亮、区域裁剪、表格重建不必重新OCR；图片的OCR结果以第0页保存
+"""
+import sqlite3
+from typing import Iterator, Optional, Set, Tuple
+
+from core.database import Database
+from utils.ocr_layout import OCRLayout
+
+PAGE_READ_BATCH = 50  # iter_pages 每次查询读取的页数
+
+
+class OCRPageStore:
+    """ocr_pages 表的读写"""
+
+    def __init__(self, db: Database):
+        self.db = db
+
+    def models(self, checksum: Optional[str], version: str) -> Set[str]:
+        """该内容已有识别结果的引擎（model 列记录产生结果的引擎及版本）"""
+        if not checksum:
+            return set()
+        rows = self.db.connect().execute('''
+            SELECT DISTINCT model FROM ocr_pages WHERE checksum = ? AND pipeline_version = ?
+        ''', (checksum, version)).fetchall()
+        return {row[0] for row in rows}
+
+    def completed_pages(self, checksum: Optional[str], version: str, model: str) -> Set[int]:
+        """已识别完成的页码（从0开始）"""
+        if not checksum:
+            return set()
+        rows = self.db.connect().execute('''
+            SELECT page_num FROM ocr_pages
+            WHERE checksum = ? AND pipeline_version = ? AND model = ?
+        ''', (checksum, version, model)).fetchall()
+        return {row[0] for row in rows}
+
+    def save_page(self, checksum: Optional[str], version: str, model: str, page_num: int, text: str,
+                  layout: Optional[OCRLayout] = None):
+        """保存一页的识别结果（没有文字的页也保存空字符串，标记为已完成）"""
+        if not checksum:
+            return
+        with self.db.transaction() as conn:
+            conn.execute('''
+                INSERT OR REPLACE INTO ocr_pages (checksum, pipeline_version, model, page_num, text, layout)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (checksum, version, model, page_num, text, layout.pack() if layout is not None else None))
+
+    @staticmethod
+    def purge(conn: sqlite3.Connection, checksum: str) -> int:
+        """在调用方的事务中删除内容的全部逐页结果（内容的最后一个引用被删除后调用）"""
+        return conn.execute('DELETE FROM ocr_pages WHERE checksum = ?', (checksum,)).rowcount
+
+    def get_layout(self, checksum: Optional[str], version: str, model: str, page_num: int) -> Optional[OCRLayout]:
+        """一页的词级版面，没有记录时返回 None"""
+        if not checksum:
+            return None
+        row = self.db.connect().execute('''
+            SELECT layout FROM ocr_pages
+            WHERE checksum = ? AND pipeline_version = ? AND model = ? AND page_num = ?
+        ''', (checksum, version, model, page_num)).fetchone()
+        return OCRLayout.unpack(row[0]) if row and row[0] is not None else None
+
+    def iter_pages(self, checksum: Optional[str], version: str, model: str,
+                   start_page: int = 0) -> Iterator[Tuple[int, str]]:
+        """按页序分批读取 (page_num, text)，每批 PAGE_READ_BATCH 页"""
+        if not checksum:
+            return
+        conn = self.db.connect()
+        next_page = start_page
+        while True:
+            rows = conn.execute('''
+                SELECT page_num, text FROM ocr_pages
+                WHERE checksum = ? AND pipeline_version = ? AND model = ? AND page_num >= ?
+                ORDER BY page_num
+                LIMIT ?
+            ''', (checksum, version, model, next_page, PAGE_READ_BATCH)).fetchall()
+            yield from rows
+            if len(rows) < PAGE_READ_BATCH:
+                return
+            next_page = rows[-1][0] + 1
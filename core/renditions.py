@@ -0,0 +1,113 @@
+"""上传时生成的缩略图与预览图（WebP，限定尺寸）
+
+缩略图视图原先只显示图标，预览页把原图整张交给 st.image，PDF 每次刷新页面都用 fitz
+以1.5倍重新渲染第一页。现在上传时为图片和PDF各生成两种副本：
+- thumb:   长边不超过 THUMB_SIZE，用于缩略图视图
+- preview: 长边不超过 PREVIEW_SIZE，用于预览页
+
+与 BlobStore 一样按内容校验和存放（renditions/ab/<校验和>_<种类>_v<版本>.webp），
+内容相同的文件共享同一份副本；内容的最后一个引用被删除时一并删除。
+调整尺寸或编码参数时增加 RENDITION_VERSION，旧副本在下次访问时重新生成。
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Optional
+
+from PIL import Image, ImageOps
+
+RENDITION_VERSION = 1
+THUMB_SIZE = 256
+PREVIEW_SIZE = 1600
+RENDITION_SIZES = {"thumb": THUMB_SIZE, "preview": PREVIEW_SIZE}
+WEBP_QUALITY = {"thumb": 70, "preview": 82}
+WEBP_METHOD = 4  # 0~6，越大越慢、文件越小；4 在上传路径上耗时可接受
+
+RENDITION_IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+
+
+def rendition_source_kind(file_type: str, filename: str) -> Optional[str]:
+    """可生成副本的文件类型："image"、"pdf"，其他返回 None"""
+    name = filename.lower()
+    if name.endswith('.pdf'):
+        return "pdf"
+    if file_type == 'image' and name.endswith(RENDITION_IMAGE_SUFFIXES):
+        return "image"
+    return None
+
+
+class RenditionStore:
+    """按校验和存放的缩略图/预览图"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, checksum: str, kind: str) -> Path:
+        return self.root / checksum[:2] / f"{checksum}_{kind}_v{RENDITION_VERSION}.webp"
+
+    def get(self, checksum: Optional[str], kind: str) -> Optional[Path]:
+        """已生成的副本路径，不存在时返回 None"""
+        if not checksum or kind not in RENDITION_SIZES:
+            return None
+        path = self.path_for(checksum, kind)
+        return path if path.exists() else None
+
+    def generate(self, checksum: str, source_path: str, source_kind: str) -> Dict[str, Path]:
+        """生成全部副本（已存在的跳过），返回 {种类: 路径}"""
+        paths = {kind: self.path_for(checksum, kind) for kind in RENDITION_SIZES}
+        if all(path.exists() for path in paths.values()):
+            return paths
+
+        # 先得到一张长边不超过 PREVIEW_SIZE 的图，缩略图再由它缩小，原图只解码一次
+        image = self._load_pdf_page(source_path) if source_kind == "pdf" else self._load_image(source_path)
+        try:
+            for kind in sorted(RENDITION_SIZES, key=RENDITION_SIZES.get, reverse=True):
+                image.thumbnail((RENDITION_SIZES[kind], RENDITION_SIZES[kind]), Image.Resampling.LANCZOS)
+                if not paths[kind].exists():
+                    self._save_webp(image, paths[kind], WEBP_QUALITY[kind])
+        finally:
+            image.close()
+        return paths
+
+    def remove(self, checksum: Optional[str]):
+        """删除内容的全部副本（内容的最后一个引用被删除后调用）"""
+        if not checksum:
+            return
+        for kind in RENDITION_SIZES:
+            self.path_for(checksum, kind).unlink(missing_ok=True)
+
+    @staticmethod
+    def _load_image(source_path: str) -> Image.Image:
+        """解码图片：JPEG 用 draft 直接按 1/2~1/8 缩小解码，按EXIF方向摆正，统一为 RGB/RGBA"""
+        with Image.open(source_path) as image:
+            image.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+        image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.Resampling.LANCZOS)
+        return image
+
+    @staticmethod
+    def _load_pdf_page(source_path: str) -> Image.Image:
+        """按预览尺寸渲染PDF第一页（倍数由页面大小决定，不渲染多余的像素）"""
+        import fitz
+        with fitz.open(source_path) as doc:
+            if len(doc) == 0:
+                raise ValueError("PDF没有页面")
+            page = doc[0]
+            zoom = PREVIEW_SIZE / max(page.rect.width, page.rect.height, 1)
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return Image.frombytes('RGB', (pix.width, pix.height), pix.samples)
+
+    @staticmethod
+    def _save_webp(image: Image.Image, path: Path, quality: int):
+        """先写临时文件再 os.replace，并发生成同一副本时读者不会读到半个文件"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+        try:
+            image.save(tmp_path, 'WEBP', quality=quality, method=WEBP_METHOD)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
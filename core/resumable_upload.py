@@ -0,0 +1,242 @@
+"""分块断点续传上传引擎
+
+- 会话键：内容指纹（文件大小 + 开头/结尾各1MB 的 BLAKE2b），同名不同内容不会互相续传，
+  改名后的同一文件可以续传
+- 临时文件在整个上传过程中只打开一次，按偏移量 pwrite 写入，可多线程乱序写入分块
+  （没有 os.pwrite 的平台如Windows，退化为加锁的 seek + write）
+- 每个分块记录校验和（upload_chunks 表）；续传时逐块读取临时文件中的内容重新计算校验和，
+  与记录及源文件一致才跳过，临时文件被截断或损坏的分块重新写入
+- 按分块顺序读取源文件时同时计算整个文件的摘要，上传完成后不必再读一遍临时文件
+- 进度提交合并：先 fsync 临时文件，再在一个事务里批量写入已完成的分块，
+  保证数据库中记录的分块一定已经落盘
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.blob_store import new_digest
+from core.database import Database
+
+FINGERPRINT_SAMPLE_SIZE = 1024 * 1024  # 指纹取样：开头和结尾各1MB
+PROGRESS_COMMIT_INTERVAL = 1.0  # 进度最多每秒提交一次
+PROGRESS_COMMIT_CHUNKS = 64  # 或每完成64个分块提交一次
+
+
+def content_fingerprint(source: BinaryIO, size: int) -> str:
+    """上传会话的内容指纹（只读取开头和结尾，不扫描整个文件）"""
+    digest = new_digest()
+    digest.update(str(size).encode())
+    source.seek(0)
+    digest.update(source.read(FINGERPRINT_SAMPLE_SIZE))
+    if size > FINGERPRINT_SAMPLE_SIZE:
+        source.seek(max(size - FINGERPRINT_SAMPLE_SIZE, FINGERPRINT_SAMPLE_SIZE))
+        digest.update(source.read(FINGERPRINT_SAMPLE_SIZE))
+    return digest.hexdigest()
+
+
+def _chunk_checksum(data) -> str:
+    digest = new_digest()
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class _ChunkFile:
+    """整个上传期间保持打开的临时文件，按偏移量写入（线程安全）"""
+
+    def __init__(self, path: Path, size: int):
+        flags = os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0)
+        self.fd = os.open(path, flags, 0o644)
+        self._lock = None if hasattr(os, 'pwrite') else threading.Lock()
+        self.original_size = os.fstat(self.fd).st_size
+        if os.fstat(self.fd).st_size != size:
+            os.ftruncate(self.fd, size)
+
+    def write_at(self, data: memoryview, offset: int):
+        if self._lock is None:
+            while data:
+                written = os.pwrite(self.fd, data, offset)
+                data, offset = data[written:], offset + written
+        else:
+            with self._lock:
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                while data:
+                    data = data[os.write(self.fd, data):]
+
+    def read_at(self, offset: int, length: int) -> bytes:
+        if self._lock is None:
+            return os.pread(self.fd, length, offset)
+        with self._lock:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            return os.read(self.fd, length)
+
+    def sync(self):
+        os.fsync(self.fd)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ResumableUploader:
+    """把可随机读取的源（UploadedFile / 打开的文件）分块写入临时文件，支持中断后续传"""
+
+    def __init__(self, db: Database, tmp_dir: Path):
+        self.db = db
+        self.tmp_dir = Path(tmp_dir)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+
+    def _open_session(self, filename: str, size: int, fingerprint: str, chunk_size: int) -> Tuple[int, Path, int]:
+        """获取或创建上传会话，返回 (progress_id, 临时文件路径, 分块大小)
+
+        续传时沿用会话创建时的分块大小，分块编号才能对应。
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute('''
+                SELECT id, temp_path, chunk_size FROM upload_progress WHERE fingerprint = ?
+            ''', (fingerprint,)).fetchone()
+            if row:
+                return row[0], Path(row[1]), row[2]
+            temp_path = self.tmp_dir / f"{fingerprint}.upload"
+            cursor = conn.execute('''
+                INSERT INTO upload_progress (filename, total_size, uploaded_size, chunk_size, fingerprint, temp_path)
+                VALUES (?, ?, 0, ?, ?, ?)
+            ''', (filename, size, chunk_size, fingerprint, str(temp_path)))
+            return cursor.lastrowid, temp_path, chunk_size
+
+    def _recorded_chunks(self, progress_id: int) -> Dict[int, str]:
+        rows = self.db.connect().execute(
+            'SELECT chunk_index, checksum FROM upload_chunks WHERE progress_id = ?', (progress_id,)
+        ).fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _read_chunk(source: BinaryIO, buffer: Optional[memoryview], offset: int, length: int):
+        if buffer is not None:
+            return buffer[offset:offset + length]
+        source.seek(offset)
+        return memoryview(source.read(length))
+
+    def upload(self, source: BinaryIO, filename: str, size: int, chunk_size: int = 4 * 1024 * 1024,
+               parallel: int = 1, on_progress: Optional[Callable[[int, int], None]] = None) -> Tuple[int, Path, str]:
+        """上传（或续传）源文件到临时文件
+
+        Args:
+            source: 可 seek 的二进制源；有 getbuffer() 时直接切片内存，不额外复制
+            filename: 原始文件名（仅用于显示进度）
+            size: 源文件大小
+            chunk_size: 新会话的分块大小
+            parallel: 并行写入分块的线程数（1 为顺序写入）
+            on_progress: 进度回调 (已上传字节数, 总字节数)，在每次提交进度时调用
+
+        Returns:
+            (progress_id, 已完整写入并 fsync 的临时文件路径, 整个文件的十六进制摘要)
+        """
+        fingerprint = content_fingerprint(source, size)
+        progress_id, temp_path, chunk_size = self._open_session(filename, size, fingerprint, chunk_size)
+        buffer = source.getbuffer() if hasattr(source, 'getbuffer') else None
+        chunk_count = max((size + chunk_size - 1) // chunk_size, 1)
+
+        recorded = self._recorded_chunks(progress_id) if temp_path.exists() else {}
+        chunk_file = _ChunkFile(temp_path, size)
+        file_digest = new_digest()
+        done_bytes = 0
+        verified = 0
+
+        def chunks_to_write() -> Iterator[Tuple[int, memoryview]]:
+            """按顺序读取源文件的每个分块并累积整个文件的摘要，产出需要写入的分块
+
+            已记录的分块只有在临时文件中的内容（超出中断前文件长度的部分不算）、记录的校验和、
+            源文件三者一致时才跳过。
+            """
+            nonlocal done_bytes, verified
+            for index in range(chunk_count):
+                offset = index * chunk_size
+                length = min(chunk_size, size - offset)
+                data = self._read_chunk(source, buffer, offset, length)
+                file_digest.update(data)
+                checksum = recorded.get(index)
+                if (checksum and offset + length <= chunk_file.original_size
+                        and checksum == _chunk_checksum(chunk_file.read_at(offset, length))
+                        and checksum == _chunk_checksum(data)):
+                    done_bytes += length
+                    verified += 1
+                    continue
+                yield index, data
+
+        pending: List[Tuple[int, int, int, str]] = []  # (chunk_index, offset, size, checksum)
+        last_commit = time.monotonic()
+
+        def commit_progress():
+            nonlocal last_commit
+            if not pending:
+                return
+            chunk_file.sync()
+            with self.db.transaction() as conn:
+                conn.executemany('''
+                    INSERT OR REPLACE INTO upload_chunks (progress_id, chunk_index, chunk_offset, size, checksum)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', [(progress_id, *chunk) for chunk in pending])
+                conn.execute('UPDATE upload_progress SET uploaded_size = ? WHERE id = ?', (done_bytes, progress_id))
+            pending.clear()
+            last_commit = time.monotonic()
+            if on_progress:
+                on_progress(done_bytes, size)
+
+        def write_chunk(index: int, data: memoryview) -> Tuple[int, int, int, str]:
+            offset = index * chunk_size
+            chunk_file.write_at(data, offset)
+            return index, offset, len(data), _chunk_checksum(data)
+
+        def chunk_done(chunk: Tuple[int, int, int, str]):
+            nonlocal done_bytes
+            pending.append(chunk)
+            done_bytes += chunk[2]
+            if (len(pending) >= PROGRESS_COMMIT_CHUNKS
+                    or time.monotonic() - last_commit >= PROGRESS_COMMIT_INTERVAL):
+                commit_progress()
+
+        try:
+            if parallel <= 1:
+                for index, data in chunks_to_write():
+                    chunk_done(write_chunk(index, data))
+            else:
+                # 同时在途的分块数有上限，源不在内存中时也只占用有限的缓冲
+                with ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="upload") as pool:
+                    in_flight = set()
+                    for index, data in chunks_to_write():
+                        in_flight.add(pool.submit(write_chunk, index, data))
+                        if len(in_flight) >= parallel * 2:
+                            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                chunk_done(future.result())
+                    for future in in_flight:
+                        chunk_done(future.result())
+            commit_progress()
+        finally:
+            # 中断时已写入但未提交的分块下次会重新写入
+            chunk_file.close()
+
+        if recorded:
+            print(f"[DEBUG] ResumableUploader: 续传 {filename}，已校验 {verified}/{len(recorded)} 个已记录分块，"
+                  f"重新写入 {chunk_count - verified} 个")
+        return progress_id, temp_path, file_digest.hexdigest()
+
+    def finish(self, conn, progress_id: int):
+        """上传完成后删除会话记录（在登记 files 记录的同一事务中调用）"""
+        conn.execute('DELETE FROM upload_chunks WHERE progress_id = ?', (progress_id,))
+        conn.execute('DELETE FROM upload_progress WHERE id = ?', (progress_id,))
+
+    def cancel(self, filename: str) -> int:
+        """取消某个文件名的所有上传会话并删除临时文件，返回取消的会话数"""
+        with self.db.transaction() as conn:
+            rows = conn.execute(
+                'SELECT id, temp_path FROM upload_progress WHERE filename = ?', (filename,)
+            ).fetchall()
+            for progress_id, _ in rows:
+                self.finish(conn, progress_id)
+        for _, temp_path in rows:
+            if temp_path:
+                Path(temp_path).unlink(missing_ok=True)
+        return len(rows)
@@ -3,14 +3,13 @@ import streamlit as st
 import pandas as pd
 import os
 import json
-import hashlib
 import mimetypes
 import base64
 import io
 import time
 import sqlite3
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
 import zipfile
 import shutil
 from pathlib import Path
@@ -33,11 +32,27 @@ except ImportError:
     SMART_REPORT_AVAILABLE = False
 
 from config.settings import INDUSTRY_KEYWORDS, INDUSTRY_ENGLISH_MAPPING
+from core.database import get_database
+from core.blob_store import BlobStore, INGEST_CHUNK_SIZE, new_digest
+from core.migrations import migrate
+from core.resumable_upload import ResumableUploader
+from core.job_queue import JobContext, PRIORITY_HIGH, get_job_queue, register_handler
+from core.analysis_cache import AnalysisCache, pipeline_version
+from core.ocr_pages import OCRPageStore
+from core.renditions import RENDITION_SIZES, RenditionStore, rendition_source_kind
+from core.table_cache import TABLE_CACHE_VERSION, TableCache
 from utils.dependencies import (
     PDF_AVAILABLE, OCR_AVAILABLE, ML_AVAILABLE, 
     TRANSFORMERS_AVAILABLE, OPENAI_AVAILABLE,
     TESSERACT_AVAILABLE
 )
+from utils.ocr_manager import OCREngine, OCRManager, classify_pdf_page, get_ocr_manager
+from utils.image_preprocess import PREPROCESS_VERSION, preprocess_enabled
+from utils.ocr_layout import LAYOUT_FORMAT_VERSION, OCRLayout
+from utils.table_text import CSV_CHUNK_ROWS, TEXT_BUDGET_CHARS, TableTextRenderer
+from utils.csv_sniff import dumps_dialect, loads_dialect, read_csv_options, sniff_csv
+from utils.column_sketch import PROFILE_VERSION, TableProfile
+from utils.workbook import Workbook
 
 # 导入PDF支持库
 if PDF_AVAILABLE:
@@ -60,7 +75,51 @@ else:
     pytesseract = None
     Image = None
 
+# ==================== AI分析流水线配置 ====================
+# 以下常量与关键词表一起决定分析缓存的 pipeline_version，修改任何一项都会使旧的缓存结果失效。
+# 提取/分类逻辑本身有行为变化时，把 ANALYSIS_PIPELINE_VERSION 加一。
+ANALYSIS_PIPELINE_VERSION = 7
+ANALYSIS_TEXT_LIMIT = 8000  # 发送给DeepSeek的文本长度上限
+ANALYSIS_CHART_ROWS = 10000  # 问答页数据图表最多读取的行数（统计信息来自全表的列草图）
+ANALYSIS_MAX_TOKENS = 4000
+ANALYSIS_TEMPERATURE = 0.7
+
+ANALYSIS_SYSTEM_PROMPT = """You are a professional document analysis assistant. Please analyze the user's uploaded file and provide the following information in a structured format:
+1. File type and main content overview
+2. Industry classification: Please classify this document into ONE of these categories:
+   - Planting (crop cultivation, agriculture, farming)
+   - Livestock (animal husbandry, cattle, poultry)
+   - Inputs-Soil (fertilizer, soil testing, agricultural inputs)
+   - Agri-Finance (agricultural finance, insurance, credit)
+   - SupplyChain-Storage (supply chain, logistics, warehouse)
+   - Climate-RemoteSensing (climate, weather, remote sensing, NDVI, EVI)
+   - Agri-IoT (IoT sensors, irrigation, smart agriculture)
+   If none of these categories fit, respond with "Unclassified"
+3. Key information extraction
+4. File summary (within 200 words)
+
+IMPORTANT: Please clearly state the industry classification in your response, for example: "Industry Classification: Planting" or "Industry: Livestock"
+
+Please answer in English, with clear and organized format."""
+
+ANALYSIS_USER_PROMPT = """Please analyze the following file content:
+
+{content}
+
+Please provide detailed analysis results, and clearly state the Industry Classification. Make sure to provide a complete and comprehensive analysis."""
+
+
 class CloudStorageManager:
+    # 文件列表分页
+    DEFAULT_PAGE_SIZE = 50
+    PAGE_COUNT_ESTIMATE_CAP = 1000  # count_mode="estimate" 时最多统计的行数
+
+    # 全文检索
+    SEARCH_RESULT_LIMIT = 100
+    SEARCH_COLUMN_WEIGHTS = (10.0, 1.0, 1.0)  # bm25 权重：filename, body, ocr
+    SEARCH_HIGHLIGHT = ("**", "**")  # snippet 高亮标记（Streamlit markdown 加粗）
+    SEARCH_SNIPPET_TOKENS = 24  # trigram 分词下约等于片段字符数
+
     def __init__(self):
         # 云部署配置
         import os
@@ -84,8 +143,17 @@ class CloudStorageManager:
 
         # 将路径转换为字符串，确保在Windows上正常工作
         self.db_path = str(self.storage_dir / "storage.db")
+        self.db = get_database(self.db_path)
         self.init_database()
 
+        # 内容寻址存储（重复上传只记录元数据）
+        self.blob_store = BlobStore(self.storage_dir / "blobs")
+        self.resumable_uploader = ResumableUploader(self.db, self.blob_store.tmp_dir)
+        self.analysis_cache = AnalysisCache(self.db)
+        self.ocr_pages = OCRPageStore(self.db)
+        self.renditions = RenditionStore(self.storage_dir / "renditions")
+        self.table_cache = TableCache(self.storage_dir / "tables")
+
         # 初始化AI功能
         self.init_ai_models()
 
@@ -95,98 +163,13 @@ class CloudStorageManager:
         self.latest_remote_sensing: Optional[Dict[str, Any]] = None
 
     def init_database(self):
-        """初始化数据库"""
+        """初始化数据库（按版本执行迁移，见 core/migrations.py）"""
         try:
             # 确保数据库目录存在（双重保险）
             db_path_obj = Path(self.db_path)
             db_path_obj.parent.mkdir(parents=True, exist_ok=True)
-            
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 文件表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT NOT NULL,
-                    file_path TEXT NOT NULL,
-                    file_size INTEGER,
-                    file_type TEXT,
-                    folder_id INTEGER,
-                    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    last_modified TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    checksum TEXT,
-                    is_cached BOOLEAN DEFAULT FALSE,
-                    FOREIGN KEY (folder_id) REFERENCES folders (id)
-                )
-            ''')
-
-            # 文件夹表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS folders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    folder_name TEXT NOT NULL,
-                    parent_folder_id INTEGER,
-                    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (parent_folder_id) REFERENCES folders (id)
-                )
-            ''')
 
-            # 上传进度表（用于断点续传）
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS upload_progress (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT NOT NULL,
-                    total_size INTEGER,
-                    uploaded_size INTEGER,
-                    chunk_size INTEGER,
-                    checksum TEXT,
-                    upload_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            # AI分析结果表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS ai_analysis (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    file_id INTEGER,
-                    analysis_type TEXT,
-                    industry_category TEXT,
-                    extracted_text TEXT,
-                    key_phrases TEXT,
-                    summary TEXT,
-                    confidence_score REAL,
-                    method TEXT,
-                    analysis_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (file_id) REFERENCES files (id)
-                )
-            ''')
-
-            # 迁移：若旧表无 method 列则补充
-            try:
-                cursor.execute("PRAGMA table_info(ai_analysis)")
-                cols = [row[1] for row in cursor.fetchall()]
-                if 'method' not in cols:
-                    cursor.execute('ALTER TABLE ai_analysis ADD COLUMN method TEXT')
-                # 添加ocr_content字段用于存储完整的OCR内容
-                if 'ocr_content' not in cols:
-                    cursor.execute('ALTER TABLE ai_analysis ADD COLUMN ocr_content TEXT')
-            except Exception:
-                pass
-
-            # 行业分类表
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS industry_categories (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    category_name TEXT UNIQUE,
-                    keywords TEXT,
-                    description TEXT,
-                    created_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-
-            conn.commit()
-            conn.close()
+            migrate(self.db)
         except sqlite3.Error as e:
             import os
             error_msg = f"数据库初始化失败: {str(e)}\n数据库路径: {self.db_path}\n目录存在: {os.path.exists(db_path_obj.parent)}"
@@ -423,17 +406,14 @@ class CloudStorageManager:
 
     def init_default_categories(self):
         """初始化默认行业分类"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-
-        for category, keywords in self.industry_keywords.items():
-            cursor.execute('''
-                INSERT OR IGNORE INTO industry_categories (category_name, keywords, description)
-                VALUES (?, ?, ?)
-            ''', (category, json.dumps(keywords, ensure_ascii=False), f"{category}相关文档"))
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
 
-        conn.commit()
-        conn.close()
+            for category, keywords in self.industry_keywords.items():
+                cursor.execute('''
+                    INSERT OR IGNORE INTO industry_categories (category_name, keywords, description)
+                    VALUES (?, ?, ?)
+                ''', (category, json.dumps(keywords, ensure_ascii=False), f"{category}相关文档"))
 
     def _to_english_category(self, category: str) -> str:
         """将分类名称转换为英文（统一存储格式）"""
@@ -544,33 +524,42 @@ class CloudStorageManager:
         """生成智能报告和图表"""
         try:
             # 获取文件信息
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             cursor.execute('SELECT file_path, file_type, filename FROM files WHERE id = ?', (file_id,))
             result = cursor.fetchone()
-            conn.close()
 
             if not result:
                 return {"success": False, "error": "文件不存在"}
 
             file_path, file_type, filename = result
 
-            # 提取文本内容
-            text = self.extract_text_from_file(file_id)
-            if not text:
-                return {"success": False, "error": "无法提取文本内容"}
+            # 先查分析缓存（结构分析、数据点与图表只取决于文件内容）
+            checksum = self._file_checksum(file_id)
+            version = pipeline_version("smart_report", ANALYSIS_PIPELINE_VERSION, self._extraction_pipeline_version())
+            cached = self.analysis_cache.get(checksum, "smart_report", version, "local")
+            if cached:
+                analysis, data_points, charts = cached["analysis"], cached["data_points"], cached["charts"]
+            else:
+                # 提取文本内容（与分析共用提取结果）
+                extraction = self.get_extraction(file_id)
+                if not extraction:
+                    return {"success": False, "error": "无法提取文本内容"}
+                text = extraction["content"]
+
+                # 分析文档结构
+                analysis = self.analyze_document_structure(text)
+                analysis["full_text"] = text
 
-            # 分析文档结构
-            analysis = self.analyze_document_structure(text)
-            analysis["full_text"] = text
+                # 提取数据点
+                data_points = self.extract_data_points(text)
 
-            # 提取数据点
-            data_points = self.extract_data_points(text)
+                # 生成图表
+                charts = self.generate_charts(data_points)
 
-            # 生成图表
-            charts = self.generate_charts(data_points)
+                self.analysis_cache.put(checksum, "smart_report", version, "local",
+                                        {"analysis": analysis, "data_points": data_points, "charts": charts})
 
-            # 生成报告
+            # 生成报告（报告包含文件名，不缓存）
             report = self.create_smart_report(analysis, charts, filename)
 
             return {
@@ -584,15 +573,25 @@ class CloudStorageManager:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def call_deepseek_api(self, messages: List[Dict[str, str]], max_tokens: int = 2000, temperature: float = 0.7) -> Optional[str]:
-        """调用DeepSeek API进行对话"""
+    def call_deepseek_api(self, messages: List[Dict[str, str]], max_tokens: int = 2000, temperature: float = 0.7,
+                          errors: Optional[List[str]] = None) -> Optional[str]:
+        """调用DeepSeek API进行对话
+
+        errors: 后台任务中没有页面可显示，传入列表时错误与警告追加到其中，不调用 st.error / st.warning
+        """
+        def notify(message: str, show: Callable[[str], Any] = st.error):
+            if errors is not None:
+                errors.append(message)
+            else:
+                show(message)
+
         if not self.deepseek_api_key:
             return None
         
         # 清理API密钥（去除可能的空格和换行符）
         api_key = self.deepseek_api_key.strip()
         if not api_key:
-            st.error("DeepSeek API key is empty, please check configuration")
+            notify("DeepSeek API key is empty, please check configuration")
             return None
         
         try:
@@ -610,7 +609,7 @@ class CloudStorageManager:
             }
             
             # 调试信息（仅在开发时显示）
-            if st.session_state.get('debug_mode', False):
+            if errors is None and st.session_state.get('debug_mode', False):
                 st.write(f"API URL: {self.deepseek_api_url}")
                 st.write(f"Model: {self.deepseek_model}")
                 st.write(f"API Key (前10位): {api_key[:10]}...")
@@ -632,7 +631,7 @@ class CloudStorageManager:
                     finish_reason = choice.get('finish_reason', '')
                     if finish_reason == 'length':
                         # 响应因达到max_tokens限制而被截断
-                        st.warning("⚠️ AI response was truncated due to token limit. Consider increasing max_tokens or asking a more specific question.")
+                        notify("⚠️ AI response was truncated due to token limit. Consider increasing max_tokens or asking a more specific question.", st.warning)
                         # 仍然返回内容，但添加提示
                         return content + "\n\n[Note: Response may be incomplete due to token limit]"
                     elif finish_reason == 'stop':
@@ -642,7 +641,7 @@ class CloudStorageManager:
                         # 其他情况，仍然返回内容
                         return content
                 else:
-                    st.warning(f"API response format abnormal: {result}")
+                    notify(f"API response format abnormal: {result}", st.warning)
                     return None
             elif response.status_code == 401:
                 error_msg = "DeepSeek API authentication failed"
@@ -652,8 +651,9 @@ class CloudStorageManager:
                         error_msg = f"Authentication failed: {error_data['error'].get('message', 'Invalid API key')}"
                 except:
                     error_msg = f"Authentication failed: {response.text}"
-                st.error(error_msg)
-                st.info("💡 Please check:\n1. Is the API key correct (in .secrets.toml)?\n2. Is the API key valid and not expired?\n3. Is the key format correct (should start with sk-)?")
+                notify(error_msg)
+                if errors is None:
+                    st.info("💡 Please check:\n1. Is the API key correct (in .secrets.toml)?\n2. Is the API key valid and not expired?\n3. Is the key format correct (should start with sk-)?")
                 return None
             else:
                 error_msg = f"DeepSeek API error: {response.status_code}"
@@ -663,17 +663,17 @@ class CloudStorageManager:
                         error_msg = f"{error_msg} - {error_data['error'].get('message', response.text)}"
                 except:
                     error_msg = f"{error_msg} - {response.text}"
-                st.error(error_msg)
+                notify(error_msg)
                 return None
                 
         except requests.exceptions.Timeout:
-            st.error("DeepSeek API request timeout, please check network connection")
+            notify("DeepSeek API request timeout, please check network connection")
             return None
         except requests.exceptions.ConnectionError:
-            st.error("Unable to connect to DeepSeek API, please check network connection")
+            notify("Unable to connect to DeepSeek API, please check network connection")
             return None
         except Exception as e:
-            st.error(f"Failed to call DeepSeek API: {str(e)}")
+            notify(f"Failed to call DeepSeek API: {str(e)}")
             return None
 
     def generate_ai_report(self, file_id: int, user_question) -> Dict[str, Any]:
@@ -690,11 +690,9 @@ class CloudStorageManager:
             
             start_time = time.time()
             # 获取文件信息
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             cursor.execute('SELECT file_path, file_type, filename FROM files WHERE id = ?', (file_id,))
             result = cursor.fetchone()
-            conn.close()
 
             if not result:
                 return {"success": False, "error": "文件不存在"}
@@ -709,249 +707,74 @@ class CloudStorageManager:
             # ========== 逻辑1: Excel/CSV文件 - 保留原来的分析程序 ==========
             if filename.endswith(('.xlsx', '.xls', '.csv')):
                 print(f"[DEBUG] generate_ai_report: 检测到Excel/CSV文件，使用原有分析程序")
-                df = self.extract_excel_csv(file_id)
-                if df is not None:
+                # 统计信息来自分块计算并缓存的列草图，不再整表载入后 df.describe()
+                profile = self.get_table_profile(file_id)
+                if profile is not None:
+                    # 图表只使用前 ANALYSIS_CHART_ROWS 行，内存有上限
+                    df, row_count = self.get_table_preview(file_id, rows=ANALYSIS_CHART_ROWS)
                     # 将DataFrame转换为文本描述
                     file_content = f"文件类型: Excel/CSV\n"
                     file_content += f"文件名: {filename}\n"
-                    file_content += f"数据形状: {df.shape[0]}行 x {df.shape[1]}列\n"
-                    file_content += f"列名: {', '.join(df.columns.tolist())}\n\n"
+                    sheets = self.list_sheets(file_id)
+                    if len(sheets) > 1:
+                        file_content += f"工作表: {', '.join(info['name'] for info in sheets)}（以下为第一个工作表）\n"
+                    file_content += f"数据形状: {row_count}行 x {len(profile.columns)}列\n"
+                    file_content += f"列名: {', '.join(profile.columns)}\n\n"
                     file_content += f"数据预览（前10行）:\n{df.head(10).to_string()}\n\n"
-                    file_content += f"数据统计信息:\n{df.describe().to_string()}\n\n"
+                    file_content += f"数据统计信息:\n{profile.summary_text()}\n\n"
                     # 如果数据量不大，包含完整数据
-                    if len(df) <= 100:
+                    if row_count <= 100:
                         file_content += f"完整数据:\n{df.to_string()}\n"
                     print(f"[DEBUG] generate_ai_report: Excel/CSV数据提取完成，内容长度: {len(file_content)}")
                 else:
                     return {"success": False, "error": "无法读取Excel/CSV文件，请确保文件格式正确"}
             
-            # ========== 逻辑2: 图片或PDF文件 - 优先使用数据库中的OCR内容 ==========
-            elif file_type == 'image' or (file_type == 'application' and filename.endswith('.pdf')):
-                print(f"[DEBUG] generate_ai_report: 检测到图片或PDF文件，优先使用数据库中的OCR内容")
-                
-                # 先尝试从数据库读取OCR内容
-                conn_ocr = sqlite3.connect(self.db_path)
-                cursor_ocr = conn_ocr.cursor()
-                cursor_ocr.execute('''
-                    SELECT ocr_content FROM ai_analysis 
-                    WHERE file_id = ? AND ocr_content IS NOT NULL AND ocr_content != ''
-                    ORDER BY analysis_time DESC LIMIT 1
-                ''', (file_id,))
-                ocr_result = cursor_ocr.fetchone()
-                conn_ocr.close()
-                
-                if ocr_result and ocr_result[0]:
-                    # 使用数据库中的OCR内容
-                    ocr_text = ocr_result[0]
-                    print(f"[DEBUG] generate_ai_report: ✅ 从数据库读取OCR内容，长度: {len(ocr_text)}")
-                    file_content = f"File Type: {'Image' if file_type == 'image' else 'PDF'}\n"
-                    file_content += f"Filename: {filename}\n\n"
-                    file_content += f"OCR Recognized Text:\n{ocr_text}"
-                    st.info("✅ 使用已保存的OCR内容（无需重新识别）")
-                elif OCR_AVAILABLE and TESSERACT_AVAILABLE:
-                    # 数据库中没有OCR内容，执行OCR提取
-                    print(f"[DEBUG] generate_ai_report: 数据库中没有OCR内容，开始执行OCR提取")
-                
-                    try:
-                        # 延迟加载OCR模型
-                        if not self._load_ocr_model():
-                            print(f"[DEBUG] generate_ai_report: OCR模型加载失败，跳过OCR提取")
-                            file_content = f"File Type: {'Image' if file_type == 'image' else 'PDF'}\n"
-                            file_content += f"Filename: {filename}\n"
-                            file_content += f"Note: OCR model loading failed, unable to extract text from file."
-                            st.warning("⚠️ OCR model loading failed, skipping OCR extraction")
-                        else:
-                            # 对于PDF文件，需要先转换为图片
-                            ocr_file_path = file_path
-                            is_pdf = filename.endswith('.pdf')
-                            temp_images = []
-                            
-                            if is_pdf and PDF_AVAILABLE and fitz is not None:
-                                print(f"[DEBUG] generate_ai_report: PDF文件，先转换为图片...")
-                                try:
-                                    doc = fitz.open(file_path)
-                                    all_ocr_text = []
-                                    
-                                    # 限制PDF页数，避免内存溢出
-                                    max_pages = min(len(doc), 10)  # 最多处理10页
-                                    if len(doc) > max_pages:
-                                        print(f"[DEBUG] generate_ai_report: PDF有{len(doc)}页，只处理前{max_pages}页以节省内存")
-                                        st.info(f"📄 PDF has {len(doc)} pages, processing first {max_pages} pages to save memory")
-                                    
-                                    with st.spinner("🔍 Converting PDF to images and recognizing text..."):
-                                        for page_num in range(max_pages):
-                                            try:
-                                                page = doc[page_num]
-                                                # 降低缩放比例以节省内存（从2倍降到1.5倍）
-                                                pix = page.get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
-                                                img_data = pix.tobytes("png")
-                                                
-                                                # 检查图片大小，如果太大则跳过
-                                                img_size_mb = len(img_data) / (1024 * 1024)
-                                                if img_size_mb > 10:  # 如果单页图片超过10MB，跳过
-                                                    print(f"[DEBUG] generate_ai_report: PDF第{page_num + 1}页图片过大({img_size_mb:.2f}MB)，跳过")
-                                                    continue
-                                                
-                                                # 保存临时图片
-                                                import tempfile
-                                                import os
-                                                temp_img = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                                                temp_img.write(img_data)
-                                                temp_img.close()
-                                                temp_images.append(temp_img.name)
-                                                
-                                                # 对每页进行OCR
-                                                print(f"[DEBUG] generate_ai_report: 处理PDF第 {page_num + 1} 页...")
-                                                try:
-                                                    page_results = self._ocr_readtext(temp_img.name)
-                                                    
-                                                    if page_results and len(page_results) > 0:
-                                                        page_text = ' '.join([result[1] for result in page_results])
-                                                        all_ocr_text.append(f"Page {page_num + 1}:\n{page_text}")
-                                                except MemoryError as e:
-                                                    print(f"[DEBUG] generate_ai_report: PDF第{page_num + 1}页OCR内存不足: {str(e)}")
-                                                    st.warning(f"⚠️ Page {page_num + 1} OCR failed due to insufficient memory")
-                                                    break  # 内存不足时停止处理
-                                                except Exception as e:
-                                                    print(f"[DEBUG] generate_ai_report: PDF第{page_num + 1}页OCR失败: {str(e)}")
-                                                    # 继续处理下一页
-                                                    continue
-                                            except MemoryError as e:
-                                                print(f"[DEBUG] generate_ai_report: PDF第{page_num + 1}页处理内存不足: {str(e)}")
-                                                st.warning(f"⚠️ Page {page_num + 1} processing failed due to insufficient memory")
-                                                break
-                                            except Exception as e:
-                                                print(f"[DEBUG] generate_ai_report: PDF第{page_num + 1}页处理失败: {str(e)}")
-                                                continue
-                                    
-                                    doc.close()
-                                    
-                                    # 清理临时图片
-                                    for temp_img_path in temp_images:
-                                        try:
-                                            os.unlink(temp_img_path)
-                                        except:
-                                            pass
-                                    
-                                    if all_ocr_text:
-                                        ocr_text = '\n\n'.join(all_ocr_text)
-                                        print(f"[DEBUG] generate_ai_report: ✅ PDF OCR识别成功，共 {len(all_ocr_text)} 页，文字长度: {len(ocr_text)}")
-                                        file_content = f"File Type: PDF\n"
-                                        file_content += f"Filename: {filename}\n\n"
-                                        file_content += f"OCR Recognized Text:\n{ocr_text}"
-                                        st.success(f"✅ PDF OCR recognition successful, recognized {len(all_ocr_text)} pages")
-                                    else:
-                                        print(f"[DEBUG] generate_ai_report: ⚠️ PDF OCR未识别到文字")
-                                        file_content = f"File Type: PDF\n"
-                                        file_content += f"Filename: {filename}\n"
-                                        file_content += f"Note: No text content recognized in PDF, may be a scanned PDF or unclear text."
-                                        st.warning("⚠️ PDF OCR did not recognize any text content")
-                                        
-                                except Exception as pdf_error:
-                                    print(f"[DEBUG] generate_ai_report: PDF处理失败: {str(pdf_error)}")
-                                    # 清理临时图片
-                                    for temp_img_path in temp_images:
-                                        try:
-                                            import os
-                                            os.unlink(temp_img_path)
-                                        except:
-                                            pass
-                                    raise pdf_error
-                            else:
-                                # 图片文件直接OCR
-                                print(f"[DEBUG] generate_ai_report: 开始OCR识别图片: {file_path}")
-                                
-                                # 检查图片大小和尺寸，如果太大则缩放
-                                try:
-                                    from PIL import Image
-                                    img = Image.open(file_path)
-                                    img_width, img_height = img.size
-                                    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-                                    
-                                    print(f"[DEBUG] generate_ai_report: 图片尺寸: {img_width}x{img_height}, 文件大小: {file_size_mb:.2f}MB")
-                                    
-                                    # 如果图片太大，进行缩放
-                                    max_dimension = 2000  # 最大尺寸2000像素
-                                    max_file_size_mb = 5  # 最大文件大小5MB
-                                    
-                                    if img_width > max_dimension or img_height > max_dimension or file_size_mb > max_file_size_mb:
-                                        print(f"[DEBUG] generate_ai_report: 图片过大，进行缩放...")
-                                        st.info(f"📷 Image is large ({img_width}x{img_height}, {file_size_mb:.1f}MB), resizing for OCR...")
-                                        
-                                        # 计算缩放比例
-                                        scale = min(max_dimension / img_width, max_dimension / img_height)
-                                        new_width = int(img_width * scale)
-                                        new_height = int(img_height * scale)
-                                        
-                                        # 缩放图片
-                                        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                                        
-                                        # 保存到临时文件
-                                        import tempfile
-                                        temp_img_path = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                                        temp_img_path.close()
-                                        img_resized.save(temp_img_path.name, 'PNG')
-                                        
-                                        ocr_file_path = temp_img_path.name
-                                        temp_images.append(ocr_file_path)
-                                        print(f"[DEBUG] generate_ai_report: 图片已缩放至: {new_width}x{new_height}")
-                                    else:
-                                        ocr_file_path = file_path
-                                except Exception as e:
-                                    print(f"[DEBUG] generate_ai_report: 图片检查失败: {str(e)}，使用原始文件")
-                                    ocr_file_path = file_path
-                                
-                                try:
-                                    with st.spinner("🔍 Recognizing text in image..."):
-                                        results = self._ocr_readtext(ocr_file_path)
-                                    print(f"[DEBUG] generate_ai_report: OCR识别完成，结果数量: {len(results) if results else 0}")
-                                except MemoryError as e:
-                                    print(f"[DEBUG] generate_ai_report: OCR识别内存不足: {str(e)}")
-                                    st.error("❌ OCR recognition failed: Insufficient memory. The image may be too large.")
-                                    file_content = f"File Type: Image\n"
-                                    file_content += f"Filename: {filename}\n"
-                                    file_content += f"Note: OCR recognition failed due to insufficient memory. Please try with a smaller image or disable OCR."
-                                    raise  # 重新抛出异常以便外层处理
-                                except Exception as e:
-                                    print(f"[DEBUG] generate_ai_report: OCR识别失败: {str(e)}")
-                                    raise  # 重新抛出异常以便外层处理
-                                
-                                if results and len(results) > 0:
-                                    ocr_text = ' '.join([result[1] for result in results])
-                                    print(f"[DEBUG] generate_ai_report: ✅ OCR识别成功，文字长度: {len(ocr_text)}")
-                                    print(f"[DEBUG] generate_ai_report: OCR文字预览: {ocr_text[:200]}...")
-                                    
-                                    file_content = f"File Type: Image\n"
-                                    file_content += f"Filename: {filename}\n\n"
-                                    file_content += f"OCR Recognized Text:\n{ocr_text}"
-                                    
-                                    st.success(f"✅ OCR recognition successful, recognized {len(results)} text regions")
-                                else:
-                                    print(f"[DEBUG] generate_ai_report: ⚠️ OCR未识别到文字")
-                                    file_content = f"File Type: Image\n"
-                                    file_content += f"Filename: {filename}\n"
-                                    file_content += f"Note: No text content recognized in image, may be a pure image or unclear text."
-                                    st.warning("⚠️ OCR did not recognize any text content")
-                            
-                    except Exception as e:
-                        print(f"[DEBUG] generate_ai_report: ❌ OCR识别失败: {str(e)}")
-                        import traceback
-                        print(f"[DEBUG] generate_ai_report: 错误堆栈:\n{traceback.format_exc()}")
-                        file_content = f"File Type: {'Image' if file_type == 'image' else 'PDF'}\n"
-                        file_content += f"Filename: {filename}\n"
-                        file_content += f"Note: OCR recognition failed ({str(e)}), unable to extract text from file."
-                        st.error(f"❌ OCR recognition failed: {str(e)}")
+            # ========== 逻辑2: PDF文件 - 使用文字层，只对没有文字层的页OCR ==========
+            elif file_type == 'application' and filename.endswith('.pdf'):
+                print(f"[DEBUG] generate_ai_report: 检测到PDF文件，读取文字层并OCR扫描页")
+                # OCR结果按页保存并按内容缓存：已识别过的页直接复用，中断后从未完成的页继续
+                with st.spinner("🔍 Reading PDF text and recognizing scanned pages..."):
+                    progress_bar = st.progress(0.0)
+                    extraction = self.get_extraction(
+                        file_id, lambda fraction, message: progress_bar.progress(fraction, text=message))
+                    progress_bar.empty()
+                pdf_text, ocr_text = extraction["content"], extraction["ocr_content"]
+
+                file_content = f"File Type: PDF\n"
+                file_content += f"Filename: {filename}\n"
+                if pdf_text and not pdf_text.startswith("(No extractable text"):
+                    print(f"[DEBUG] generate_ai_report: ✅ PDF文本提取成功，文字长度: {len(pdf_text)}，其中OCR: {len(ocr_text) if ocr_text else 0}")
+                    file_content += f"\nExtracted Text:\n{pdf_text}"
                 else:
+                    print(f"[DEBUG] generate_ai_report: ⚠️ PDF未提取到文字")
+                    file_content += f"Note: No text content recognized in PDF, may be a scanned PDF or unclear text."
+                    st.warning("⚠️ No text content recognized in PDF")
+
+            # ========== 逻辑3: 图片文件 - 使用提取结果中的OCR内容 ==========
+            elif file_type == 'image':
+                print(f"[DEBUG] generate_ai_report: 检测到图片文件，读取提取结果（OCR只在首次提取时运行）")
+                with st.spinner("🔍 Recognizing text in image..."):
+                    ocr_text = self.get_extraction(file_id)["ocr_content"]
+
+                file_content = f"File Type: Image\n"
+                file_content += f"Filename: {filename}\n"
+                if ocr_text:
+                    print(f"[DEBUG] generate_ai_report: ✅ OCR内容长度: {len(ocr_text)}")
+                    file_content += f"\nOCR Recognized Text:\n{ocr_text}"
+                elif not self._get_ocr_manager().is_available():
                     print(f"[DEBUG] generate_ai_report: OCR不可用")
-                    file_content = f"File Type: {'Image' if file_type == 'image' else 'PDF'}\n"
-                    file_content += f"Filename: {filename}\n"
                     file_content += f"Note: OCR feature unavailable, unable to recognize text in file. Please install Tesseract OCR. See INSTALL_TESSERACT.md for details."
                     st.warning("⚠️ OCR feature unavailable. Please install Tesseract OCR. See INSTALL_TESSERACT.md for details.")
+                else:
+                    print(f"[DEBUG] generate_ai_report: ⚠️ OCR未识别到文字")
+                    file_content += f"Note: No text content recognized in image, may be a pure image or unclear text."
+                    st.warning("⚠️ OCR did not recognize any text content")
             
-            # ========== 逻辑3: 文档类文件 - 直接读取文档内容 ==========
+            # ========== 逻辑4: 文档类文件 - 直接读取文档内容 ==========
             else:
                 print(f"[DEBUG] generate_ai_report: 检测到文档类文件，直接读取内容")
-                file_content = self.extract_text_from_file(file_id)
+                extraction = self.get_extraction(file_id)
+                file_content = extraction["content"] if extraction else ""
                 print(f"[DEBUG] generate_ai_report: 文档内容提取完成，长度: {len(file_content) if file_content else 0}")
                 
                 if not file_content or file_content.startswith("(No extractable text"):
@@ -1352,12 +1175,12 @@ Please answer the user's question based on the above file content."""
         return kpis
 
     def calculate_checksum(self, file_path: str) -> str:
-        """计算文件校验和"""
-        hash_md5 = hashlib.md5()
+        """计算文件校验和（与 BlobStore 相同的 BLAKE2b 摘要）"""
+        digest = new_digest()
         with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+            for chunk in iter(lambda: f.read(INGEST_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
 
     def get_file_type(self, filename: str) -> str:
         """获取文件类型"""
@@ -1369,29 +1192,24 @@ Please answer the user's question based on the above file content."""
     def upload_file(self, uploaded_file, folder_id: Optional[int] = None) -> Dict[str, Any]:
         """上传文件"""
         try:
-            # 生成唯一文件名
-            timestamp = int(time.time())
-            filename = f"{timestamp}_{uploaded_file.name}"
-            file_path = self.storage_dir / filename
-
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            # 计算文件信息
-            file_size = file_path.stat().st_size
-            checksum = self.calculate_checksum(str(file_path))
+            # 流式写入临时文件，同时计算校验和与大小（一次I/O）
+            uploaded_file.seek(0)
+            temp_path, checksum, file_size = self.blob_store.write_temp(uploaded_file)
             file_type = self.get_file_type(uploaded_file.name)
+            csv_dialect = self._sniff_upload(temp_path, uploaded_file.name)
 
-            # 保存到数据库
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO files (filename, file_path, file_size, file_type, folder_id, checksum)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (uploaded_file.name, str(file_path), file_size, file_type, folder_id, checksum))
-            conn.commit()
-            conn.close()
+            # 纳入内容寻址存储（已存在相同内容时只增加引用计数）并写入数据库
+            try:
+                with self.db.transaction() as conn:
+                    file_path = self.blob_store.put_file(conn, checksum, temp_path, uploaded_file.name)
+                    conn.execute('''
+                        INSERT INTO files (filename, file_path, file_size, file_type, folder_id, checksum, csv_dialect)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ''', (uploaded_file.name, file_path, file_size, file_type, folder_id, checksum, csv_dialect))
+            finally:
+                temp_path.unlink(missing_ok=True)
+
+            self._generate_renditions(checksum, file_path, file_type, uploaded_file.name)
 
             return {
                 "success": True,
@@ -1404,8 +1222,7 @@ Please answer the user's question based on the above file content."""
 
     def get_files(self, folder_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """获取文件列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
 
         if folder_id is None:
             # Query files with folder_id IS NULL
@@ -1437,21 +1254,118 @@ Please answer the user's question based on the above file content."""
         if files:
             print(f"[DEBUG] get_files: First file - ID: {files[0]['id']}, Name: {files[0]['filename']}, Type: {files[0]['file_type']}")
 
-        conn.close()
         return files
-    
+
+    # ==================== 分页查询（keyset） ====================
+    # 游标为上一页最后一行的 (upload_time, id)，下一页从其之后继续读取，
+    # 借助 idx_files_folder_upload 索引，第N页与第1页的开销相同（不使用OFFSET）。
+
+    @staticmethod
+    def _encode_cursor(upload_time: str, file_id: int) -> str:
+        return f"{upload_time}|{file_id}"
+
+    @staticmethod
+    def _decode_cursor(cursor: str):
+        upload_time, _, file_id = cursor.rpartition('|')
+        return upload_time, int(file_id)
+
+    @staticmethod
+    def _file_type_clause(file_type: Optional[str], prefix: str = ""):
+        """侧边栏文件类型筛选对应的SQL条件（excel按扩展名匹配），prefix 为表别名如 "f." """
+        if not file_type:
+            return None, ()
+        if file_type == 'excel':
+            return (f"(lower({prefix}filename) LIKE '%.xlsx' OR lower({prefix}filename) LIKE '%.xls' "
+                    f"OR lower({prefix}filename) LIKE '%.csv')"), ()
+        return f"{prefix}file_type = ?", (file_type,)
+
+    def _query_files_page(self, conditions: List[str], params: List[Any], cursor: Optional[str],
+                          page_size: int, count_mode: str) -> Dict[str, Any]:
+        """按 upload_time DESC, id DESC 执行一页查询
+
+        count_mode:
+            "none"     - 不统计总数
+            "exact"    - 精确 COUNT(*)（与结果集大小成正比）
+            "estimate" - 最多数到 PAGE_COUNT_ESTIMATE_CAP 行，超过时只给出下限
+        """
+        where = " AND ".join(conditions) if conditions else "1"
+        page_conditions = list(conditions)
+        page_params = list(params)
+        if cursor:
+            upload_time, last_id = self._decode_cursor(cursor)
+            page_conditions.append("(upload_time, id) < (?, ?)")
+            page_params.extend([upload_time, last_id])
+        page_where = " AND ".join(page_conditions) if page_conditions else "1"
+
+        db_cursor = self.db.connect().cursor()
+        db_cursor.execute(f'''
+            SELECT id, filename, file_size, file_type, upload_time, is_cached
+            FROM files WHERE {page_where}
+            ORDER BY upload_time DESC, id DESC
+            LIMIT ?
+        ''', (*page_params, page_size + 1))
+        rows = db_cursor.fetchall()
+
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        files = [{
+            "id": row[0],
+            "filename": row[1],
+            "file_size": row[2],
+            "file_type": row[3],
+            "upload_time": row[4],
+            "is_cached": bool(row[5])
+        } for row in rows]
+
+        page = {
+            "files": files,
+            "next_cursor": self._encode_cursor(rows[-1][4], rows[-1][0]) if has_more else None,
+            "has_more": has_more,
+            "total": None,
+            "total_is_exact": False,
+        }
+        if count_mode == "exact":
+            db_cursor.execute(f'SELECT COUNT(*) FROM files WHERE {where}', tuple(params))
+            page["total"] = db_cursor.fetchone()[0]
+            page["total_is_exact"] = True
+        elif count_mode == "estimate":
+            db_cursor.execute(f'''
+                SELECT COUNT(*) FROM (SELECT 1 FROM files WHERE {where} LIMIT ?)
+            ''', (*params, self.PAGE_COUNT_ESTIMATE_CAP))
+            total = db_cursor.fetchone()[0]
+            page["total"] = total
+            page["total_is_exact"] = total < self.PAGE_COUNT_ESTIMATE_CAP
+        return page
+
+    def get_files_page(self, folder_id: Optional[int] = None, cursor: Optional[str] = None,
+                       page_size: int = DEFAULT_PAGE_SIZE, file_type: Optional[str] = None,
+                       count_mode: str = "none") -> Dict[str, Any]:
+        """分页获取文件夹中的文件
+
+        Returns:
+            {"files": [...], "next_cursor": str|None, "has_more": bool,
+             "total": int|None, "total_is_exact": bool}
+        """
+        if folder_id is None:
+            conditions, params = ["folder_id IS NULL"], []
+        else:
+            conditions, params = ["folder_id = ?"], [folder_id]
+        type_clause, type_params = self._file_type_clause(file_type)
+        if type_clause:
+            conditions.append(type_clause)
+            params.extend(type_params)
+        return self._query_files_page(conditions, params, cursor, page_size, count_mode)
+
     def get_file_by_id(self, file_id: int) -> Optional[Dict[str, Any]]:
         """通过文件ID获取文件信息（不依赖文件夹）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             cursor.execute('''
                 SELECT id, filename, file_size, file_type, upload_time, is_cached, folder_id, file_path
                 FROM files WHERE id = ?
             ''', (file_id,))
             
             result = cursor.fetchone()
-            conn.close()
             
             if result:
                 print(f"[DEBUG] get_file_by_id: Found file - ID: {result[0]}, Name: {result[1]}, Path: {result[7]}")
@@ -1477,62 +1391,130 @@ Please answer the user's question based on the above file content."""
     def create_folder(self, folder_name: str, parent_folder_id: Optional[int] = None) -> Dict[str, Any]:
         """创建文件夹"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO folders (folder_name, parent_folder_id)
-                VALUES (?, ?)
-            ''', (folder_name, parent_folder_id))
-            conn.commit()
-            folder_id = cursor.lastrowid
-            conn.close()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO folders (folder_name, parent_folder_id)
+                    VALUES (?, ?)
+                ''', (folder_name, parent_folder_id))
+                folder_id = cursor.lastrowid
 
             return {"success": True, "folder_id": folder_id}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
-    def search_files(self, query: str, file_type: Optional[str] = None) -> List[Dict[str, Any]]:
-        """搜索文件"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+    def _fts_available(self) -> bool:
+        """files_fts 全文索引是否存在（SQLite不支持FTS5 trigram时没有建表，见 migrations._ensure_files_fts）"""
+        if getattr(self, '_has_fts', None) is None:
+            cursor = self.db.connect().cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'files_fts'")
+            self._has_fts = cursor.fetchone() is not None
+        return self._has_fts
 
-        if file_type:
-            cursor.execute('''
-                SELECT id, filename, file_size, file_type, upload_time, is_cached
-                FROM files 
-                WHERE filename LIKE ? AND file_type = ?
-                ORDER BY upload_time DESC
-            ''', (f"%{query}%", file_type))
+    @staticmethod
+    def _fts_match_expression(terms: List[str]) -> str:
+        """把查询词转换为FTS5查询：每个词作为短语（加引号转义），词之间为AND"""
+        return ' '.join('"' + term.replace('"', '""') + '"' for term in terms)
+
+    def search_files(self, query: str, file_type: Optional[str] = None, limit: int = SEARCH_RESULT_LIMIT) -> List[Dict[str, Any]]:
+        """搜索文件，返回最相关的前 limit 条（后续结果用 search_files_page 的游标继续读取）"""
+        return self.search_files_page(query, file_type, page_size=limit)["files"]
+
+    def search_files_page(self, query: str, file_type: Optional[str] = None, cursor: Optional[str] = None,
+                          page_size: int = SEARCH_RESULT_LIMIT) -> Dict[str, Any]:
+        """分页搜索文件：在文件名、提取文本与OCR内容中全文检索
+
+        结果按 BM25 相关度排序（文件名命中权重更高），每条结果带 snippet 高亮片段。
+        trigram 分词无法用索引匹配少于3个字符的词（如两个字的中文词）：查询中至少有一个
+        3个字符及以上的词时，短词只在该词的索引命中结果中作为各列上的 LIKE 条件过滤；
+        全部是短词时只按文件名匹配（正文的 LIKE 需要扫描全部文档内容），按上传时间排序，snippet 为 None。
+        全文索引不可用时回退为按文件名 LIKE 匹配。
+
+        与 get_files_page 一样使用 keyset 游标（不使用OFFSET）：相关度排序时游标为上一页最后一行的
+        (bm25, id)，按文件名匹配时为 (upload_time, id)。
+
+        Returns:
+            {"files": [...], "next_cursor": str|None, "has_more": bool}
+        """
+        db_cursor = self.db.connect().cursor()
+        terms = query.split()
+        fts_available = bool(terms) and self._fts_available()
+        long_terms = [term for term in terms if len(term) >= 3]
+        ranked = fts_available and bool(long_terms)
+
+        if ranked:
+            conditions, params = ["files_fts MATCH ?"], [self._fts_match_expression(long_terms)]
+            for term in terms:
+                if len(term) < 3:
+                    conditions.append("(files_fts.filename LIKE ? OR files_fts.body LIKE ? OR files_fts.ocr LIKE ?)")
+                    params.extend([f"%{term}%"] * 3)
+            type_clause, type_params = self._file_type_clause(file_type, prefix="f.")
+            if type_clause:
+                conditions.append(type_clause)
+                params.extend(type_params)
+            rank = "bm25(files_fts, ?, ?, ?)"
+            if cursor:
+                last_rank, last_id = self._decode_cursor(cursor)
+                conditions.append(f"({rank}, f.id) > (?, ?)")
+                params.extend([*self.SEARCH_COLUMN_WEIGHTS, float(last_rank), last_id])
+            open_mark, close_mark = self.SEARCH_HIGHLIGHT
+            db_cursor.execute(f'''
+                SELECT f.id, f.filename, f.file_size, f.file_type, f.upload_time, f.is_cached,
+                       snippet(files_fts, -1, ?, ?, '…', ?), {rank}
+                FROM files_fts JOIN files f ON f.id = files_fts.rowid
+                WHERE {" AND ".join(conditions)}
+                ORDER BY {rank}, f.id
+                LIMIT ?
+            ''', (open_mark, close_mark, self.SEARCH_SNIPPET_TOKENS, *self.SEARCH_COLUMN_WEIGHTS, *params,
+                  *self.SEARCH_COLUMN_WEIGHTS, page_size + 1))
         else:
-            cursor.execute('''
-                SELECT id, filename, file_size, file_type, upload_time, is_cached
+            # 全部是短词时每个词分别匹配文件名；没有全文索引时整个查询作为文件名子串
+            name_terms = terms if fts_available else [query]
+            conditions = ["filename LIKE ?"] * len(name_terms)
+            params = [f"%{term}%" for term in name_terms]
+            type_clause, type_params = self._file_type_clause(file_type)
+            if type_clause:
+                conditions.append(type_clause)
+                params.extend(type_params)
+            if cursor:
+                conditions.append("(upload_time, id) < (?, ?)")
+                params.extend(self._decode_cursor(cursor))
+            db_cursor.execute(f'''
+                SELECT id, filename, file_size, file_type, upload_time, is_cached, NULL, NULL
                 FROM files 
-                WHERE filename LIKE ?
-                ORDER BY upload_time DESC
-            ''', (f"%{query}%",))
-
+                WHERE {" AND ".join(conditions)}
+                ORDER BY upload_time DESC, id DESC
+                LIMIT ?
+            ''', (*params, page_size + 1))
+
+        rows = db_cursor.fetchall()
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
         files = []
-        for row in cursor.fetchall():
+        for row in rows:
             files.append({
                 "id": row[0],
                 "filename": row[1],
                 "file_size": row[2],
                 "file_type": row[3],
                 "upload_time": row[4],
-                "is_cached": bool(row[5])
+                "is_cached": bool(row[5]),
+                "snippet": row[6]
             })
 
-        conn.close()
-        return files
+        next_cursor = None
+        if has_more:
+            last = rows[-1]
+            # repr 保证浮点数的 bm25 值原样还原
+            next_cursor = self._encode_cursor(repr(last[7]) if ranked else last[4], last[0])
+        return {"files": files, "next_cursor": next_cursor, "has_more": has_more}
 
     def preview_file(self, file_id: int) -> Optional[bytes]:
         """预览文件"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             cursor.execute('SELECT file_path, file_type FROM files WHERE id = ?', (file_id,))
             result = cursor.fetchone()
-            conn.close()
 
             if not result:
                 print(f"[DEBUG] preview_file: File not found in database - ID: {file_id}")
@@ -1562,11 +1544,61 @@ Please answer the user's question based on the above file content."""
             print(f"[DEBUG] preview_file: Error stack:\n{traceback.format_exc()}")
             return None
 
+    @staticmethod
+    def _sniff_upload(temp_path: Path, filename: str) -> Optional[str]:
+        """上传的CSV探测编码与格式（只读开头，见 utils/csv_sniff.py），随文件记录保存；其他文件返回 None"""
+        if not filename.lower().endswith('.csv'):
+            return None
+        try:
+            return dumps_dialect(sniff_csv(str(temp_path)))
+        except OSError as e:
+            print(f"[DEBUG] CSV格式探测失败 - {filename}: {str(e)}")
+            return None
+
+    def _generate_renditions(self, checksum: str, file_path: str, file_type: str, filename: str) -> Dict[str, Path]:
+        """生成缩略图与预览图（见 core/renditions.py）；失败不影响上传，访问时会再次尝试"""
+        source_kind = rendition_source_kind(file_type, filename)
+        if not source_kind or (source_kind == "pdf" and not (PDF_AVAILABLE and fitz is not None)):
+            return {}
+        try:
+            return self.renditions.generate(checksum, file_path, source_kind)
+        except Exception as e:
+            print(f"[DEBUG] 生成缩略图/预览图失败 - {filename}: {str(e)}")
+            return {}
+
+    def get_rendition(self, file_id: int, kind: str = "thumb") -> Optional[str]:
+        """文件的缩略图（"thumb"）或预览图（"preview"）路径，不支持的文件类型返回 None
+
+        副本在上传时生成；此前上传的文件在第一次访问时补生成。
+        """
+        if kind not in RENDITION_SIZES:
+            raise ValueError(f"未知的副本种类: {kind}")
+        row = self.db.connect().execute(
+            'SELECT checksum, file_path, file_type, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row or not row[0]:
+            return None
+        checksum, file_path, file_type, filename = row
+        path = self.renditions.get(checksum, kind)
+        if path is None and os.path.exists(file_path):
+            path = self._generate_renditions(checksum, file_path, file_type, filename).get(kind)
+        return str(path) if path else None
+
+    def get_pdf_page_count(self, file_id: int) -> int:
+        """PDF页数（只读取交叉引用表，不渲染页面），无法读取时返回0"""
+        row = self.db.connect().execute('SELECT file_path FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row or not (PDF_AVAILABLE and fitz is not None) or not os.path.exists(row[0]):
+            return 0
+        try:
+            with fitz.open(row[0]) as doc:
+                return len(doc)
+        except Exception as e:
+            print(f"[DEBUG] get_pdf_page_count: 无法读取PDF - {str(e)}")
+            return 0
+
     def cache_file(self, file_id: int) -> bool:
         """缓存文件到本地"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             cursor.execute('SELECT file_path, filename FROM files WHERE id = ?', (file_id,))
             result = cursor.fetchone()
 
@@ -1576,9 +1608,8 @@ Please answer the user's question based on the above file content."""
                 shutil.copy2(file_path, cache_path)
 
                 # 更新数据库
-                cursor.execute('UPDATE files SET is_cached = TRUE WHERE id = ?', (file_id,))
-                conn.commit()
-                conn.close()
+                with self.db.transaction() as conn:
+                    conn.execute('UPDATE files SET is_cached = TRUE WHERE id = ?', (file_id,))
                 return True
         except:
             pass
@@ -1607,110 +1638,49 @@ Please answer the user's question based on the above file content."""
         }
         return icons.get(file_type, '📁')
 
-    def upload_file_with_resume(self, uploaded_file, folder_id: Optional[int] = None, chunk_size: int = 1024 * 1024) -> \
-    Dict[str, Any]:
-        """带断点续传的文件上传"""
+    def upload_file_with_resume(self, uploaded_file, folder_id: Optional[int] = None,
+                                chunk_size: int = 4 * 1024 * 1024, parallel: int = 1) -> Dict[str, Any]:
+        """带断点续传的文件上传
+
+        会话以内容指纹为键（见 core/resumable_upload.py），中断后再次上传同一内容会校验并跳过
+        已完成的分块。parallel > 1 时多线程乱序写入分块。
+        """
         try:
             filename = uploaded_file.name
-            file_size = len(uploaded_file.getbuffer())
-
-            # 检查是否有未完成的上传
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, uploaded_size, checksum FROM upload_progress 
-                WHERE filename = ? AND total_size = ?
-                ORDER BY upload_time DESC LIMIT 1
-            ''', (filename, file_size))
+            uploaded_file.seek(0, os.SEEK_END)
+            file_size = uploaded_file.tell()
 
-            progress_record = cursor.fetchone()
-
-            if progress_record:
-                # 断点续传
-                progress_id, uploaded_size, stored_checksum = progress_record
-                st.info(f"🔄 Resumable upload found, continue from {uploaded_size} bytes...")
-            else:
-                # 新上传
-                uploaded_size = 0
-                progress_id = None
-                stored_checksum = None
-
-            # 分块上传
-            uploaded_file.seek(uploaded_size)
-            current_size = uploaded_size
-
-            progress_bar = st.progress(uploaded_size / file_size)
+            progress_bar = st.progress(0.0)
             status_text = st.empty()
 
-            while current_size < file_size:
-                chunk = uploaded_file.read(min(chunk_size, file_size - current_size))
-                if not chunk:
-                    break
-
-                # 这里应该将chunk发送到服务器
-                # 为了演示，我们直接写入本地文件
-                temp_file_path = self.storage_dir / f"temp_{filename}"
-                with open(temp_file_path, "ab") as f:
-                    f.write(chunk)
-
-                current_size += len(chunk)
-                progress = current_size / file_size
+            def show_progress(done: int, total: int):
+                progress = done / total if total else 1.0
                 progress_bar.progress(progress)
-                status_text.text(f"Uploading: {current_size}/{file_size} bytes ({progress * 100:.1f}%)")
-
-                # 更新进度到数据库
-                if progress_id:
-                    cursor.execute('''
-                        UPDATE upload_progress 
-                        SET uploaded_size = ? 
-                        WHERE id = ?
-                    ''', (current_size, progress_id))
-                else:
-                    cursor.execute('''
-                        INSERT INTO upload_progress (filename, total_size, uploaded_size, chunk_size, checksum)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (filename, file_size, current_size, chunk_size, stored_checksum))
-                    progress_id = cursor.lastrowid
-
-                conn.commit()
+                status_text.text(f"Uploading: {done}/{total} bytes ({progress * 100:.1f}%)")
 
-                # 模拟网络延迟
-                time.sleep(0.1)
-
-            # 上传完成，移动文件到最终位置
-            final_file_path = self.storage_dir / f"{int(time.time())}_{filename}"
-            shutil.move(str(temp_file_path), str(final_file_path))
+            progress_id, temp_file_path, checksum = self.resumable_uploader.upload(
+                uploaded_file, filename, file_size,
+                chunk_size=chunk_size, parallel=parallel, on_progress=show_progress
+            )
 
-            # 计算校验和
-            checksum = self.calculate_checksum(str(final_file_path))
+            # 上传完成（校验和在分块写入时已算出），纳入内容寻址存储（相同内容已存在时丢弃临时文件）
             file_type = self.get_file_type(filename)
+            csv_dialect = self._sniff_upload(temp_file_path, filename)
 
-            # 保存文件信息到数据库
-            file_path_str = str(final_file_path)
-            print(f"[DEBUG] upload_file_with_resume: Saving to database - filename: {filename}, file_path: {file_path_str}, file_size: {file_size}, file_type: {file_type}, folder_id: {folder_id}")
-            
-            cursor.execute('''
-                INSERT INTO files (filename, file_path, file_size, file_type, folder_id, checksum)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (filename, file_path_str, file_size, file_type, folder_id, checksum))
-            
-            file_id = cursor.lastrowid
-            print(f"[DEBUG] upload_file_with_resume: File saved to database - file_id: {file_id}, filename: {filename}, folder_id: {folder_id}, file_path: {file_path_str}")
-            
-            # Verify the file was saved correctly
-            cursor.execute('SELECT file_path FROM files WHERE id = ?', (file_id,))
-            saved_path = cursor.fetchone()
-            if saved_path:
-                print(f"[DEBUG] upload_file_with_resume: Verified saved file_path: {saved_path[0]}")
-            else:
-                print(f"[DEBUG] upload_file_with_resume: WARNING - Could not verify saved file_path!")
+            with self.db.transaction() as conn:
+                file_path_str = self.blob_store.put_file(conn, checksum, temp_file_path, filename)
+                print(f"[DEBUG] upload_file_with_resume: Saving to database - filename: {filename}, file_path: {file_path_str}, file_size: {file_size}, file_type: {file_type}, folder_id: {folder_id}")
+                cursor = conn.execute('''
+                    INSERT INTO files (filename, file_path, file_size, file_type, folder_id, checksum, csv_dialect)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (filename, file_path_str, file_size, file_type, folder_id, checksum, csv_dialect))
+                file_id = cursor.lastrowid
 
-            # 删除进度记录
-            if progress_id:
-                cursor.execute('DELETE FROM upload_progress WHERE id = ?', (progress_id,))
+                # 删除上传会话
+                self.resumable_uploader.finish(conn, progress_id)
 
-            conn.commit()
-            conn.close()
+            print(f"[DEBUG] upload_file_with_resume: File saved to database - file_id: {file_id}, filename: {filename}, folder_id: {folder_id}, file_path: {file_path_str}")
+            self._generate_renditions(checksum, file_path_str, file_type, filename)
 
             progress_bar.empty()
             status_text.empty()
@@ -1730,8 +1700,7 @@ Please answer the user's question based on the above file content."""
 
     def get_upload_progress(self) -> List[Dict[str, Any]]:
         """获取上传进度列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
         cursor.execute('''
             SELECT filename, total_size, uploaded_size, upload_time
             FROM upload_progress
@@ -1749,13 +1718,11 @@ Please answer the user's question based on the above file content."""
                 "upload_time": upload_time
             })
 
-        conn.close()
         return progress_list
 
     def resume_upload(self, filename: str) -> Dict[str, Any]:
         """恢复上传"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
         cursor.execute('''
             SELECT id, total_size, uploaded_size, chunk_size, checksum
             FROM upload_progress 
@@ -1780,26 +1747,21 @@ Please answer the user's question based on the above file content."""
     def cancel_upload(self, filename: str) -> bool:
         """取消上传"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('DELETE FROM upload_progress WHERE filename = ?', (filename,))
-            conn.commit()
-            conn.close()
+            self.resumable_uploader.cancel(filename)
             return True
         except:
             return False
 
     # ==================== AI功能方法 ====================
-    def extract_excel_csv(self, file_id: int):
+    def extract_excel_csv(self, file_id: int, sheet: int = 0):
         """
         通过file_id读取Excel(.xlsx, .xls)或CSV文件，返回Pandas DataFrame
+        sheet 为Excel工作表序号（从0开始，可用 list_sheets 查询），CSV忽略
         非支持类型/读取失败时返回None，并显示Streamlit提示
         """
         # 1. 从数据库查询文件信息
-        conn = None
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            cursor = self.db.connect().cursor()
             # 查询文件路径、类型、文件名（与数据库表结构对应）
             cursor.execute(
                 'SELECT file_path, file_type, filename FROM files WHERE id = ?',
@@ -1815,9 +1777,9 @@ Please answer the user's question based on the above file content."""
 
             # 2. 校验文件类型（仅支持Excel和CSV）
             if filename.endswith(('.xlsx', '.xls')):
-                # 3. 读取Excel文件
+                # 3. 读取Excel文件（只流式读取所选工作表）
                 try:
-                    df = pd.read_excel(file_path)
+                    df = self._read_table(file_id, sheet)
                     if df.empty:
                         st.warning("The Excel file is empty.")
                         return None
@@ -1834,15 +1796,8 @@ Please answer the user's question based on the above file content."""
             elif filename.endswith('.csv'):
                 # 3. 读取CSV文件
                 try:
-                    # 尝试常用编码，避免中文乱码导致读取失败
-                    df = pd.read_csv(file_path, encoding='utf-8')
-                except UnicodeDecodeError:
-                    # 编码错误时尝试gbk（适合中文环境）
-                    try:
-                        df = pd.read_csv(file_path, encoding='gbk')
-                    except Exception as e:
-                        st.error(f"CSV file encoding error: {str(e)}")
-                        return None
+                    # 编码、分隔符、表头按上传时的探测结果读取（见 utils/csv_sniff.py），只解析一次
+                    df = self._read_table(file_id)
                 except FileNotFoundError:
                     st.error(f"CSV file not found at path: {file_path}")
                     return None
@@ -1868,19 +1823,13 @@ Please answer the user's question based on the above file content."""
         except sqlite3.Error as db_err:
             st.error(f"Database error: {str(db_err)} (failed to get file info)")
             return None
-        finally:
-            # 确保数据库连接关闭
-            if conn:
-                conn.close()
         return None
 
     def extract_text_from_file(self, file_id: int) -> str:
         """从文件中提取文本内容"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
         cursor.execute('SELECT file_path, file_type, filename FROM files WHERE id = ?', (file_id,))
         result = cursor.fetchone()
-        conn.close()
 
         if not result:
             return ""
@@ -1889,7 +1838,7 @@ Please answer the user's question based on the above file content."""
         extracted_text = ""
 
         try:
-            if file_type == 'text' or filename.endswith('.txt'):
+            if (file_type == 'text' or filename.endswith('.txt')) and not filename.lower().endswith('.csv'):
                 # 文本文件
                 with open(file_path, 'r', encoding='utf-8') as f:
                     extracted_text = f.read()
@@ -1907,34 +1856,18 @@ Please answer the user's question based on the above file content."""
                 # 若不可用则保持为空，后续给出友好占位
 
             elif file_type == 'application' and filename.endswith(('.xlsx', '.xls')):
-                # Excel文件
+                # Excel文件 - 每个工作表的定长文本表示（结构、列概况、首尾行、分层样本），不再整表 to_string
                 try:
-                    df = pd.read_excel(file_path)
-                    # 确保DataFrame不为空
-                    if not df.empty:
-                        # 安全地转换为字符串，避免numpy.str_错误
-                        try:
-                            extracted_text = df.to_string()
-                        except Exception as str_error:
-                            # 如果to_string失败，尝试其他方法
-                            extracted_text = str(df.values.tolist())
-                    else:
-                        extracted_text = "Excel file is empty"
+                    extracted_text = self._render_tables(file_id)[0] or "Excel file is empty"
                 except Exception as e:
                     st.warning(f"Excel reading failed: {str(e)}")
                     extracted_text = ""
 
             elif filename.endswith('.csv'):
-                # CSV文件
+                # CSV文件 - 分块读取，内存与耗时不随行数增长
                 try:
-                    df = pd.read_csv(file_path)
-                    if not df.empty:
-                        try:
-                            extracted_text = df.to_string()
-                        except Exception:
-                            extracted_text = str(df.values.tolist())
-                    else:
-                        extracted_text = "CSV file is empty"
+                    renderer = self._render_table(file_id)
+                    extracted_text = renderer.render() if renderer.row_count else "CSV file is empty"
                 except Exception as e:
                     st.warning(f"CSV reading failed: {str(e)}")
                     extracted_text = ""
@@ -1951,54 +1884,15 @@ Please answer the user's question based on the above file content."""
                     pass
 
             elif file_type == 'image':
-                # 图片文件 - OCR识别
+                # 图片文件 - OCR识别（结果按内容缓存，同一图片不会重复识别）
                 print(f"[DEBUG] 开始处理图片文件: {filename}")
-                print(f"[DEBUG] 文件路径: {file_path}")
-                print(f"[DEBUG] OCR状态 - OCR_AVAILABLE: {OCR_AVAILABLE}, TESSERACT: {TESSERACT_AVAILABLE}")
-                
-                if OCR_AVAILABLE and TESSERACT_AVAILABLE:
-                    # 延迟加载OCR模型
-                    if not self._load_ocr_model():
-                        print("[DEBUG] OCR模型加载失败，跳过OCR提取")
-                        extracted_text = ""
-                    else:
-                        # OCR模型已加载，进行识别
-                        print(f"[DEBUG] OCR模型已加载，开始识别图片: {file_path}")
-                        try:
-                            print("[DEBUG] 调用 _ocr_readtext()...")
-                            results = self._ocr_readtext(file_path)
-                            print(f"[DEBUG] OCR识别完成，返回结果数量: {len(results) if results else 0}")
-                            
-                            if results and len(results) > 0:
-                                print(f"[DEBUG] OCR识别结果详情:")
-                                for i, result in enumerate(results):
-                                    print(f"  [{i+1}] 位置: {result[0]}, 文字: {result[1]}, 置信度: {result[2]:.2f}")
-                                
-                                extracted_text = ' '.join([result[1] for result in results])
-                                if extracted_text.strip():
-                                    print(f"[DEBUG] ✅ OCR识别成功，提取的文字: {extracted_text[:100]}...")
-                                    st.success(f"✅ OCR recognition successful, recognized {len(results)} text regions")
-                                else:
-                                    extracted_text = ""  # OCR没有识别到文字
-                                    print("[DEBUG] ⚠️ OCR识别结果为空字符串")
-                                    st.warning("⚠️ OCR did not recognize any text content")
-                            else:
-                                extracted_text = ""  # OCR没有识别到文字
-                                print("[DEBUG] ⚠️ OCR未识别到任何文字（results为空）")
-                                st.warning("⚠️ OCR未识别到文字内容")
-                        except Exception as e:
-                            print(f"[DEBUG] ❌ OCR识别过程出错: {str(e)}")
-                            print(f"[DEBUG] 错误类型: {type(e).__name__}")
-                            import traceback
-                            print(f"[DEBUG] 错误堆栈:\n{traceback.format_exc()}")
-                            st.warning(f"OCR recognition failed: {str(e)}")
-                            extracted_text = ""
+                if self._get_ocr_manager().is_available():
+                    extracted_text = self.extract_ocr_content(file_id) or ""
+                    if not extracted_text:
+                        st.warning("⚠️ OCR did not recognize any text content")
                 else:
-                    # OCR不可用，提示用户
-                    print(f"[DEBUG] OCR不可用 - OCR_AVAILABLE: {OCR_AVAILABLE}, TESSERACT: {TESSERACT_AVAILABLE}")
-                    if not OCR_AVAILABLE or not TESSERACT_AVAILABLE:
-                        st.warning("⚠️ OCR feature unavailable. Please install Tesseract OCR. See INSTALL_TESSERACT.md for details.")
-                    extracted_text = ""
+                    print(f"[DEBUG] OCR不可用 - 没有可用的OCR引擎")
+                    st.warning("⚠️ OCR feature unavailable. Please install Tesseract OCR. See INSTALL_TESSERACT.md for details.")
 
         except Exception as e:
             st.error(f"Text extraction failed: {str(e)}")
@@ -2294,7 +2188,7 @@ Please answer the user's question based on the above file content."""
             return text[:max_length] + "..." if len(text) > max_length else text
 
     def _load_ocr_model(self):
-        """检查OCR是否可用（Tesseract无需加载模型）"""
+        """检查OCR是否可用（引擎在首次识别时由共享的OCR管理器加载）"""
         # 检查是否禁用OCR
         import os
         if os.getenv('DISABLE_OCR', '').lower() in ('1', 'true', 'yes'):
@@ -2306,61 +2200,157 @@ Please answer the user's question based on the above file content."""
             print("[DEBUG] OCR之前检查失败，跳过重试")
             return False
         
-        if not OCR_AVAILABLE or not TESSERACT_AVAILABLE:
-            print("[DEBUG] Tesseract OCR不可用")
+        if not self._get_ocr_manager().is_available():
+            print("[DEBUG] 没有可用的OCR引擎")
             return False
         
-        # Tesseract不需要加载模型，直接可用
-        print("[DEBUG] ✅ Tesseract OCR可用（无需加载模型，轻量级）")
+        print(f"[DEBUG] ✅ OCR可用（引擎: {self._get_ocr_manager().get_engine_name()}）")
         return True
     
-    def _ocr_readtext(self, image_path: str):
-        """OCR识别接口 - 使用Tesseract OCR"""
+    def _get_ocr_manager(self) -> OCRManager:
+        """进程内共用的OCR管理器（引擎预热池、内存预算、按文档类型选择引擎）"""
+        return get_ocr_manager()
+
+    def _ocr_recognize(self, image, engine: Optional[OCREngine] = None) -> Optional[OCRLayout]:
+        """OCR识别接口 - 用 engine 识别（默认由共享的OCR管理器按可用内存选择），返回词级版面
+
+        image 可为文件路径、PIL图像、numpy数组或 fitz.Pixmap，内存中的图像不再写入临时文件。
+        """
         if not self._load_ocr_model():
-            return []
+            return None
         
         try:
-            # 使用Tesseract OCR
-            import pytesseract
-            from PIL import Image
-            
-            # 读取图片
-            img = Image.open(image_path)
-            
-            # 检测语言
-            import os
-            lang = 'chi_sim+eng' if os.getenv('ENABLE_CHINESE_OCR', '').lower() in ('1', 'true', 'yes') else 'eng'
-            
-            # 识别文字
-            text = pytesseract.image_to_string(img, lang=lang)
-            
-            # 转换为统一格式: [(bbox, text, confidence)]
-            # Tesseract只返回文字，没有坐标信息，bbox设为None，confidence设为1.0
-            if text.strip():
-                return [(None, text.strip(), 1.0)]
-            return []
+            return self._get_ocr_manager().recognize(image, "image", engine=engine, lang=self._ocr_lang())
         except Exception as e:
-            print(f"[DEBUG] Tesseract OCR识别失败: {str(e)}")
+            print(f"[DEBUG] OCR识别失败: {str(e)}")
             import traceback
             print(f"[DEBUG] 错误堆栈:\n{traceback.format_exc()}")
-            return []
+            return None
+
+    def get_ocr_layout(self, file_id: int, page_num: int = 0) -> Optional[OCRLayout]:
+        """已保存的词级OCR版面（图片为第0页；PDF只有没有文字层的页），用于高亮、区域裁剪、表格重建和置信度过滤
+
+        坐标为原图像素（PDF为页面的点）。尚未OCR时返回 None，不会触发识别。
+        """
+        row = self.db.connect().execute(
+            'SELECT checksum, file_type, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row or not self._ocr_doc_type(row[1], row[2]):
+            return None
+        model = self._ocr_result_model(row[0], self._ocr_doc_type(row[1], row[2]))
+        if model is None:
+            return None
+        return self.ocr_pages.get_layout(row[0], self._ocr_pipeline_version(), model, page_num)
     
-    def extract_ocr_content(self, file_id: int) -> Optional[str]:
-        """提取图片或PDF的OCR内容（用于保存到数据库）"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT file_path, file_type, filename FROM files WHERE id = ?', (file_id,))
-            result = cursor.fetchone()
-            conn.close()
+    def extract_ocr_content(self, file_id: int,
+                            on_progress: Optional[Callable[[float, str], None]] = None) -> Optional[str]:
+        """提取图片或PDF的OCR内容（用于保存到数据库），已识别过的内容直接读取 ocr_pages
 
-            if not result:
-                return None
+        Args:
+            on_progress: 可选的进度回调 (0~1, 说明)，PDF每识别完一页调用一次
 
-            file_path, file_type, filename = result
-            
-            # 只处理图片和PDF文件
-            if file_type != 'image' and not (file_type == 'application' and filename.endswith('.pdf')):
+        Raises:
+            RuntimeError: PDF有页面OCR失败（见 _extract_pdf_ocr）
+        """
+        row = self.db.connect().execute(
+            'SELECT checksum, file_type, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row:
+            return None
+        checksum, file_type, filename = row
+        if self._ocr_doc_type(file_type, filename) == "image":
+            model = self._ocr_result_model(checksum, "image")
+            if model is not None:
+                return "\n".join(text for _, text in self.ocr_pages.iter_pages(
+                    checksum, self._ocr_pipeline_version(), model) if text) or None
+        # PDF已完成的页由 _ocr_pdf_streaming 跳过
+        return self._extract_ocr_content_uncached(file_id, on_progress)
+
+    def iter_ocr_pages(self, file_id: int, start_page: int = 0) -> Iterator[Tuple[int, str]]:
+        """按页序分批读取PDF已识别的页 (page_num, text)，页码从0开始（识别进行中也可读取已完成的页）"""
+        checksum = self._file_checksum(file_id)
+        model = self._ocr_result_model(checksum, "pdf")
+        if model is not None:
+            yield from self.ocr_pages.iter_pages(checksum, self._ocr_pipeline_version(), model, start_page)
+
+    @staticmethod
+    def _read_pdf_pages(file_path: str) -> List[Tuple[str, bool]]:
+        """PDF每页的 (文字层文本, 是否需要OCR)，每页只调用一次 get_text()（见 classify_pdf_page）"""
+        with fitz.open(file_path) as doc:
+            return [classify_pdf_page(page) for page in doc]
+
+    @staticmethod
+    def _format_ocr_pages(ocr_pages: Dict[int, str]) -> Optional[str]:
+        """逐页OCR结果 -> "Page N:" 分隔的OCR文本"""
+        parts = [f"Page {page_num + 1}:\n{page_text}" for page_num, page_text in sorted(ocr_pages.items())]
+        return '\n\n'.join(parts) if parts else None
+
+    def _ocr_pdf_streaming(self, file_id: int, file_path: str,
+                           on_progress: Optional[Callable[[float, str], None]] = None,
+                           pages: Optional[List[Tuple[str, bool]]] = None) -> Dict[int, str]:
+        """逐页OCR PDF中没有文字层的页（不限页数），每页完成即写入 ocr_pages，中断后只识别未完成的页
+
+        有文字层的页直接使用文字层，不再OCR。pages 为 _read_pdf_pages 的结果（调用方已读过时传入，不再重复读取）。
+        已有部分页的结果时沿用产生它们的引擎（不按当前内存重新选择），同一文档的各页来自同一引擎。
+        返回 {页码: OCR文字}（只含识别出文字的页）。
+        """
+        report = on_progress or (lambda fraction, message: None)
+        checksum = self._file_checksum(file_id)
+        manager = self._get_ocr_manager()
+        existing = self._ocr_result_model(checksum, "pdf")
+        engine = manager.engine_for_model(existing, "pdf") if existing else manager.choose_engine("pdf")
+        version, model = self._ocr_pipeline_version(), manager.engine_model_name(engine)
+
+        if pages is None:
+            pages = self._read_pdf_pages(file_path)
+        scanned_pages = [page_num for page_num, (_, needs_ocr) in enumerate(pages) if needs_ocr]
+        print(f"[DEBUG] extract_ocr_content: PDF共{len(pages)}页，其中{len(scanned_pages)}页没有文字层，需要OCR")
+        if not scanned_pages:
+            return {}
+
+        completed = self.ocr_pages.completed_pages(checksum, version, model)
+        pending = [page_num for page_num in scanned_pages if page_num not in completed]
+        if len(pending) < len(scanned_pages):
+            print(f"[DEBUG] extract_ocr_content: 已完成{len(scanned_pages) - len(pending)}页，继续识别剩余{len(pending)}页")
+
+        # Tesseract 在进程池中并行OCR（工作进程数由OCRManager的内存预算决定），按页序逐页保存
+        done = len(scanned_pages) - len(pending)
+        for page_num, layout in manager.ocr_pdf_pages(file_path, pending, self._ocr_lang(), engine):
+            self.ocr_pages.save_page(checksum, version, model, page_num, layout.text(), layout)
+            done += 1
+            report(done / len(scanned_pages), f"OCR page {done}/{len(scanned_pages)}")
+
+        return {page_num: page_text
+                for page_num, page_text in self.ocr_pages.iter_pages(checksum, version, model) if page_text}
+
+    def _extract_pdf_ocr(self, file_id: int, file_path: str,
+                         on_progress: Optional[Callable[[float, str], None]] = None,
+                         pages: Optional[List[Tuple[str, bool]]] = None) -> Dict[int, str]:
+        """PDF扫描页的逐页OCR文字；OCR不可用时返回空字典
+
+        中途有页面OCR失败时抛出 RuntimeError：已完成的页保存在 ocr_pages 中，重试时从未完成的页继续；
+        只含部分页的结果不能当作完整结果返回（否则会进入提取结果缓存，剩余的页再也不会识别）。
+        """
+        if not (PDF_AVAILABLE and fitz is not None and self._load_ocr_model()):
+            return {}
+        try:
+            return self._ocr_pdf_streaming(file_id, file_path, on_progress, pages)
+        except Exception as e:
+            print(f"[DEBUG] extract_ocr_content: PDF OCR未完成: {str(e)}")
+            raise RuntimeError(f"PDF OCR未完成，已识别的页已保存，重试时继续: {e}") from e
+
+    def _extract_ocr_content_uncached(self, file_id: int,
+                                      on_progress: Optional[Callable[[float, str], None]] = None) -> Optional[str]:
+        """运行OCR提取图片或PDF的文字（PDF中途失败时抛出 RuntimeError，见 _extract_pdf_ocr）"""
+        row = self.db.connect().execute(
+            'SELECT file_path, file_type, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row:
+            return None
+        file_path, file_type, filename = row
+        if file_type == 'application' and filename.endswith('.pdf'):
+            return self._format_ocr_pages(self._extract_pdf_ocr(file_id, file_path, on_progress))
+
+        try:
+            # 只处理图片（PDF见上）
+            if file_type != 'image':
                 return None
 
             ocr_content = None
@@ -2370,47 +2360,8 @@ Please answer the user's question based on the above file content."""
                 print("[DEBUG] extract_ocr_content: OCR模型加载失败，跳过OCR提取")
                 return None
 
-            # 对于PDF文件，需要转换为图片后OCR
-            if filename.endswith('.pdf') and PDF_AVAILABLE and fitz is not None:
-                try:
-                    doc = fitz.open(file_path)
-                    all_ocr_text = []
-                    
-                    # 限制PDF页数，避免内存溢出
-                    max_pages = min(len(doc), 10)  # 最多处理10页
-                    if len(doc) > max_pages:
-                        print(f"[DEBUG] PDF有{len(doc)}页，只处理前{max_pages}页以节省内存")
-                    
-                    for page_num in range(max_pages):
-                        page = doc[page_num]
-                        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-                        img_data = pix.tobytes("png")
-                        
-                        import tempfile
-                        temp_img = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                        temp_img.write(img_data)
-                        temp_img.close()
-                        
-                        try:
-                            page_results = self._ocr_readtext(temp_img.name)
-                            if page_results and len(page_results) > 0:
-                                page_text = ' '.join([result[1] for result in page_results])
-                                all_ocr_text.append(f"Page {page_num + 1}:\n{page_text}")
-                        finally:
-                            try:
-                                os.unlink(temp_img.name)
-                            except:
-                                pass
-                    
-                    doc.close()
-                    
-                    if all_ocr_text:
-                        ocr_content = '\n\n'.join(all_ocr_text)
-                except Exception as e:
-                    print(f"[DEBUG] extract_ocr_content: PDF OCR失败: {str(e)}")
-            
             # 对于图片文件，直接OCR
-            elif file_type == 'image':
+            if file_type == 'image':
                 try:
                     # 检查图片大小和尺寸，如果太大则缩放
                     from PIL import Image
@@ -2424,8 +2375,7 @@ Please answer the user's question based on the above file content."""
                     max_dimension = 2000  # 最大尺寸2000像素
                     max_file_size_mb = 5  # 最大文件大小5MB
                     
-                    ocr_file_path = file_path
-                    temp_img_path = None
+                    ocr_image = img
                     
                     if img_width > max_dimension or img_height > max_dimension or file_size_mb > max_file_size_mb:
                         print(f"[DEBUG] extract_ocr_content: 图片过大，进行缩放...")
@@ -2435,32 +2385,25 @@ Please answer the user's question based on the above file content."""
                         new_width = int(img_width * scale)
                         new_height = int(img_height * scale)
                         
-                        # 缩放图片
-                        img_resized = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-                        
-                        # 保存到临时文件
-                        import tempfile
-                        temp_img_path = tempfile.NamedTemporaryFile(delete=False, suffix='.png')
-                        temp_img_path.close()
-                        img_resized.save(temp_img_path.name, 'PNG')
-                        
-                        ocr_file_path = temp_img_path.name
+                        # 缩放图片（缩放后的图像直接交给OCR）
+                        ocr_image = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
                         print(f"[DEBUG] extract_ocr_content: 图片已缩放至: {new_width}x{new_height}")
                     
                     try:
-                        results = self._ocr_readtext(ocr_file_path)
-                        if results and len(results) > 0:
-                            ocr_content = ' '.join([result[1] for result in results])
+                        # 先选定引擎再识别，结果记在实际使用的引擎名下
+                        manager = self._get_ocr_manager()
+                        engine = manager.choose_engine("image")
+                        layout = self._ocr_recognize(ocr_image, engine)
+                        if layout is not None:
+                            # 词框换算回原图尺寸，与文字一起以第0页保存
+                            layout = layout.to_source(zoom=ocr_image.width / img_width,
+                                                      source_size=(img_width, img_height))
+                            self.ocr_pages.save_page(self._file_checksum(file_id), self._ocr_pipeline_version(),
+                                                     manager.engine_model_name(engine), 0, layout.text(), layout)
+                            ocr_content = layout.text() or None
                     except MemoryError as e:
                         print(f"[DEBUG] extract_ocr_content: 图片OCR内存不足: {str(e)}")
                         ocr_content = None
-                    finally:
-                        # 清理临时文件
-                        if temp_img_path and os.path.exists(temp_img_path.name):
-                            try:
-                                os.unlink(temp_img_path.name)
-                            except:
-                                pass
                 except MemoryError as e:
                     print(f"[DEBUG] extract_ocr_content: 图片处理内存不足: {str(e)}")
                     ocr_content = None
@@ -2473,76 +2416,74 @@ Please answer the user's question based on the above file content."""
             print(f"[DEBUG] extract_ocr_content: 错误: {str(e)}")
             return None
 
-    def analyze_file_with_ai(self, file_id: int) -> Dict[str, Any]:
-        """使用DeepSeek AI分析文件"""
+    def analyze_file_with_ai(self, file_id: int,
+                             on_progress: Optional[Callable[[float, str], None]] = None,
+                             extraction: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """使用DeepSeek AI分析文件
+
+        相同内容（校验和）在相同分析流水线版本与模型下已分析过时，直接复用缓存结果。
+        DeepSeek调用失败时回退到本地分析，失败原因放在返回结果的 "warning" 中（不调用 st.warning，
+        后台任务中没有页面可显示）。
+
+        Args:
+            on_progress: 可选的进度回调 (0~1, 阶段说明)，后台任务用它上报进度
+            extraction: 已完成的提取结果（后台任务的提取阶段传入），为 None 时调用 get_extraction
+        """
+        report = on_progress or (lambda fraction, message: None)
         try:
-            # 提取文本
-            extracted_text = self.extract_text_from_file(file_id)
+            # 先查分析缓存（内容相同的文件不再重复提取、OCR和调用API）
+            checksum = self._file_checksum(file_id)
+            version = self._file_analysis_version(file_id)
+            model = self.deepseek_model if self.deepseek_api_key else "local"
+            cached = self.analysis_cache.get(checksum, "analysis", version, model)
+            if cached:
+                report(0.9, "Using cached analysis")
+                self._save_ai_analysis(file_id, cached)
+                return {
+                    "success": True,
+                    "extracted_text": cached["extracted_text"],
+                    "classification": cached["classification"],
+                    "key_phrases": cached["key_phrases"],
+                    "summary": cached["summary"],
+                    "ai_analysis": cached.get("ai_analysis"),
+                    "cached": True
+                }
 
-            if not extracted_text:
+            # 提取文本与OCR内容（相同内容只提取一次）
+            report(0.05, "Extracting text")
+            if extraction is None:
+                extraction = self.get_extraction(
+                    file_id, lambda fraction, message: report(0.05 + 0.4 * fraction, message))
+            if not extraction:
                 return {"success": False, "error": "无法提取文件文本内容"}
-            
-            # 对于图片和PDF文件，提取并保存OCR内容
-            ocr_content = None
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('SELECT file_type, filename FROM files WHERE id = ?', (file_id,))
-            file_info = cursor.fetchone()
-            conn.close()
-            
-            if file_info:
-                file_type, filename = file_info
-                if file_type == 'image' or (file_type == 'application' and filename.endswith('.pdf')):
-                    ocr_content = self.extract_ocr_content(file_id)
-                    print(f"[DEBUG] analyze_file_with_ai: OCR内容提取完成，长度: {len(ocr_content) if ocr_content else 0}")
+            extracted_text, ocr_content = extraction["content"], extraction["ocr_content"]
 
             # 如果配置了DeepSeek API，使用AI分析
+            warning = None
             if self.deepseek_api_key:
-                # 构建分析提示词 - 明确要求返回行业分类
-                system_prompt = """You are a professional document analysis assistant. Please analyze the user's uploaded file and provide the following information in a structured format:
-1. File type and main content overview
-2. Industry classification: Please classify this document into ONE of these categories:
-   - Planting (crop cultivation, agriculture, farming)
-   - Livestock (animal husbandry, cattle, poultry)
-   - Inputs-Soil (fertilizer, soil testing, agricultural inputs)
-   - Agri-Finance (agricultural finance, insurance, credit)
-   - SupplyChain-Storage (supply chain, logistics, warehouse)
-   - Climate-RemoteSensing (climate, weather, remote sensing, NDVI, EVI)
-   - Agri-IoT (IoT sensors, irrigation, smart agriculture)
-   If none of these categories fit, respond with "Unclassified"
-3. Key information extraction
-4. File summary (within 200 words)
-
-IMPORTANT: Please clearly state the industry classification in your response, for example: "Industry Classification: Planting" or "Industry: Livestock"
-
-Please answer in English, with clear and organized format."""
-
                 # 限制长度避免超出token限制（增加到8000以提供更多上下文）
-                extracted_text_limited = extracted_text[:8000]
-                user_prompt = f"""Please analyze the following file content:
-
-{extracted_text_limited}
-
-Please provide detailed analysis results, and clearly state the Industry Classification. Make sure to provide a complete and comprehensive analysis."""
-
+                extracted_text_limited = extracted_text[:ANALYSIS_TEXT_LIMIT]
                 messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
+                    {"role": "system", "content": ANALYSIS_SYSTEM_PROMPT},
+                    {"role": "user", "content": ANALYSIS_USER_PROMPT.format(content=extracted_text_limited)}
                 ]
 
                 # 调用DeepSeek API - 增加max_tokens以确保完整响应
-                ai_analysis = self.call_deepseek_api(messages, max_tokens=4000, temperature=0.7)
-                
+                report(0.5, "Waiting for DeepSeek AI")
+                api_errors: List[str] = []
+                ai_analysis = self.call_deepseek_api(messages, max_tokens=ANALYSIS_MAX_TOKENS,
+                                                     temperature=ANALYSIS_TEMPERATURE, errors=api_errors)
+
                 if ai_analysis:
                     # 解析AI返回的分析结果
                     # 首先尝试从AI响应中提取行业分类
                     classification = self._extract_classification_from_ai_response(ai_analysis, extracted_text)
-                    
+
                     # 如果无法从AI响应中提取，使用本地分类方法
                     if not classification or classification.get('category') == 'Unclassified' or classification.get('category') == '未分类':
                         print(f"[DEBUG] analyze_file_with_ai: 无法从AI响应中提取分类，使用本地分类方法")
                         classification = self.classify_industry(extracted_text)
-                    
+
                     if isinstance(classification, dict) and 'category' in classification:
                         classification['category'] = self._to_english_category(classification['category'])
                         print(f"[DEBUG] analyze_file_with_ai: 最终分类结果: {classification['category']}, 置信度: {classification.get('confidence', 0)}")
@@ -2552,20 +2493,20 @@ Please provide detailed analysis results, and clearly state the Industry Classif
 
                     # 使用AI生成的摘要，如果没有则使用本地生成
                     summary = ai_analysis[:200] if ai_analysis else self.generate_summary(extracted_text)
-                    
-                    # 保存分析结果到数据库
-                    conn = sqlite3.connect(self.db_path)
-                    cursor = conn.cursor()
-
-                    cursor.execute('''
-                        INSERT INTO ai_analysis (file_id, analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, ocr_content)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (file_id, "full_analysis", classification["category"],
-                          extracted_text[:1000], json.dumps(key_phrases, ensure_ascii=False),
-                          summary, classification["confidence"], "DeepSeek AI", ocr_content))
 
-                    conn.commit()
-                    conn.close()
+                    # 保存分析结果到数据库和缓存
+                    report(0.95, "Saving results")
+                    analysis = {
+                        "extracted_text": extracted_text,
+                        "ocr_content": ocr_content,
+                        "classification": classification,
+                        "key_phrases": key_phrases,
+                        "summary": summary,
+                        "ai_analysis": ai_analysis,
+                        "method": "DeepSeek AI"
+                    }
+                    self._save_ai_analysis(file_id, analysis)
+                    self.analysis_cache.put(checksum, "analysis", version, model, analysis)
 
                     return {
                         "success": True,
@@ -2573,54 +2514,428 @@ Please provide detailed analysis results, and clearly state the Industry Classif
                         "classification": classification,
                         "key_phrases": key_phrases,
                         "summary": summary,
-                        "ai_analysis": ai_analysis
+                        "ai_analysis": ai_analysis,
+                        "warning": "; ".join(api_errors) or None
                     }
                 else:
                     # DeepSeek API调用失败，回退到本地分析
-                    st.warning("DeepSeek API call failed, using local analysis method")
-            
-            # 回退到本地分析方法
-            classification = self.classify_industry(extracted_text)
-            if isinstance(classification, dict) and 'category' in classification:
-                classification['category'] = self._to_english_category(classification['category'])
-
-            key_phrases = self.extract_key_phrases(extracted_text)
-            summary = self.generate_summary(extracted_text)
-
-            # 保存分析结果到数据库
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+                    warning = "DeepSeek API call failed, using local analysis method"
+                    if api_errors:
+                        warning += f" ({'; '.join(api_errors)})"
+                    print(f"[DEBUG] analyze_file_with_ai: {warning}")
 
-            cursor.execute('''
-                INSERT INTO ai_analysis (file_id, analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, ocr_content)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (file_id, "full_analysis", classification["category"],
-                  extracted_text[:1000], json.dumps(key_phrases, ensure_ascii=False),
-                  summary, classification["confidence"], "Local Analysis", ocr_content))
+            # 回退到本地分析方法
+            report(0.7, "Classifying")
+            analysis = self._local_analysis(extracted_text, ocr_content)
+            classification, key_phrases, summary = analysis["classification"], analysis["key_phrases"], analysis["summary"]
 
-            conn.commit()
-            conn.close()
+            # 保存分析结果到数据库和缓存（本地结果记在 "local" 下，DeepSeek恢复后仍会重新调用）
+            report(0.95, "Saving results")
+            self._save_ai_analysis(file_id, analysis)
+            self.analysis_cache.put(checksum, "analysis", version, "local", analysis)
 
             return {
                 "success": True,
                 "extracted_text": extracted_text,
                 "classification": classification,
                 "key_phrases": key_phrases,
-                "summary": summary
+                "summary": summary,
+                "warning": warning
             }
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    # ==================== 提取结果 ====================
+
+    @staticmethod
+    def _ocr_doc_type(file_type: str, filename: str) -> Optional[str]:
+        """需要OCR的文件类型："pdf"、"image"，其他文件为 None"""
+        if file_type == 'image':
+            return "image"
+        if file_type == 'application' and filename.lower().endswith('.pdf'):
+            return "pdf"
+        return None
+
+    def _extraction_pipeline_version(self) -> str:
+        return pipeline_version("extraction", ANALYSIS_PIPELINE_VERSION, self._ocr_pipeline_version())
+
+    def get_extraction(self, file_id: int,
+                       on_progress: Optional[Callable[[float, str], None]] = None) -> Optional[Dict[str, Any]]:
+        """文件的提取结果（文本、OCR、表格、元数据），相同内容只提取一次
+
+        结果按校验和保存在分析缓存（kind 为 "extraction"）中，分析、报告、问答与搜索索引都读取它，
+        不再各自运行提取器和OCR。PDF逐页的OCR结果在 ocr_pages 中（见 iter_ocr_pages）。
+
+        返回 {"text": 文字层/文档文本, "ocr_content": OCR文字或None, "content": 合并后用于分析的文本,
+        "tables": 表格概要, "metadata": 元数据}；文件不存在时返回 None。
+        PDF的OCR中途失败时抛出 RuntimeError，不保存只含部分页的结果（后台任务重试时从 ocr_pages 继续）。
+        """
+        row = self.db.connect().execute(
+            'SELECT checksum, file_path, file_type, filename FROM files WHERE id = ?', (file_id,)
+        ).fetchone()
+        if not row:
+            return None
+        checksum, file_path, file_type, filename = row
+        doc_type = self._ocr_doc_type(file_type, filename)
+        version = self._extraction_pipeline_version()
+        model = self._ocr_model_name(doc_type) if doc_type else "none"
+
+        artifact = self.analysis_cache.get(checksum, "extraction", version, model)
+        if artifact is None:
+            artifact = self._build_extraction(file_id, file_path, file_type, filename, doc_type, on_progress)
+            if artifact["text"] or artifact["ocr_content"]:
+                # 什么都没提取到（如OCR暂不可用）时不保存，下次重新提取
+                self.analysis_cache.put(checksum, "extraction", version, model, artifact)
+        self._index_extraction(file_id, artifact)
+        return artifact
+
+    def _build_extraction(self, file_id: int, file_path: str, file_type: str, filename: str,
+                          doc_type: Optional[str],
+                          on_progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        metadata: Dict[str, Any] = {"file_type": file_type}
+        tables: List[Dict[str, Any]] = []
+
+        if filename.lower().endswith(('.xlsx', '.xls', '.csv')):
+            # 表格只读取一遍：定长文本与表格概要来自同一次分块汇总；工作簿包含全部工作表
+            try:
+                text, tables = self._render_tables(file_id)
+            except Exception as e:
+                print(f"[DEBUG] get_extraction: 读取表格失败: {str(e)}")
+                text = ""
+        elif doc_type == "image":
+            text = ""  # 图片的文字全部来自OCR
+            try:
+                from PIL import Image
+                with Image.open(file_path) as img:
+                    metadata.update(width=img.width, height=img.height, format=img.format)
+            except Exception as e:
+                print(f"[DEBUG] get_extraction: 读取图片信息失败: {str(e)}")
+        elif doc_type == "pdf" and PDF_AVAILABLE and fitz is not None:
+            return self._build_pdf_extraction(file_id, file_path, filename, metadata, on_progress)
+        else:
+            text = self.extract_text_from_file(file_id)
+            if text.startswith("(No extractable text"):
+                text = ""
+
+        ocr_content = self.extract_ocr_content(file_id, on_progress) if doc_type else None
+        print(f"[DEBUG] get_extraction: 文本长度: {len(text)}，OCR内容长度: {len(ocr_content) if ocr_content else 0}")
+        content = "\n\n".join(part for part in (text, ocr_content) if part)
+        if not content:
+            content = f"(No extractable text from file: {filename}. Try preview/download.)"
+        metadata["characters"] = len(content)
+        return {"text": text, "ocr_content": ocr_content, "content": content, "tables": tables, "metadata": metadata}
+
+    def _build_pdf_extraction(self, file_id: int, file_path: str, filename: str, metadata: Dict[str, Any],
+                              on_progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
+        """PDF：每页只读取一次文字层，只对没有文字层的页OCR，content 按页序合并
+
+        扫描页用OCR文字代替文字层（扫描件上零星的页眉页脚也在OCR结果中），混合PDF的内容顺序与原文一致。
+        """
+        try:
+            pages = self._read_pdf_pages(file_path)
+        except Exception as e:
+            print(f"[DEBUG] get_extraction: 读取PDF失败: {str(e)}")
+            pages = []
+        metadata["page_count"] = len(pages)
+        text = "".join(page_text for page_text, _ in pages).strip()
+        needs_ocr = any(page_needs_ocr for _, page_needs_ocr in pages)
+        ocr_pages = self._extract_pdf_ocr(file_id, file_path, on_progress, pages) if needs_ocr else {}
+        ocr_content = self._format_ocr_pages(ocr_pages)
+        print(f"[DEBUG] get_extraction: 文本长度: {len(text)}，OCR内容长度: {len(ocr_content) if ocr_content else 0}")
+
+        content = "\n".join(part for part in (
+            (ocr_pages.get(page_num) if needs_ocr else None) or page_text.strip()
+            for page_num, (page_text, needs_ocr) in enumerate(pages)
+        ) if part)
+        if not content:
+            content = f"(No extractable text from file: {filename}. Try preview/download.)"
+        metadata["characters"] = len(content)
+        return {"text": text, "ocr_content": ocr_content, "content": content, "tables": [], "metadata": metadata}
+
+    def _table_source(self, file_id: int) -> Optional[Tuple[Optional[str], str, str, Optional[Dict[str, Any]]]]:
+        """(checksum, 文件路径, 文件名, CSV探测结果)；以前上传、尚未探测的CSV在这里探测一次并保存"""
+        row = self.db.connect().execute(
+            'SELECT checksum, file_path, filename, csv_dialect FROM files WHERE id = ?', (file_id,)).fetchone()
+        if not row:
+            return None
+        checksum, file_path, filename, dialect = row
+        dialect = loads_dialect(dialect)
+        if dialect is None and filename.lower().endswith('.csv'):
+            dialect = sniff_csv(file_path)
+            with self.db.transaction() as conn:
+                conn.execute('UPDATE files SET csv_dialect = ? WHERE id = ?', (dumps_dialect(dialect), file_id))
+        return checksum, file_path, filename, dialect
+
+    def _iter_table_chunks(self, file_id: int, sheet: int = 0) -> Iterator[pd.DataFrame]:
+        """按块读取Excel工作表/CSV：已有解析缓存时逐批读取Arrow文件，否则解析源文件并同时写入缓存"""
+        source = self._table_source(file_id)
+        if source is None:
+            return
+        checksum, file_path, filename, dialect = source
+        cached = self.table_cache.iter_frames(checksum, sheet)
+        if cached is not None:
+            yield from cached
+            return
+        yield from self.table_cache.write_through(
+            checksum, self._parse_table_chunks(file_path, filename, dialect, sheet), sheet)
+
+    def _read_table(self, file_id: int, sheet: int = 0) -> pd.DataFrame:
+        """整表读取（优先从解析缓存内存映射加载）"""
+        df = self.table_cache.read_frame(self._file_checksum(file_id), sheet)
+        if df is not None:
+            return df
+        chunks = list(self._iter_table_chunks(file_id, sheet))
+        if not chunks:
+            return pd.DataFrame()
+        return chunks[0] if len(chunks) == 1 else pd.concat(chunks, ignore_index=True)
+
+    def get_table_preview(self, file_id: int, rows: int = 20, sheet: int = 0) -> Tuple[pd.DataFrame, int]:
+        """表格前 rows 行与总行数（有解析缓存时只转换这几行）；解析失败时抛出异常"""
+        preview = self.table_cache.head(self._file_checksum(file_id), rows, sheet)
+        if preview is None:
+            df = self._read_table(file_id, sheet)
+            preview = df.head(rows), len(df)
+        return preview
+
+    def list_sheets(self, file_id: int) -> List[Dict[str, Any]]:
+        """Excel工作簿的全部工作表 [{"index", "name", "rows", "columns", "dimension"}]
+
+        只读取工作簿元数据，不加载单元格（见 utils/workbook.py）；不是Excel或读取失败时返回空列表。
+        """
+        source = self._table_source(file_id)
+        if source is None or not source[2].lower().endswith(('.xlsx', '.xls')):
+            return []
+        try:
+            with Workbook(source[1]) as book:
+                return book.sheets()
+        except Exception as e:
+            print(f"[DEBUG] list_sheets: 读取工作簿失败: {str(e)}")
+            return []
+
+    def read_table_range(self, file_id: int, cell_range: str, sheet: int = 0, header: bool = False) -> pd.DataFrame:
+        """读取Excel工作表的单元格区域（如 "A1:D20"），读到区域末行即停止；区域无效或读取失败时抛出异常"""
+        source = self._table_source(file_id)
+        if source is None:
+            raise FileNotFoundError(f"文件不存在: {file_id}")
+        with Workbook(source[1]) as book:
+            return book.read_range(cell_range, sheet, header=header)
+
+    @staticmethod
+    def _parse_table_chunks(file_path: str, filename: str, dialect: Optional[Dict[str, Any]] = None,
+                            sheet: int = 0) -> Iterator[pd.DataFrame]:
+        """解析源文件：CSV按探测结果每次读取 CSV_CHUNK_ROWS 行；Excel 流式读取所选工作表，每 CSV_CHUNK_ROWS 行一块"""
+        if filename.lower().endswith('.csv'):
+            with pd.read_csv(file_path, chunksize=CSV_CHUNK_ROWS, **read_csv_options(dialect)) as reader:
+                yield from reader
+            return
+        with Workbook(file_path) as book:
+            yield from book.iter_frames(sheet, CSV_CHUNK_ROWS)
+
+    def _render_table(self, file_id: int, sheet: int = 0) -> TableTextRenderer:
+        """分块汇总表格（见 utils/table_text.py）"""
+        return self._scan_table(file_id, sheet)[0]
+
+    def _render_tables(self, file_id: int, budget: int = TEXT_BUDGET_CHARS) -> Tuple[str, List[Dict[str, Any]]]:
+        """表格的定长文本与概要；多工作表的工作簿每个工作表平分字符预算，各自带 "=== Sheet: 名称 ===" 标题"""
+        sheets = self.list_sheets(file_id)
+        if len(sheets) <= 1:
+            renderer = self._render_table(file_id)
+            if not renderer.row_count:
+                return "", []
+            return renderer.render(budget), [{"rows": renderer.row_count, "columns": renderer.columns}]
+
+        parts, tables = [], []
+        for info in sheets:
+            title = f"=== Sheet: {info['name']} ==="
+            renderer = self._render_table(file_id, info["index"])
+            if renderer.row_count:
+                body = renderer.render(max(budget // len(sheets) - len(title) - 3, 0))
+                tables.append({"sheet": info["name"], "rows": renderer.row_count, "columns": renderer.columns})
+            else:
+                body = "(empty)"
+            parts.append(f"{title}\n{body}")
+        return ("\n\n".join(parts)[:budget] if tables else ""), tables
+
+    def _scan_table(self, file_id: int, sheet: int = 0) -> Tuple[TableTextRenderer, TableProfile]:
+        """一遍分块读取，同时得到定长文本与列统计草图；草图按内容与工作表保存到分析缓存（kind 为 "profile"）"""
+        renderer, profile = TableTextRenderer(), TableProfile()
+        for chunk in self._iter_table_chunks(file_id, sheet):
+            renderer.update(chunk)
+            profile.update(chunk)
+        if profile.columns:
+            self.analysis_cache.put(self._file_checksum(file_id), "profile", self._profile_pipeline_version(sheet),
+                                    "none", profile.to_dict())
+        return renderer, profile
+
+    @staticmethod
+    def _profile_pipeline_version(sheet: int = 0) -> str:
+        return pipeline_version("profile", PROFILE_VERSION, TABLE_CACHE_VERSION, sheet)
+
+    def get_table_profile(self, file_id: int, sheet: int = 0) -> Optional[TableProfile]:
+        """表格的列统计概要（均值/方差、分位数、不同值个数、高频值，见 utils/column_sketch.py）
+
+        分块计算，内存与行数无关；结果按内容与工作表缓存，再次查询不重新扫描。不是表格或读取失败时返回 None。
+        """
+        cached = self.analysis_cache.get(self._file_checksum(file_id), "profile",
+                                         self._profile_pipeline_version(sheet), "none")
+        if cached is not None:
+            return TableProfile.from_dict(cached)
+        try:
+            profile = self._scan_table(file_id, sheet)[1]
+        except Exception as e:
+            print(f"[DEBUG] get_table_profile: 读取表格失败: {str(e)}")
+            return None
+        return profile if profile.columns else None
+
+    def _index_extraction(self, file_id: int, artifact: Dict[str, Any]):
+        """尚未分析的文件用提取结果填充全文索引（分析结果写入后由触发器覆盖）
+
+        缓存命中时通常已经索引过，先用只读查询确认索引为空，避免每次读取提取结果都开启写事务；
+        内容相同的新文件命中缓存时索引仍为空，照常填充。
+        """
+        if not self._fts_available() or artifact["content"].startswith("(No extractable text"):
+            return
+        unindexed = self.db.connect().execute(
+            "SELECT 1 FROM files_fts WHERE rowid = ? AND body = '' AND ocr = ''", (file_id,)).fetchone()
+        if unindexed is None:
+            return
+        with self.db.transaction() as conn:
+            conn.execute('''
+                UPDATE files_fts SET body = ?, ocr = ?
+                WHERE rowid = ? AND body = '' AND ocr = ''
+            ''', (artifact["content"], artifact["ocr_content"] or '', file_id))
+
+    def _local_analysis(self, extracted_text: str, ocr_content: Optional[str]) -> Dict[str, Any]:
+        """本地分析：行业分类、关键短语与摘要（不调用DeepSeek）"""
+        classification = self.classify_industry(extracted_text)
+        if isinstance(classification, dict) and 'category' in classification:
+            classification['category'] = self._to_english_category(classification['category'])
+        return {
+            "extracted_text": extracted_text,
+            "ocr_content": ocr_content,
+            "classification": classification,
+            "key_phrases": self.extract_key_phrases(extracted_text),
+            "summary": self.generate_summary(extracted_text),
+            "method": "Local Analysis"
+        }
+
+    def analyze_file_locally(self, file_id: int) -> Dict[str, Any]:
+        """只做本地分析并返回结果，不写入 ai_analysis（供批量分析的工作进程调用）
+
+        结果由调用方通过 save_local_analyses 批量写入；相同内容已有本地分析缓存时直接返回缓存。
+        """
+        try:
+            checksum = self._file_checksum(file_id)
+            cached = self.analysis_cache.get(checksum, "analysis", self._file_analysis_version(file_id), "local")
+            if cached:
+                return {"success": True, "file_id": file_id, "analysis": cached, "cached": True}
+
+            extraction = self.get_extraction(file_id)
+            if not extraction:
+                return {"success": False, "file_id": file_id, "error": "无法提取文件文本内容"}
+
+            analysis = self._local_analysis(extraction["content"], extraction["ocr_content"])
+            return {"success": True, "file_id": file_id, "analysis": analysis, "cached": False}
+        except Exception as e:
+            return {"success": False, "file_id": file_id, "error": str(e)}
+
+    def save_local_analyses(self, results: List[Dict[str, Any]]) -> int:
+        """在一个事务中写入一批 analyze_file_locally 的结果（ai_analysis 记录与分析缓存），返回写入条数"""
+        versions: Dict[Optional[str], str] = {}  # 按需要OCR的文件类型计算一次
+        saved = 0
+        with self.db.transaction() as conn:
+            files = {row[0]: row[1:] for row in conn.execute(
+                f'SELECT id, checksum, file_type, filename FROM files WHERE id IN ({",".join("?" * len(results))})',
+                [result["file_id"] for result in results]
+            ).fetchall()} if results else {}
+            for result in results:
+                if not result.get("success") or result["file_id"] not in files:
+                    continue
+                self._insert_ai_analysis(conn, result["file_id"], result["analysis"])
+                if not result.get("cached"):
+                    checksum, file_type, filename = files[result["file_id"]]
+                    doc_type = self._ocr_doc_type(file_type, filename)
+                    if doc_type not in versions:
+                        versions[doc_type] = self._analysis_pipeline_version(doc_type)
+                    self.analysis_cache.put(checksum, "analysis", versions[doc_type], "local",
+                                            result["analysis"], conn=conn)
+                saved += 1
+        return saved
+
+    def _save_ai_analysis(self, file_id: int, analysis: Dict[str, Any]):
+        """写入一条 ai_analysis 记录（新分析结果或缓存命中）"""
+        with self.db.transaction() as conn:
+            self._insert_ai_analysis(conn, file_id, analysis)
+
+    @staticmethod
+    def _insert_ai_analysis(conn: sqlite3.Connection, file_id: int, analysis: Dict[str, Any]):
+        conn.execute('''
+            INSERT INTO ai_analysis (file_id, analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, ocr_content)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (file_id, "full_analysis", analysis["classification"]["category"],
+              analysis["extracted_text"], json.dumps(analysis["key_phrases"], ensure_ascii=False),
+              analysis["summary"], analysis["classification"]["confidence"], analysis["method"],
+              analysis.get("ocr_content")))
+
+    # ==================== 分析结果缓存 ====================
+
+    def _file_checksum(self, file_id: int) -> Optional[str]:
+        row = self.db.connect().execute('SELECT checksum FROM files WHERE id = ?', (file_id,)).fetchone()
+        return row[0] if row else None
+
+    def _ocr_lang(self) -> str:
+        """Tesseract识别语言（ENABLE_CHINESE_OCR 开启时加入简体中文）"""
+        return 'chi_sim+eng' if os.getenv('ENABLE_CHINESE_OCR', '').lower() in ('1', 'true', 'yes') else 'eng'
+
+    def _ocr_model_name(self, doc_type: str = "image") -> str:
+        """可能处理该类文档的OCR引擎及版本（与可用内存无关），作为提取结果与分析缓存的 model
+
+        安装、升级或用 OCR_ENGINE 指定引擎后旧结果失效；每份OCR结果实际由哪个引擎产生记在 ocr_pages 中（见 _ocr_result_model）。
+        """
+        manager = self._get_ocr_manager()
+        return "+".join(manager.engine_model_name(engine) for engine in manager.candidate_engines(doc_type)) or "none"
+
+    def _ocr_result_model(self, checksum: Optional[str], doc_type: str) -> Optional[str]:
+        """已保存的OCR结果由哪个引擎产生（ocr_pages 的 model）：按引擎优先级取第一个当前仍可用的，没有时返回 None"""
+        models = self.ocr_pages.models(checksum, self._ocr_pipeline_version())
+        if not models:
+            return None
+        manager = self._get_ocr_manager()
+        for engine in manager.candidate_engines(doc_type):
+            model = manager.engine_model_name(engine)
+            if model in models:
+                return model
+        return None
+
+    def _ocr_pipeline_version(self) -> str:
+        return pipeline_version("ocr", ANALYSIS_PIPELINE_VERSION, self._ocr_lang(),
+                                PREPROCESS_VERSION if preprocess_enabled() else None, LAYOUT_FORMAT_VERSION)
+
+    def _analysis_pipeline_version(self, doc_type: Optional[str] = None) -> str:
+        """关键词表、提示词、生成参数任一变化，都会得到新的版本号
+
+        doc_type 为需要OCR的文件类型（见 _ocr_doc_type）时，OCR配置与可用引擎也参与版本号；其他文件不受OCR变化影响。
+        """
+        ocr_parts = (self._ocr_pipeline_version(), self._ocr_model_name(doc_type)) if doc_type else ()
+        return pipeline_version(
+            "analysis", ANALYSIS_PIPELINE_VERSION, self.industry_keywords, INDUSTRY_KEYWORDS,
+            INDUSTRY_ENGLISH_MAPPING, ANALYSIS_SYSTEM_PROMPT, ANALYSIS_USER_PROMPT, ANALYSIS_TEXT_LIMIT,
+            ANALYSIS_MAX_TOKENS, ANALYSIS_TEMPERATURE, *ocr_parts
+        )
+
+    def _file_analysis_version(self, file_id: int) -> str:
+        """文件的分析缓存版本（按文件类型决定OCR配置是否参与）"""
+        row = self.db.connect().execute('SELECT file_type, filename FROM files WHERE id = ?', (file_id,)).fetchone()
+        return self._analysis_pipeline_version(self._ocr_doc_type(*row) if row else None)
+
     def get_ai_analysis(self, file_id: int) -> Optional[Dict[str, Any]]:
         """获取文件的AI分析结果"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
         cursor.execute('''
             SELECT analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, analysis_time
             FROM ai_analysis WHERE file_id = ? ORDER BY analysis_time DESC LIMIT 1
         ''', (file_id,))
         result = cursor.fetchone()
-        conn.close()
 
         if result:
             analysis_type, industry_category, extracted_text, key_phrases, summary, confidence_score, method, analysis_time = result
@@ -2636,27 +2951,44 @@ Please provide detailed analysis results, and clearly state the Industry Classif
             }
         return None
 
+    # ==================== 后台分析任务 ====================
+
+    @staticmethod
+    def _analysis_job_key(file_id: int) -> str:
+        return f"analyze_file:{file_id}"
+
+    def enqueue_analysis(self, file_id: int, priority: int = PRIORITY_HIGH) -> int:
+        """把文件分析放入后台任务队列（同一文件已在排队/执行时不重复入队），返回任务ID"""
+        queue = get_job_queue(self.db)
+        queue.start()
+        return queue.enqueue("analyze_file", {"file_id": file_id}, priority=priority,
+                             dedupe_key=self._analysis_job_key(file_id))
+
+    def get_analysis_job(self, file_id: int) -> Optional[Dict[str, Any]]:
+        """文件最近一次分析任务的状态（status / progress / message / error），没有任务时返回 None"""
+        queue = get_job_queue(self.db)
+        queue.start()
+        return queue.latest(self._analysis_job_key(file_id))
+
     def create_industry_folder(self, category: str) -> int:
         """为行业分类创建文件夹"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        with self.db.transaction() as conn:
+            cursor = conn.cursor()
 
-        # 检查文件夹是否已存在（英文命名）
-        eng_category = self._to_english_category(category)
-        cursor.execute('SELECT id FROM folders WHERE folder_name = ?', (f"AI_{eng_category}",))
-        result = cursor.fetchone()
+            # 检查文件夹是否已存在（英文命名）
+            eng_category = self._to_english_category(category)
+            cursor.execute('SELECT id FROM folders WHERE folder_name = ?', (f"AI_{eng_category}",))
+            result = cursor.fetchone()
 
-        if result:
-            folder_id = result[0]
-        else:
-            cursor.execute('''
-                INSERT INTO folders (folder_name, parent_folder_id)
-                VALUES (?, ?)
-            ''', (f"AI_{eng_category}", None))
-            folder_id = cursor.lastrowid
+            if result:
+                folder_id = result[0]
+            else:
+                cursor.execute('''
+                    INSERT INTO folders (folder_name, parent_folder_id)
+                    VALUES (?, ?)
+                ''', (f"AI_{eng_category}", None))
+                folder_id = cursor.lastrowid
 
-        conn.commit()
-        conn.close()
         return folder_id
 
     def move_file_to_industry_folder(self, file_id: int, category: str) -> Dict[str, Any]:
@@ -2679,12 +3011,10 @@ Please provide detailed analysis results, and clearly state the Industry Classif
             print(f"[DEBUG] move_file_to_industry_folder: 文件夹ID: {folder_id}")
 
             # 更新文件的folder_id
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('UPDATE files SET folder_id = ? WHERE id = ?', (folder_id, file_id))
-            affected_rows = cursor.rowcount
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute('UPDATE files SET folder_id = ? WHERE id = ?', (folder_id, file_id))
+                affected_rows = cursor.rowcount
             
             if affected_rows > 0:
                 print(f"[DEBUG] move_file_to_industry_folder: ✅ 文件移动成功 - file_id: {file_id}, folder_id: {folder_id}")
@@ -2703,19 +3033,16 @@ Please provide detailed analysis results, and clearly state the Industry Classif
     def rename_file(self, file_id: int, new_filename: str) -> Dict[str, Any]:
         """重命名文件"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
 
-            # 检查新文件名是否已存在
-            cursor.execute('SELECT id FROM files WHERE filename = ? AND id != ?', (new_filename, file_id))
-            if cursor.fetchone():
-                conn.close()
-                return {"success": False, "error": "文件名已存在"}
+                # 检查新文件名是否已存在
+                cursor.execute('SELECT id FROM files WHERE filename = ? AND id != ?', (new_filename, file_id))
+                if cursor.fetchone():
+                    return {"success": False, "error": "文件名已存在"}
 
-            # 更新文件名
-            cursor.execute('UPDATE files SET filename = ? WHERE id = ?', (new_filename, file_id))
-            conn.commit()
-            conn.close()
+                # 更新文件名
+                cursor.execute('UPDATE files SET filename = ? WHERE id = ?', (new_filename, file_id))
 
             return {"success": True, "new_filename": new_filename}
         except Exception as e:
@@ -2724,19 +3051,20 @@ Please provide detailed analysis results, and clearly state the Industry Classif
     def delete_file(self, file_id: int) -> Dict[str, Any]:
         """删除文件"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
 
-            # 获取文件路径
-            cursor.execute('SELECT file_path FROM files WHERE id = ?', (file_id,))
-            result = cursor.fetchone()
+                # 获取文件路径
+                cursor.execute('SELECT file_path, checksum FROM files WHERE id = ?', (file_id,))
+                result = cursor.fetchone()
 
-            if result:
-                file_path = result[0]
+                if not result:
+                    return {"success": False, "error": "文件不存在"}
+
+                file_path, checksum = result
 
-                # 删除物理文件
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+                # 释放内容引用（仍被其他文件引用时不删除物理文件）
+                orphan_path = self.blob_store.release(conn, checksum, file_path)
 
                 # 删除数据库记录
                 cursor.execute('DELETE FROM files WHERE id = ?', (file_id,))
@@ -2744,32 +3072,44 @@ Please provide detailed analysis results, and clearly state the Industry Classif
                 # 删除AI分析记录
                 cursor.execute('DELETE FROM ai_analysis WHERE file_id = ?', (file_id,))
 
-                conn.commit()
-                conn.close()
+            # 事务提交后再删除物理文件，回滚时不会丢失内容
+            if orphan_path:
+                self._remove_orphan_content(checksum, orphan_path)
 
-                return {"success": True}
-            else:
-                conn.close()
-                return {"success": False, "error": "文件不存在"}
+            return {"success": True}
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def _remove_orphan_content(self, checksum: Optional[str], file_path: str):
+        """删除不再被引用的内容：物理文件、分析缓存、逐页OCR结果、缩略图/预览图、表格解析缓存
+
+        先删除缓存行取得写锁，再确认 blobs 中没有同一内容的新引用（并发上传与此串行），
+        有新引用时回滚，全部保留。
+        """
+        with self.db.transaction() as conn:
+            if checksum:
+                AnalysisCache.purge(conn, checksum)
+                OCRPageStore.purge(conn, checksum)
+            if not self.blob_store.remove_orphan(conn, checksum, file_path):
+                conn.rollback()
+                return
+            if checksum:
+                self.renditions.remove(checksum)
+                self.table_cache.remove(checksum)
+
     def rename_folder(self, folder_id: int, new_folder_name: str) -> Dict[str, Any]:
         """重命名文件夹"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
 
-            # 检查新文件夹名是否已存在
-            cursor.execute('SELECT id FROM folders WHERE folder_name = ? AND id != ?', (new_folder_name, folder_id))
-            if cursor.fetchone():
-                conn.close()
-                return {"success": False, "error": "文件夹名已存在"}
+                # 检查新文件夹名是否已存在
+                cursor.execute('SELECT id FROM folders WHERE folder_name = ? AND id != ?', (new_folder_name, folder_id))
+                if cursor.fetchone():
+                    return {"success": False, "error": "文件夹名已存在"}
 
-            # 更新文件夹名
-            cursor.execute('UPDATE folders SET folder_name = ? WHERE id = ?', (new_folder_name, folder_id))
-            conn.commit()
-            conn.close()
+                # 更新文件夹名
+                cursor.execute('UPDATE folders SET folder_name = ? WHERE id = ?', (new_folder_name, folder_id))
 
             return {"success": True, "new_folder_name": new_folder_name}
         except Exception as e:
@@ -2778,29 +3118,25 @@ Please provide detailed analysis results, and clearly state the Industry Classif
     def delete_folder(self, folder_id: int) -> Dict[str, Any]:
         """删除文件夹"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
 
-            # 检查文件夹是否为空
-            cursor.execute('SELECT COUNT(*) FROM files WHERE folder_id = ?', (folder_id,))
-            file_count = cursor.fetchone()[0]
+                # 检查文件夹是否为空
+                cursor.execute('SELECT COUNT(*) FROM files WHERE folder_id = ?', (folder_id,))
+                file_count = cursor.fetchone()[0]
 
-            if file_count > 0:
-                conn.close()
-                return {"success": False, "error": f"文件夹不为空，包含 {file_count} 个文件"}
+                if file_count > 0:
+                    return {"success": False, "error": f"文件夹不为空，包含 {file_count} 个文件"}
 
-            # 检查是否有子文件夹
-            cursor.execute('SELECT COUNT(*) FROM folders WHERE parent_folder_id = ?', (folder_id,))
-            subfolder_count = cursor.fetchone()[0]
+                # 检查是否有子文件夹
+                cursor.execute('SELECT COUNT(*) FROM folders WHERE parent_folder_id = ?', (folder_id,))
+                subfolder_count = cursor.fetchone()[0]
 
-            if subfolder_count > 0:
-                conn.close()
-                return {"success": False, "error": f"文件夹包含 {subfolder_count} 个子文件夹"}
+                if subfolder_count > 0:
+                    return {"success": False, "error": f"文件夹包含 {subfolder_count} 个子文件夹"}
 
-            # 删除文件夹
-            cursor.execute('DELETE FROM folders WHERE id = ?', (folder_id,))
-            conn.commit()
-            conn.close()
+                # 删除文件夹
+                cursor.execute('DELETE FROM folders WHERE id = ?', (folder_id,))
 
             return {"success": True}
         except Exception as e:
@@ -2808,8 +3144,7 @@ Please provide detailed analysis results, and clearly state the Industry Classif
 
     def get_folders(self, parent_folder_id: Optional[int] = None) -> List[Dict[str, Any]]:
         """获取文件夹列表"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+        cursor = self.db.connect().cursor()
 
         if parent_folder_id is None:
             cursor.execute('''
@@ -2837,39 +3172,35 @@ Please provide detailed analysis results, and clearly state the Industry Classif
                 "file_count": row[3]
             })
 
-        conn.close()
         return folders
 
     def sync_cached_files(self) -> Dict[str, Any]:
         """同步缓存文件到云端"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 获取所有已缓存的文件
-            cursor.execute('''
-                SELECT id, filename, file_path, last_modified
-                FROM files 
-                WHERE is_cached = TRUE
-            ''')
-
-            cached_files = cursor.fetchall()
-            synced_count = 0
-
-            for file_id, filename, file_path, last_modified in cached_files:
-                # 检查文件是否仍然存在
-                if os.path.exists(file_path):
-                    # 更新最后修改时间
-                    current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                    cursor.execute('''
-                        UPDATE files 
-                        SET last_modified = ? 
-                        WHERE id = ?
-                    ''', (current_time, file_id))
-                    synced_count += 1
-
-            conn.commit()
-            conn.close()
+            with self.db.transaction() as conn:
+                cursor = conn.cursor()
+
+                # 获取所有已缓存的文件
+                cursor.execute('''
+                    SELECT id, filename, file_path, last_modified
+                    FROM files 
+                    WHERE is_cached = TRUE
+                ''')
+
+                cached_files = cursor.fetchall()
+                synced_count = 0
+
+                for file_id, filename, file_path, last_modified in cached_files:
+                    # 检查文件是否仍然存在
+                    if os.path.exists(file_path):
+                        # 更新最后修改时间
+                        current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                        cursor.execute('''
+                            UPDATE files 
+                            SET last_modified = ? 
+                            WHERE id = ?
+                        ''', (current_time, file_id))
+                        synced_count += 1
 
             return {
                 "success": True,
@@ -2880,4 +3211,53 @@ Please provide detailed analysis results, and clearly state the Industry Classif
             return {"success": False, "error": str(e)}
 
 
+# ==================== 后台任务处理函数 ====================
+# 在任务队列的子进程中执行：每个工作进程复用一个 CloudStorageManager（只初始化一次AI模型）
+
+_job_storage_manager: Optional[CloudStorageManager] = None
+
+
+def _get_job_storage_manager() -> CloudStorageManager:
+    global _job_storage_manager
+    if _job_storage_manager is None:
+        _job_storage_manager = CloudStorageManager()
+    return _job_storage_manager
+
+
+def _analyze_file_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """第一阶段（进程池）：文本提取与OCR，完成后登记在线程池中执行的分析阶段
+
+    PDF的OCR中途失败时 get_extraction 抛出异常，任务按退避重试，已识别的页不会重新OCR。
+    """
+    storage_manager = _get_job_storage_manager()
+    extraction = storage_manager.get_extraction(payload["file_id"], on_progress=lambda fraction, message:
+                                                ctx.progress(0.9 * fraction, message))
+    if extraction is None:
+        return {"success": False, "error": "无法提取文件文本内容"}
+    next_payload = {"file_id": payload["file_id"]}
+    if not (extraction["text"] or extraction["ocr_content"]):
+        # 没有提取到内容时结果不进缓存（见 get_extraction），直接交给下一阶段，避免在线程池中重新OCR
+        next_payload["extraction"] = extraction
+    return {"success": True, "next_job": ctx.enqueue_next("analyze_file_text", next_payload)}
+
+
+def _analyze_file_text_job(ctx: JobContext, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """第二阶段（线程池）：DeepSeek调用（网络等待）与分类，提取结果来自缓存"""
+    result = _get_job_storage_manager().analyze_file_with_ai(payload["file_id"], on_progress=ctx.progress,
+                                                             extraction=payload.get("extraction"))
+    # 只保存状态与分类，完整结果已写入 ai_analysis 表；DeepSeek失败回退本地分析时的原因记在任务的 error 列
+    return {
+        "success": result.get("success", False),
+        "error": result.get("error"),
+        "warning": result.get("warning"),
+        "category": (result.get("classification") or {}).get("category"),
+    }
+
+
+# 文本提取与OCR是CPU密集型，放在进程池中执行；DeepSeek请求主要是网络等待，放在线程池中，
+# 多个文件的分析可以并发，也不会排在OCR任务后面
+register_handler("analyze_file", _analyze_file_job, executor="process")
+register_handler("analyze_file_text", _analyze_file_text_job, executor="thread")
+
+
 # 初始化云存储管理器
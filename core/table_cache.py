@@ -0,0 +1,139 @@
+"""表格解析缓存 - 每个上传的CSV/Excel工作表只解析一次，保存为Arrow IPC文件
+
+xlsx解析是最慢的交互操作，而同一工作簿原先在 extract_excel_csv、文本提取、预览页、AI问答中
+每次页面刷新都重新 pd.read_excel。现在第一次读取时边解析边写入
+tables/ab/<校验和>_s<工作表序号>_v<版本>.arrow（未压缩的IPC文件格式，可内存映射），之后：
+- open()        内存映射打开，列数据不复制、不解析
+- iter_frames() 按记录批逐块转为DataFrame，供分块汇总使用（内存只占一批）
+- head()        只转换前几行，供预览使用
+
+与 BlobStore 一样按内容校验和存放，内容相同的文件共享；内容的最后一个引用被删除时一并删除。
+写入先写临时文件，完整写完才 os.replace 到最终路径，读取中断或解析失败不会留下半个缓存。
+未安装 pyarrow 时不缓存，读取方按原方式解析。
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    ARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    ARROW_AVAILABLE = False
+
+TABLE_CACHE_VERSION = 4  # 解析方式（编码、表头、类型推断）变化时加一
+
+
+def _to_arrow(df: pd.DataFrame, schema=None):
+    """DataFrame 转 Arrow 表；列名统一为字符串，混合类型的 object 列（Excel常见：数字与文字混排）转为字符串"""
+    if not all(isinstance(column, str) for column in df.columns):
+        df = df.copy(deep=False)
+        df.columns = [str(column) for column in df.columns]
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowTypeError, pa.ArrowInvalid):
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            df[column] = df[column].map(lambda value: value if pd.isna(value) else str(value))
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+class TableCache:
+    """按校验和存放的表格解析结果（Arrow IPC）"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def path_for(self, checksum: str, sheet: int = 0) -> Path:
+        return self.root / checksum[:2] / f"{checksum}_s{sheet}_v{TABLE_CACHE_VERSION}.arrow"
+
+    def _reader(self, checksum: Optional[str], sheet: int):
+        if not ARROW_AVAILABLE or not checksum:
+            return None
+        path = self.path_for(checksum, sheet)
+        if not path.exists():
+            return None
+        try:
+            return pa.ipc.open_file(pa.memory_map(str(path)))
+        except Exception as e:
+            print(f"[DEBUG] TableCache: 缓存文件损坏，重新解析 - {path.name}: {str(e)}")
+            path.unlink(missing_ok=True)
+            return None
+
+    def open(self, checksum: Optional[str], sheet: int = 0):
+        """内存映射打开缓存的 pyarrow.Table（零拷贝），没有缓存时返回 None"""
+        reader = self._reader(checksum, sheet)
+        return reader.read_all() if reader is not None else None
+
+    def read_frame(self, checksum: Optional[str], sheet: int = 0) -> Optional[pd.DataFrame]:
+        table = self.open(checksum, sheet)
+        return table.to_pandas() if table is not None else None
+
+    def iter_frames(self, checksum: Optional[str], sheet: int = 0) -> Optional[Iterator[pd.DataFrame]]:
+        """逐个记录批转为DataFrame，没有缓存时返回 None"""
+        reader = self._reader(checksum, sheet)
+        if reader is None:
+            return None
+        return (reader.get_batch(i).to_pandas() for i in range(reader.num_record_batches))
+
+    def head(self, checksum: Optional[str], rows: int, sheet: int = 0) -> Optional[Tuple[pd.DataFrame, int]]:
+        """前 rows 行与总行数，没有缓存时返回 None"""
+        table = self.open(checksum, sheet)
+        if table is None:
+            return None
+        return table.slice(0, rows).to_pandas(), table.num_rows
+
+    def write_through(self, checksum: Optional[str], frames: Iterable[pd.DataFrame],
+                      sheet: int = 0) -> Iterator[pd.DataFrame]:
+        """原样产出 frames，同时把每块写为一个记录批；全部产出完才生成缓存文件
+
+        后续块的列类型与第一块不同（如整数列后面出现小数）时按第一块的类型转换，
+        无法转换则放弃本次缓存（数据照常产出）。
+        """
+        if not ARROW_AVAILABLE or not checksum:
+            yield from frames
+            return
+
+        path = self.path_for(checksum, sheet)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.part")
+        writer = None
+        failed = False
+        try:
+            for frame in frames:
+                if not failed:
+                    try:
+                        if writer is None:
+                            table = _to_arrow(frame)
+                            path.parent.mkdir(parents=True, exist_ok=True)
+                            writer = pa.ipc.new_file(str(tmp_path), table.schema)
+                            schema = table.schema
+                        else:
+                            table = _to_arrow(frame, schema)
+                        writer.write_table(table)
+                    except Exception as e:
+                        print(f"[DEBUG] TableCache: 放弃缓存 - {checksum[:12]}: {str(e)}")
+                        failed = True
+                yield frame
+            if writer is not None and not failed:
+                writer.close()
+                writer = None
+                os.replace(tmp_path, path)
+        finally:
+            if writer is not None:
+                writer.close()
+            tmp_path.unlink(missing_ok=True)
+
+    def remove(self, checksum: Optional[str]):
+        """删除内容的全部工作表缓存（内容的最后一个引用被删除后调用）"""
+        if not checksum:
+            return
+        for path in (self.root / checksum[:2]).glob(f"{checksum}_s*.arrow"):
+            try:
+                path.unlink()
+            except OSError as e:  # Windows 上仍被内存映射时无法删除
+                print(f"[DEBUG] TableCache: 删除缓存失败 - {path.name}: {str(e)}")
@@ -0,0 +1,328 @@
+"""可合并的列统计草图 - 分块读取，常数内存得到均值/方差、分位数、基数、高频值
+
+df.describe() 需要整表载入内存，超过内存的传感器导出文件根本无法统计。TableProfile 逐块更新，
+每列只保留固定大小的草图，且两个草图可以合并（多块、多进程、多文件的结果相加即可）：
+- Welford/Chan：计数、均值、方差（数值稳定，可合并）
+- t-digest：分位数（合并式实现，簇大小由 k1 尺度函数约束，两端精度更高）
+- HyperLogLog：不同值个数（2^HLL_P 个寄存器，标准误差约 1.04/sqrt(2^HLL_P) ≈ 1.6%）
+- Misra-Gries：高频值（容量 TOPK_CAPACITY，计数为下界，误差不超过 N/(容量+1)）
+
+to_dict()/from_dict() 可JSON序列化，按文件内容保存在分析缓存中，之后查询不必重新扫描。
+"""
+import base64
+import math
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+PROFILE_VERSION = 1
+TDIGEST_COMPRESSION = 200
+HLL_P = 12
+TOPK_CAPACITY = 64
+TOPK_REPORT = 10
+TOPK_VALUE_CHARS = 100  # 高频值只保存前若干个字符，长文本列的草图大小也固定
+
+
+class Moments:
+    """Welford 计数/均值/二阶中心矩，按 Chan 公式合并"""
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0,
+                 minimum: float = math.inf, maximum: float = -math.inf):
+        self.count, self.mean, self.m2 = count, mean, m2
+        self.minimum, self.maximum = minimum, maximum
+
+    def update(self, values: np.ndarray):
+        if values.size:
+            mean = float(values.mean())
+            self.merge(Moments(int(values.size), mean, float(((values - mean) ** 2).sum()),
+                               float(values.min()), float(values.max())))
+
+    def merge(self, other: "Moments"):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum, self.maximum = min(self.minimum, other.minimum), max(self.maximum, other.maximum)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"count": self.count, "mean": self.mean, "m2": self.m2,
+                "min": self.minimum if self.count else None, "max": self.maximum if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Moments":
+        if not data["count"]:
+            return cls()
+        return cls(data["count"], data["mean"], data["m2"], data["min"], data["max"])
+
+
+class TDigest:
+    """合并式 t-digest：新值与已有簇一起排序后按 k1 尺度函数分桶压缩"""
+
+    def __init__(self, compression: float = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+
+    def update(self, values: np.ndarray):
+        if values.size:
+            self._compress(np.concatenate([self.means, values]),
+                           np.concatenate([self.weights, np.ones(values.size)]))
+
+    def merge(self, other: "TDigest"):
+        if other.weights.size:
+            self._compress(np.concatenate([self.means, other.means]),
+                           np.concatenate([self.weights, other.weights]))
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        cumulative = np.cumsum(weights)
+        q_left = (cumulative - weights) / cumulative[-1]
+        # k1(q) = δ/(2π)·arcsin(2q-1)，同一个整数区间内的点合并为一个簇
+        k = self.compression / (2 * math.pi) * np.arcsin(np.clip(2 * q_left - 1, -1, 1))
+        bucket = np.floor(k - k[0]).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / self.weights
+
+    def quantile(self, q: float, minimum: float, maximum: float) -> float:
+        """q 分位数（首尾用真实的最小/最大值插值）"""
+        if not self.weights.size:
+            return math.nan
+        total = self.weights.sum()
+        centers = np.cumsum(self.weights) - self.weights / 2
+        positions = np.r_[0.0, centers, total]
+        values = np.r_[minimum, self.means, maximum]
+        return float(np.interp(q * total, positions, values))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"means": self.means.tolist(), "weights": self.weights.tolist()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TDigest":
+        digest = cls()
+        digest.means = np.asarray(data["means"], dtype=np.float64)
+        digest.weights = np.asarray(data["weights"], dtype=np.float64)
+        return digest
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """uint64 数组每个元素的二进制位数（二分法，向量化）"""
+    values = values.copy()
+    length = np.zeros(values.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = values >= (np.uint64(1) << np.uint64(shift))
+        length[mask] += shift
+        values[mask] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    """64位哈希（pandas 固定密钥的 SipHash，跨进程/跨次运行一致，可用于持久化后合并）"""
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        values = values.astype(np.float64)  # 整数块与小数块中的同一个数得到相同的哈希
+    return pd.util.hash_pandas_object(values, index=False).to_numpy(dtype=np.uint64)
+
+
+class HyperLogLog:
+    """HyperLogLog 基数估计（寄存器逐个取最大值即可合并）"""
+
+    def __init__(self, p: int = HLL_P):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def update(self, hashes: np.ndarray):
+        if not hashes.size:
+            return
+        index = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p + 1 - _bit_length(rest).astype(np.int64)).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = self.registers.size
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # 小基数时用线性计数
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "HyperLogLog":
+        sketch = cls(data["p"])
+        sketch.registers = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return sketch
+
+
+class TopK:
+    """Misra-Gries 高频值：计数器超过容量时减去第 容量+1 大的计数"""
+
+    def __init__(self, capacity: int = TOPK_CAPACITY):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def update(self, values: pd.Series):
+        counts = values.astype(str).str.slice(0, TOPK_VALUE_CHARS).value_counts()
+        self._merge_counts(dict(zip(counts.index.tolist(), counts.tolist())))
+
+    def merge(self, other: "TopK"):
+        self._merge_counts(other.counts)
+
+    def _merge_counts(self, counts: Dict[str, int]):
+        merged = dict(self.counts)
+        for value, count in counts.items():
+            merged[value] = merged.get(value, 0) + int(count)
+        if len(merged) > self.capacity:
+            threshold = sorted(merged.values(), reverse=True)[self.capacity]
+            merged = {value: count - threshold for value, count in merged.items() if count > threshold}
+        self.counts = merged
+
+    def top(self, k: int = TOPK_REPORT) -> List[tuple]:
+        return sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "counts": self.counts}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TopK":
+        sketch = cls(data["capacity"])
+        sketch.counts = {value: int(count) for value, count in data["counts"].items()}
+        return sketch
+
+
+class ColumnSketch:
+    """一列的全部草图；数值列维护矩与分位数，其他列维护高频值"""
+
+    def __init__(self, numeric: bool):
+        self.numeric = numeric
+        self.rows = 0
+        self.nulls = 0
+        self.moments = Moments()
+        self.digest = TDigest()
+        self.distinct = HyperLogLog()
+        self.top_values = TopK()
+
+    def update(self, values: pd.Series):
+        self.rows += len(values)
+        present = values.dropna()
+        self.nulls += len(values) - len(present)
+        self.distinct.update(hash_values(present))
+        if self.numeric:
+            numbers = pd.to_numeric(present, errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            numbers = numbers[np.isfinite(numbers)]
+            self.moments.update(numbers)
+            self.digest.update(numbers)
+        else:
+            self.top_values.update(present)
+
+    def merge(self, other: "ColumnSketch"):
+        self.rows += other.rows
+        self.nulls += other.nulls
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+        self.distinct.merge(other.distinct)
+        self.top_values.merge(other.top_values)
+
+    def quantile(self, q: float) -> float:
+        return self.digest.quantile(q, self.moments.minimum, self.moments.maximum)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"numeric": self.numeric, "rows": self.rows, "nulls": self.nulls,
+                "moments": self.moments.to_dict(), "digest": self.digest.to_dict(),
+                "distinct": self.distinct.to_dict(), "top_values": self.top_values.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ColumnSketch":
+        sketch = cls(data["numeric"])
+        sketch.rows, sketch.nulls = data["rows"], data["nulls"]
+        sketch.moments = Moments.from_dict(data["moments"])
+        sketch.digest = TDigest.from_dict(data["digest"])
+        sketch.distinct = HyperLogLog.from_dict(data["distinct"])
+        sketch.top_values = TopK.from_dict(data["top_values"])
+        return sketch
+
+
+class TableProfile:
+    """整表的列草图（按列名），逐块 update，或与另一个 TableProfile merge"""
+
+    def __init__(self):
+        self.columns: List[str] = []
+        self.sketches: Dict[str, ColumnSketch] = {}
+        self.row_count = 0
+
+    def update(self, chunk: pd.DataFrame):
+        for column in chunk.columns:
+            name = str(column)
+            if name not in self.sketches:
+                values = chunk[column]
+                self.columns.append(name)
+                self.sketches[name] = ColumnSketch(pd.api.types.is_numeric_dtype(values)
+                                                   and not pd.api.types.is_bool_dtype(values))
+            self.sketches[name].update(chunk[column])
+        self.row_count += len(chunk)
+
+    def merge(self, other: "TableProfile"):
+        for name in other.columns:
+            if name not in self.sketches:
+                self.columns.append(name)
+                self.sketches[name] = ColumnSketch(other.sketches[name].numeric)
+            self.sketches[name].merge(other.sketches[name])
+        self.row_count += other.row_count
+
+    def describe(self) -> pd.DataFrame:
+        """与 df.describe(include='all') 相同形式的统计表（行为统计量，列为表格的列）"""
+        stats: Dict[str, Dict[str, Any]] = {}
+        for name in self.columns:
+            sketch = self.sketches[name]
+            column: Dict[str, Any] = {"count": sketch.rows - sketch.nulls, "distinct": sketch.distinct.estimate()}
+            if sketch.numeric and sketch.moments.count:
+                column.update({
+                    "mean": sketch.moments.mean, "std": sketch.moments.std, "min": sketch.moments.minimum,
+                    "25%": sketch.quantile(0.25), "50%": sketch.quantile(0.5), "75%": sketch.quantile(0.75),
+                    "max": sketch.moments.maximum,
+                })
+            elif sketch.top_values.counts:
+                value, count = sketch.top_values.top(1)[0]
+                column.update({"top": value, "freq": count})
+            stats[name] = column
+        index = ["count", "distinct", "mean", "std", "min", "25%", "50%", "75%", "max", "top", "freq"]
+        return pd.DataFrame(stats, index=index, columns=self.columns).dropna(how='all')
+
+    def top_values(self, column: str, k: int = TOPK_REPORT) -> List[tuple]:
+        return self.sketches[column].top_values.top(k)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": PROFILE_VERSION, "row_count": self.row_count, "columns": self.columns,
+                "sketches": {name: sketch.to_dict() for name, sketch in self.sketches.items()}}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TableProfile":
+        profile = cls()
+        profile.row_count, profile.columns = data["row_count"], list(data["columns"])
+        profile.sketches = {name: ColumnSketch.from_dict(sketch) for name, sketch in data["sketches"].items()}
+        return profile
+
+    def summary_text(self, max_top_columns: int = 5) -> str:
+        """统计表 + 文本列的高频值，用于提示词"""
+        text = self.describe().to_string()
+        lines = []
+        for name in [name for name in self.columns if not self.sketches[name].numeric][:max_top_columns]:
+            top = self.top_values(name, 5)
+            if top:
+                lines.append(f"{name}: " + ", ".join(f"{value[:40]} ({count})" for value, count in top))
+        return text + ("\n\nTop values:\n" + "\n".join(lines) if lines else "")
@@ -0,0 +1,168 @@
+"""CSV编码与格式探测 - 只读取文件开头 SNIFF_BYTES 字节，一次确定编码、分隔符、引号与表头
+
+原先按UTF-8解析整个文件，遇到 UnicodeDecodeError 再按GBK从头解析一遍，大文件要解析两次；
+文本提取等读取方则完全不尝试其他编码。现在上传时探测一次，结果保存在 files.csv_dialect 中，
+所有CSV读取方都用 read_csv_options() 得到相同的参数：
+- 编码：BOM > UTF-8 > GB18030（GBK的超集） > Latin-1（不会失败）；开头全是ASCII时无法判断
+  （GBK文件的中文可能在第一万行才出现），这时按同样顺序严格解码更大的一段（只解码不解析，见 resolve_encoding）：
+  文件不大时解码全部内容，否则只解码开头 RESOLVE_HEAD_BYTES 与末尾 RESOLVE_TAIL_BYTES，
+  结果记为 "provisional": True（中间部分未检查）
+- 分隔符/引号：csv.Sniffer，在 , ; \\t | 中选择，无法判断时用逗号
+- 表头：默认第一行是表头；只有 Sniffer 判断没有表头、且第一行全是数字时才视为无表头（传感器导出常见）
+
+开头之后才出现的少量非法字节用替换字符解码（encoding_errors="replace"），不会因此重新解析。
+"""
+import codecs
+import csv
+import json
+import os
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+SNIFF_BYTES = 64 * 1024
+DECODE_CHUNK_BYTES = 1024 * 1024  # resolve_encoding 每次读取的字节数
+RESOLVE_HEAD_BYTES = 8 * 1024 * 1024  # resolve_encoding 最多检查的开头字节数
+RESOLVE_TAIL_BYTES = 1024 * 1024  # 以及末尾字节数
+CANDIDATE_DELIMITERS = ",;\t|"
+FALLBACK_ENCODINGS = ('utf-8', 'gb18030')
+
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+DEFAULT_DIALECT: Dict[str, Any] = {"encoding": "utf-8", "delimiter": ",", "quotechar": '"', "header": True}
+
+
+def detect_encoding(prefix: bytes, complete: bool = True) -> Optional[str]:
+    """按BOM与严格解码判断编码（末尾被截断的多字节字符不算错误）
+
+    complete 为 False 表示 prefix 只是文件开头：全是ASCII时各候选编码都能解码，返回 None（未定，见 resolve_encoding）。
+    """
+    for bom, encoding in _BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    if not complete and prefix.isascii():
+        return None
+    for encoding in FALLBACK_ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def _decodes_strictly(f: BinaryIO, encoding: str, start: int, length: int, final: bool) -> bool:
+    """严格解码文件中 [start, start + length) 的字节是否成功
+
+    start 不在文件开头时从其后第一个换行之后开始（换行符不会是UTF-8/GB18030多字节字符的一部分）；
+    纯ASCII的块（且前一块没有截断的多字节字符）直接跳过，不必解码。
+    """
+    f.seek(start)
+    decoder = codecs.getincrementaldecoder(encoding)()
+    remaining, skip_to_line = length, start > 0
+    try:
+        while remaining > 0:
+            chunk = f.read(min(DECODE_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            if skip_to_line:
+                newline = chunk.find(b'\n')
+                if newline < 0:
+                    continue
+                chunk, skip_to_line = chunk[newline + 1:], False
+            if not (chunk.isascii() and not decoder.getstate()[0]):
+                decoder.decode(chunk)
+        decoder.decode(b'', final=final)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def resolve_encoding(file_path: str) -> Tuple[str, bool]:
+    """严格按UTF-8解码，失败再试GB18030，都失败时用Latin-1；返回 (encoding, provisional)
+
+    不超过 RESOLVE_HEAD_BYTES + RESOLVE_TAIL_BYTES 的文件解码全部内容，provisional 为 False；
+    更大的文件只解码开头与末尾，读取量有上限，provisional 为 True——中间出现的其他编码字节
+    读取时按替换字符处理（见 read_csv_options）。
+    """
+    size = os.path.getsize(file_path)
+    provisional = size > RESOLVE_HEAD_BYTES + RESOLVE_TAIL_BYTES
+    if provisional:
+        segments = [(0, RESOLVE_HEAD_BYTES), (size - RESOLVE_TAIL_BYTES, RESOLVE_TAIL_BYTES)]
+    else:
+        segments = [(0, size)]
+    with open(file_path, 'rb') as f:
+        for encoding in FALLBACK_ENCODINGS:
+            if all(_decodes_strictly(f, encoding, start, length, final=start + length >= size)
+                   for start, length in segments):
+                return encoding, provisional
+    return 'latin-1', provisional
+
+
+def _is_number(value: str) -> bool:
+    try:
+        float(value.replace(',', ''))
+        return True
+    except ValueError:
+        return False
+
+
+def sniff_csv(file_path: str) -> Dict[str, Any]:
+    """探测CSV的编码、分隔符、引号和表头，返回 {"encoding", "delimiter", "quotechar", "header"}
+
+    编码只根据大文件的开头与末尾确定时另有 "provisional": True（见 resolve_encoding）。
+    """
+    with open(file_path, 'rb') as f:
+        prefix = f.read(SNIFF_BYTES)
+    if not prefix:
+        return dict(DEFAULT_DIALECT)
+
+    encoding = detect_encoding(prefix, complete=len(prefix) < SNIFF_BYTES)
+    provisional = False
+    if encoding is None:
+        encoding, provisional = resolve_encoding(file_path)
+    text = codecs.getincrementaldecoder(encoding)(errors='replace').decode(prefix, final=False)
+    if len(prefix) == SNIFF_BYTES and '\n' in text:
+        text = text[:text.rindex('\n')]  # 去掉被截断的最后一行
+
+    dialect = dict(DEFAULT_DIALECT, encoding=encoding)
+    if provisional:
+        dialect["provisional"] = True
+    sniffer = csv.Sniffer()
+    try:
+        sniffed = sniffer.sniff(text, delimiters=CANDIDATE_DELIMITERS)
+        dialect["delimiter"], dialect["quotechar"] = sniffed.delimiter, sniffed.quotechar or '"'
+    except csv.Error:
+        return dialect
+
+    try:
+        first_row = next(csv.reader(text.splitlines()[:1], delimiter=dialect["delimiter"],
+                                    quotechar=dialect["quotechar"]), [])
+        if not sniffer.has_header(text) and first_row and all(_is_number(v.strip()) for v in first_row if v.strip()):
+            dialect["header"] = False
+    except csv.Error:
+        pass
+    return dialect
+
+
+def read_csv_options(dialect: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """探测结果对应的 pandas.read_csv 参数"""
+    dialect = dialect or DEFAULT_DIALECT
+    return {
+        "encoding": dialect["encoding"],
+        "encoding_errors": "replace",
+        "sep": dialect["delimiter"],
+        "quotechar": dialect["quotechar"],
+        "header": 0 if dialect["header"] else None,
+    }
+
+
+def dumps_dialect(dialect: Dict[str, Any]) -> str:
+    return json.dumps(dialect, ensure_ascii=False)
+
+
+def loads_dialect(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    return json.loads(value) if value else None
@@ -0,0 +1,258 @@
+"""OCR前的图像预处理 - 基于numpy的向量化实现
+
+手机拍摄的田间记录表、扫描件常见问题：光照不均、纸张倾斜、桌面等深色边框、
+文字过小或过大。直接交给Tesseract时识别慢且错误多。预处理步骤：
+1. 灰度化
+2. 裁掉深色边框
+3. 自适应二值化（Sauvola，积分图计算局部均值/方差，适应光照不均；按行分条计算，内存与图像大小无关）
+4. 纠正倾斜（投影轮廓法，在 ±MAX_SKEW_ANGLE 度范围内搜索）
+5. 分辨率归一化（按估计的文字行高缩放，使行高接近 Tesseract 最适合的 TARGET_LINE_HEIGHT 像素）
+
+preprocess_with_transform 同时返回 BoxTransform，可把OCR在预处理图上得到的文字框换算回原图坐标。
+
+预处理默认关闭，设置环境变量 OCR_PREPROCESS=1 开启：准确率收益尚未在有 Tesseract 的环境中测量，
+开启前先运行 benchmarks/ocr_preprocess_benchmark.py 比较效果与耗时。
+"""
+import math
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+PREPROCESS_VERSION = 2  # 预处理算法变化时加一（参与OCR缓存的 pipeline_version）
+
+SAUVOLA_K = 0.2
+SAUVOLA_R = 128.0
+SAUVOLA_WINDOW_FRACTION = 1 / 40  # 局部窗口边长约为短边的 1/40
+MIN_SAUVOLA_WINDOW = 15
+SAUVOLA_STRIP_ROWS = 256  # 每次计算的行数（另加上下各半个窗口），积分图只覆盖这一条
+
+BORDER_DARK_FRACTION = 0.6  # 边缘行/列中深色像素（Otsu阈值以下）超过该比例视为边框
+BORDER_MARGIN = 0.01  # 有边框的一侧再向内裁掉的比例
+
+MAX_SKEW_ANGLE = 5.0
+SKEW_ANGLE_STEP = 0.25
+SKEW_ESTIMATE_SIZE = 800  # 估计倾斜角时先缩小到该尺寸
+ESTIMATE_MAX_DIMENSION = 2000  # 估计倾斜角与行高用的二值图最大边长（大照片先缩小，只有最终二值化在全分辨率上做）
+
+TARGET_LINE_HEIGHT = 32  # 像素，约等于300 DPI下10~12号字的行高
+MIN_SCALE, MAX_SCALE = 0.5, 3.0
+MAX_OUTPUT_DIMENSION = 4000  # 放大后的最大边长，避免内存占用过高
+
+
+def preprocess_enabled() -> bool:
+    return os.getenv('OCR_PREPROCESS', '0').lower() in ('1', 'true', 'yes')
+
+
+def mask_to_image(mask: np.ndarray) -> Image.Image:
+    """布尔数组 -> "L" 模式图像（True 为255），直接生成 uint8，不经过 int64 中间数组"""
+    return Image.fromarray(mask.astype(np.uint8) * np.uint8(255))
+
+
+def to_grayscale(image: Image.Image) -> np.ndarray:
+    """灰度化，返回 uint8 数组"""
+    return np.asarray(image.convert("L"))
+
+
+def _window_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """每个像素周围 window×window 窗口内的和（边缘处窗口截断）：先按列、再按行求滑动和，两次都用前缀和相减"""
+    return _running_sums(_running_sums(values, window // 2, axis=0), window // 2, axis=1)
+
+
+def _running_sums(values: np.ndarray, half: int, axis: int) -> np.ndarray:
+    """沿 axis 的滑动窗口和（窗口 [i-half, i+half]，边缘截断）
+
+    前缀和两端按边缘值各延长 half 个元素，窗口的上下界都变成连续切片，不需要逐元素索引。
+    """
+    size = values.shape[axis]
+    pad = [(0, 0)] * values.ndim
+    pad[axis] = (1, 0)
+    prefix = np.pad(values, pad).cumsum(axis=axis)
+    pad[axis] = (half, half)
+    prefix = np.pad(prefix, pad, mode='edge')
+    index = [slice(None)] * values.ndim
+    index[axis] = slice(2 * half + 1, 2 * half + 1 + size)
+    upper = prefix[tuple(index)]
+    index[axis] = slice(0, size)
+    return upper - prefix[tuple(index)]
+
+
+def sauvola_binarize(gray: np.ndarray, window: int = 0) -> np.ndarray:
+    """Sauvola自适应二值化，返回布尔数组（True 为文字/深色像素）
+
+    按 SAUVOLA_STRIP_ROWS 行分条计算：每条连同上下各半个窗口一起求积分图，条内每个像素的窗口都完整落在其中，
+    结果与整图计算相同；浮点中间数组只有一条大小（1200万像素的照片整图计算需要约500MB）。
+    """
+    if not window:
+        window = max(MIN_SAUVOLA_WINDOW, int(min(gray.shape) * SAUVOLA_WINDOW_FRACTION) | 1)
+    half = window // 2
+    height = gray.shape[0]
+    strip_rows = max(SAUVOLA_STRIP_ROWS, 4 * half)
+    result = np.empty(gray.shape, dtype=bool)
+    for start in range(0, height, strip_rows):
+        stop = min(start + strip_rows, height)
+        top, bottom = max(start - half, 0), min(stop + half, height)
+        result[start:stop] = _sauvola_block(gray[top:bottom], half)[start - top:stop - top]
+    return result
+
+
+def _sauvola_block(gray: np.ndarray, half: int) -> np.ndarray:
+    """整块计算Sauvola（块的边缘按图像边缘截断窗口）"""
+    values = gray.astype(np.float64)
+    height, width = gray.shape
+    rows = np.arange(height)
+    cols = np.arange(width)
+    counts = ((np.clip(rows + half + 1, 0, height) - np.clip(rows - half, 0, height))[:, None]
+              * (np.clip(cols + half + 1, 0, width) - np.clip(cols - half, 0, width))[None, :])
+    mean = _window_sums(values, 2 * half + 1) / counts
+    variance = _window_sums(values * values, 2 * half + 1) / counts - mean * mean
+    std = np.sqrt(np.maximum(variance, 0))
+    threshold = mean * (1 + SAUVOLA_K * (std / SAUVOLA_R - 1))
+    return values < threshold
+
+
+def otsu_threshold(gray: np.ndarray) -> float:
+    """Otsu全局阈值（最大化类间方差）"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = hist.cumsum()
+    total = weight[-1]
+    cumulative_mean = (hist * levels).cumsum()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between = (cumulative_mean[-1] * weight - cumulative_mean * total) ** 2 / (weight * (total - weight))
+    between = between[:-1]
+    if np.all(np.isnan(between)):
+        return float(gray.flat[0])  # 单一灰度（空白图）
+    return float(np.nanargmax(between))
+
+
+def content_bbox(gray: np.ndarray) -> Tuple[int, int, int, int]:
+    """去掉边缘深色边框（桌面、扫描仪盖板）后的内容区域 (top, bottom, left, right)
+
+    用Otsu阈值区分深色背景与纸张（对光照渐变不敏感），深色像素超过
+    BORDER_DARK_FRACTION 的边缘行/列视为边框；有边框的一侧再向内多裁 BORDER_MARGIN，去掉纸张边缘的阴影。
+    """
+    dark = gray <= otsu_threshold(gray)
+    height, width = gray.shape
+
+    def trim(profile: np.ndarray, size: int) -> Tuple[int, int]:
+        light = np.flatnonzero(profile < BORDER_DARK_FRACTION)
+        if light.size == 0:
+            return 0, size
+        start, end = int(light[0]), int(light[-1]) + 1
+        margin = int(size * BORDER_MARGIN)
+        if start > 0:
+            start = min(start + margin, end)
+        if end < size:
+            end = max(end - margin, start)
+        return start, end
+
+    top, bottom = trim(dark.mean(axis=1), height)
+    left, right = trim(dark.mean(axis=0), width)
+    if bottom - top < height // 4 or right - left < width // 4:
+        return 0, height, 0, width  # 裁剪后太小，多半是整页深色背景，不裁剪
+    return top, bottom, left, right
+
+
+def estimate_skew(dark: np.ndarray) -> float:
+    """投影轮廓法估计倾斜角（度）：文字行水平时，行方向投影的方差最大"""
+    image = mask_to_image(dark)
+    image.thumbnail((SKEW_ESTIMATE_SIZE, SKEW_ESTIMATE_SIZE))
+    best_angle = 0.0
+    best_score = float(np.var(np.asarray(image, dtype=np.float32).sum(axis=1)))  # 不旋转；得分相同时不旋转
+    for angle in np.arange(-MAX_SKEW_ANGLE, MAX_SKEW_ANGLE + SKEW_ANGLE_STEP / 2, SKEW_ANGLE_STEP):
+        rotated = np.asarray(image.rotate(float(angle), resample=Image.Resampling.NEAREST), dtype=np.float32)
+        score = float(np.var(rotated.sum(axis=1)))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def estimate_line_height(dark: np.ndarray) -> float:
+    """按行投影估计文字行高（像素）：连续含墨行的长度中位数，没有文字时返回0"""
+    row_ink = dark.mean(axis=1)
+    text_rows = row_ink > max(0.01, row_ink.mean() * 0.2)
+    # 连续 True 段的起止位置
+    edges = np.diff(np.concatenate(([0], text_rows.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    heights = ends - starts
+    heights = heights[heights >= 3]  # 忽略噪点
+    return float(np.median(heights)) if heights.size else 0.0
+
+
+class BoxTransform:
+    """预处理的几何变换（裁边 -> 旋转 -> 缩放），用于把预处理图上的文字框换算回原图"""
+
+    def __init__(self, crop_left: int, crop_top: int, crop_size: Tuple[int, int],
+                 angle: float, rotated_size: Tuple[int, int], scale: float):
+        self.crop_left, self.crop_top = crop_left, crop_top
+        self.crop_size = crop_size
+        self.angle = angle
+        self.rotated_size = rotated_size
+        self.scale = scale
+
+    def to_source(self, left: np.ndarray, top: np.ndarray, width: np.ndarray,
+                  height: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """预处理图上的框 (left, top, width, height) -> 原图上的外接框（旋转后的框取四角的外接矩形）"""
+        left, top = np.asarray(left, np.float64), np.asarray(top, np.float64)
+        width, height = np.asarray(width, np.float64), np.asarray(height, np.float64)
+        # 四个角，形状 (4, N)
+        xs = np.stack([left, left + width, left, left + width]) / self.scale
+        ys = np.stack([top, top, top + height, top + height]) / self.scale
+        if self.angle:
+            # PIL rotate(expand=True) 绕中心逆时针旋转，这里做逆变换
+            theta = math.radians(self.angle)
+            dx, dy = xs - self.rotated_size[0] / 2, ys - self.rotated_size[1] / 2
+            xs = math.cos(theta) * dx - math.sin(theta) * dy + self.crop_size[0] / 2
+            ys = math.sin(theta) * dx + math.cos(theta) * dy + self.crop_size[1] / 2
+        xs, ys = xs + self.crop_left, ys + self.crop_top
+        x0, y0 = xs.min(axis=0), ys.min(axis=0)
+        return x0, y0, xs.max(axis=0) - x0, ys.max(axis=0) - y0
+
+
+def preprocess_for_ocr(image: Image.Image) -> Image.Image:
+    """完整预处理流程，返回适合Tesseract的二值图（"L" 模式，白底黑字）"""
+    return preprocess_with_transform(image)[0]
+
+
+def preprocess_with_transform(image: Image.Image) -> Tuple[Image.Image, Optional[BoxTransform]]:
+    """preprocess_for_ocr，同时返回几何变换（图像太小未处理时为 None）"""
+    gray = to_grayscale(image)
+    if min(gray.shape) < 32:
+        return image, None
+
+    top, bottom, left, right = content_bbox(gray)
+    gray = gray[top:bottom, left:right]
+    crop_size = (gray.shape[1], gray.shape[0])
+    # 倾斜角与行高在缩小后的二值图上估计，行高再按缩小比例换算回来
+    factor = min(1.0, ESTIMATE_MAX_DIMENSION / max(crop_size))
+    small = gray
+    if factor < 1:
+        small = np.asarray(Image.fromarray(gray).resize(
+            (max(1, round(crop_size[0] * factor)), max(1, round(crop_size[1] * factor))), Image.Resampling.BOX))
+    dark = sauvola_binarize(small)
+
+    angle = estimate_skew(dark)
+    gray_image = Image.fromarray(gray)
+    if angle:
+        gray_image = gray_image.rotate(angle, resample=Image.Resampling.BILINEAR, expand=True, fillcolor=255)
+        dark = np.asarray(mask_to_image(dark).rotate(angle, resample=Image.Resampling.NEAREST, expand=True)) > 127
+
+    rotated_size = gray_image.size
+    scale = 1.0
+    line_height = estimate_line_height(dark) / factor
+    if line_height:
+        scale = float(np.clip(TARGET_LINE_HEIGHT / line_height, MIN_SCALE, MAX_SCALE))
+        scale = min(scale, MAX_OUTPUT_DIMENSION / max(gray_image.size))
+        if abs(scale - 1) > 0.1:
+            new_size = (max(1, round(gray_image.width * scale)), max(1, round(gray_image.height * scale)))
+            gray_image = gray_image.resize(new_size, Image.Resampling.LANCZOS)
+            scale = gray_image.width / rotated_size[0]
+        else:
+            scale = 1.0
+
+    binary = sauvola_binarize(np.asarray(gray_image))
+    transform = BoxTransform(left, top, crop_size, angle, rotated_size, scale)
+    return mask_to_image(~binary), transform
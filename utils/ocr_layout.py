@@ -0,0 +1,189 @@
+"""OCR词级版面 - 以numpy结构化数组保存每个词的位置、置信度与行/段/块编号
+
+Tesseract 的 image_to_data 会给出每个词的外接框、置信度以及所属的块（block）、段落（par）、
+行（line）编号。只保留纯文本时这些信息就丢了，高亮、区域裁剪、表格重建和按置信度过滤都只能重新OCR。
+这里把词级结果压缩为一个二进制块（每词28字节 + 文字）保存在 ocr_pages.layout 中：
+
+    头部: b"OCRL" + 格式版本(u1) + 原图宽高(f4, f4) + 词数(u4)
+    词表: WORD_DTYPE 结构化数组的原始字节
+    文字: 各词以换行符连接的UTF-8（Tesseract的词不含空白）
+
+坐标为原始图片的像素（PDF为页面的点），已经换算过预处理的裁边、纠偏、缩放和PDF渲染倍数。
+"""
+import struct
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+LAYOUT_FORMAT_VERSION = 1
+
+WORD_DTYPE = np.dtype([
+    ('block', '<u2'), ('par', '<u2'), ('line', '<u2'), ('word', '<u2'),
+    ('left', '<f4'), ('top', '<f4'), ('width', '<f4'), ('height', '<f4'),
+    ('conf', '<f4'),  # 0~100，-1 表示引擎没有给出置信度
+])
+
+_HEADER = struct.Struct('<4sBffI')
+_MAGIC = b'OCRL'
+
+TABLE_COLUMN_GAP = 2.0  # 同一行中词间距超过 该倍数×行高 时视为换列
+
+
+class OCRLayout:
+    """一页（或一张图片）的词级OCR结果"""
+
+    def __init__(self, words: np.ndarray, texts: List[str], width: float = 0.0, height: float = 0.0):
+        self.words = words
+        self.texts = texts
+        self.width, self.height = width, height
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def _subset(self, mask: np.ndarray) -> "OCRLayout":
+        return OCRLayout(self.words[mask], [text for text, keep in zip(self.texts, mask) if keep],
+                         self.width, self.height)
+
+    # ==================== 序列化 ====================
+
+    def pack(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, LAYOUT_FORMAT_VERSION, self.width, self.height, len(self.texts))
+        return header + self.words.astype(WORD_DTYPE, copy=False).tobytes() + '\n'.join(self.texts).encode('utf-8')
+
+    @classmethod
+    def unpack(cls, blob: bytes) -> "OCRLayout":
+        magic, version, width, height, count = _HEADER.unpack_from(blob)
+        if magic != _MAGIC or version != LAYOUT_FORMAT_VERSION:
+            raise ValueError(f"不支持的OCR版面格式: {magic!r} v{version}")
+        end = _HEADER.size + count * WORD_DTYPE.itemsize
+        words = np.frombuffer(blob, dtype=WORD_DTYPE, count=count, offset=_HEADER.size)
+        texts = blob[end:].decode('utf-8').split('\n') if count else []
+        return cls(words, texts, width, height)
+
+    # ==================== 构造 ====================
+
+    @classmethod
+    def empty(cls, width: float = 0.0, height: float = 0.0) -> "OCRLayout":
+        return cls(np.zeros(0, dtype=WORD_DTYPE), [], width, height)
+
+    @classmethod
+    def from_tesseract_data(cls, data: Dict[str, List[Any]], width: float, height: float) -> "OCRLayout":
+        """pytesseract.image_to_data(output_type=Output.DICT) 的结果，只保留非空的词（level 5）"""
+        level = np.asarray(data['level'], dtype=np.int32)
+        texts = [str(text).strip() for text in data['text']]
+        keep = (level == 5) & np.array([bool(text) for text in texts], dtype=bool)
+        words = np.zeros(int(keep.sum()), dtype=WORD_DTYPE)
+        for field, key in (('block', 'block_num'), ('par', 'par_num'), ('line', 'line_num'), ('word', 'word_num'),
+                           ('left', 'left'), ('top', 'top'), ('width', 'width'), ('height', 'height'),
+                           ('conf', 'conf')):
+            words[field] = np.asarray(data[key], dtype=np.float64)[keep]
+        return cls(words, [text for text, kept in zip(texts, keep) if kept], width, height)
+
+    @classmethod
+    def from_boxes(cls, results: List[Tuple], width: float, height: float) -> "OCRLayout":
+        """EasyOCR/PaddleOCR 的行级结果 [(四边形, 文字, 置信度0~1)]，每行作为一个“词”"""
+        results = [result for result in results if result[0] is not None and str(result[1]).strip()]
+        words = np.zeros(len(results), dtype=WORD_DTYPE)
+        if results:
+            quads = np.asarray([np.asarray(result[0], dtype=np.float64).reshape(-1, 2) for result in results])
+            x0, y0 = quads[:, :, 0].min(axis=1), quads[:, :, 1].min(axis=1)
+            words['block'] = words['par'] = words['word'] = 1
+            words['line'] = np.arange(1, len(results) + 1)
+            words['left'], words['top'] = x0, y0
+            words['width'], words['height'] = quads[:, :, 0].max(axis=1) - x0, quads[:, :, 1].max(axis=1) - y0
+            words['conf'] = [float(result[2]) * 100 if result[2] is not None else -1 for result in results]
+        return cls(words, [str(result[1]).strip() for result in results], width, height)
+
+    def to_source(self, transform=None, zoom: float = 1.0,
+                  source_size: Optional[Tuple[float, float]] = None) -> "OCRLayout":
+        """把预处理图上的坐标换算回原图（transform 为 image_preprocess.BoxTransform），再除以渲染倍数 zoom"""
+        words = self.words.copy()
+        if transform is not None and len(words):
+            words['left'], words['top'], words['width'], words['height'] = transform.to_source(
+                words['left'], words['top'], words['width'], words['height'])
+        if zoom != 1:
+            for field in ('left', 'top', 'width', 'height'):
+                words[field] /= zoom
+        width, height = source_size or (self.width / zoom, self.height / zoom)
+        return OCRLayout(words, list(self.texts), width, height)
+
+    # ==================== 查询 ====================
+
+    def text(self) -> str:
+        """按块/段/行还原纯文本：词之间空格，行之间换行，块之间空一行"""
+        blocks: List[str] = []
+        lines: List[str] = []
+        current_line: List[str] = []
+        previous = None
+        for (block, par, line), text in zip(self.words[['block', 'par', 'line']].tolist(), self.texts):
+            if previous is not None and (block, par, line) != previous:
+                lines.append(' '.join(current_line))
+                current_line = []
+                if block != previous[0]:
+                    blocks.append('\n'.join(lines))
+                    lines = []
+            current_line.append(text)
+            previous = (block, par, line)
+        if current_line:
+            lines.append(' '.join(current_line))
+        if lines:
+            blocks.append('\n'.join(lines))
+        return '\n\n'.join(blocks)
+
+    def filter(self, min_conf: float) -> "OCRLayout":
+        """只保留置信度不低于 min_conf（0~100）的词；没有置信度的词保留"""
+        conf = self.words['conf']
+        return self._subset((conf >= min_conf) | (conf < 0))
+
+    def region(self, left: float, top: float, right: float, bottom: float) -> "OCRLayout":
+        """中心点落在矩形内的词（区域裁剪）"""
+        center_x = self.words['left'] + self.words['width'] / 2
+        center_y = self.words['top'] + self.words['height'] / 2
+        return self._subset((center_x >= left) & (center_x <= right) & (center_y >= top) & (center_y <= bottom))
+
+    def find(self, term: str) -> List[Tuple[float, float, float, float]]:
+        """包含 term 的词（不区分大小写）的框 (left, top, width, height)，用于高亮"""
+        term = term.lower()
+        boxes = self.words[['left', 'top', 'width', 'height']].tolist()
+        return [box for box, text in zip(boxes, self.texts) if term in text.lower()]
+
+    def lines(self) -> List[Dict[str, Any]]:
+        """按行汇总：[{"text", "box": (left, top, width, height), "conf"}]"""
+        if not len(self):
+            return []
+        keys = self.words['block'].astype(np.int64) << 32 | self.words['par'].astype(np.int64) << 16 | self.words['line']
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        ends = np.r_[starts[1:], len(keys)]
+        result = []
+        for start, end in zip(starts, ends):
+            words = self.words[start:end]
+            x0, y0 = float(words['left'].min()), float(words['top'].min())
+            x1 = float((words['left'] + words['width']).max())
+            y1 = float((words['top'] + words['height']).max())
+            conf = words['conf'][words['conf'] >= 0]
+            result.append({
+                "text": ' '.join(self.texts[start:end]),
+                "box": (x0, y0, x1 - x0, y1 - y0),
+                "conf": float(conf.mean()) if conf.size else -1.0,
+            })
+        return result
+
+    def table_rows(self, column_gap: float = TABLE_COLUMN_GAP) -> List[List[str]]:
+        """重建表格：按垂直中心把词聚成行（表格单元格常被Tesseract分到不同的块，不能按行号），
+        行内按横坐标排序，词间距大于 column_gap×词高 处切分为单元格"""
+        if not len(self):
+            return []
+        center_y = self.words['top'] + self.words['height'] / 2
+        row_height = float(np.median(self.words['height'])) or 1.0
+        order = np.argsort(center_y, kind='stable')
+        # 与上一个词的垂直中心相差超过半个行高时开始新的一行
+        breaks = np.flatnonzero(np.diff(center_y[order]) > row_height / 2) + 1
+        rows = []
+        for members in np.split(order, breaks):
+            members = members[np.argsort(self.words['left'][members], kind='stable')]
+            right = self.words['left'][members] + self.words['width'][members]
+            gaps = self.words['left'][members][1:] - right[:-1]
+            cell_breaks = np.flatnonzero(gaps > column_gap * row_height) + 1
+            rows.append([' '.join(self.texts[index] for index in cell)
+                         for cell in np.split(members, cell_breaks)])
+        return rows
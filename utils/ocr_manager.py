@@ -1,13 +1,258 @@
 """
 OCR管理器 - 支持多种OCR引擎，自动选择最适合的方案
 根据服务器内存情况自动选择OCR引擎
+
+整个进程共用一个 OCRManager（get_ocr_manager）：
+- 已加载的引擎常驻内存（预热池），再次使用时不必重新加载模型
+- 引擎占用的内存合计超过 OCR_MEMORY_BUDGET_MB 时，按最近最少使用（LRU）卸载空闲引擎
+- 按文档类型与可用内存自动选择引擎（OCR_ENGINE 环境变量可强制指定）
+- 记录每个引擎的调用次数、识别量与吞吐（get_stats）
 """
 
 import os
 import gc
-from typing import Optional, List, Tuple, Dict
+import atexit
+import importlib.util
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from typing import Any, Iterator, Optional, List, Tuple, Dict
 from enum import Enum
 
+from utils.image_preprocess import BoxTransform, preprocess_enabled, preprocess_for_ocr, preprocess_with_transform
+from utils.ocr_layout import OCRLayout, WORD_DTYPE
+
+PDF_OCR_ZOOM = 2  # PDF页面渲染倍数（2倍约等于144 DPI）
+PAGE_OCR_MEMORY_MB = 300  # 每个页面OCR工作进程的内存估算（渲染后的页面图像 + Tesseract）
+DEFAULT_OCR_MEMORY_BUDGET_MB = 1500  # 默认内存预算，可用环境变量 OCR_MEMORY_BUDGET_MB 修改
+# 预算与OCR进程池都是每个进程各自一份；同时运行多个分析进程时（如 batch_analyze.py 的工作进程），
+# 用 OCR_POOL_WORKERS 限制每个进程的OCR工作进程数，并相应降低 OCR_MEMORY_BUDGET_MB
+
+# PDF页面分类：只有没有文字层的页（扫描件、纯图片页）才需要OCR
+PAGE_MIN_TEXT_CHARS = 50  # 文字层少于该字符数的页视为没有文字层
+SCANNED_IMAGE_COVERAGE = 0.5  # 图片覆盖页面面积的比例达到该值时视为扫描页……
+SCANNED_MAX_TEXT_DENSITY = 0.5  # ……且文字密度（每1000平方点的字符数）低于该值
+
+
+def pixmap_to_array(pix) -> Any:
+    """fitz.Pixmap 的像素缓冲区（pix.samples）转为 H×W×n 的 uint8 数组，不经过PNG编码"""
+    import numpy as np
+
+    rows = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return rows[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+
+def to_pil_image(image: Any) -> Any:
+    """把OCR输入统一转换为PIL图像
+
+    支持：文件路径、PIL图像、numpy数组（H×W 或 H×W×C，RGB/RGBA）、fitz.Pixmap。
+    内存中的图像直接使用，不再写入临时PNG文件。
+    """
+    from PIL import Image
+
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (str, os.PathLike)):
+        return Image.open(image)
+    if hasattr(image, "samples") and hasattr(image, "stride"):  # fitz.Pixmap
+        image = pixmap_to_array(image)
+    if getattr(image, "ndim", 0) == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    return Image.fromarray(image)
+
+
+def prepare_for_tesseract(image: Any) -> Any:
+    """Tesseract的输入：转换为PIL图像，并按需做预处理（见 utils/image_preprocess.py）"""
+    image = to_pil_image(image)
+    if preprocess_enabled():
+        image = preprocess_for_ocr(image)
+    return image
+
+
+def prepare_for_tesseract_with_transform(image: Any,
+                                         preprocess: Optional[bool] = None) -> Tuple[Any, Optional[BoxTransform]]:
+    """prepare_for_tesseract，同时返回预处理的几何变换（用于把词框换算回原图；未预处理时为 None）
+
+    preprocess 为 None 时按 preprocess_enabled() 决定。
+    """
+    image = to_pil_image(image)
+    if preprocess_enabled() if preprocess is None else preprocess:
+        return preprocess_with_transform(image)
+    return image, None
+
+
+def to_rgb_array(image: Any) -> Any:
+    """EasyOCR/PaddleOCR 的输入：文件路径原样传入，内存图像转为 RGB numpy 数组"""
+    import numpy as np
+
+    if isinstance(image, (str, os.PathLike)):
+        return str(image)
+    return np.asarray(to_pil_image(image).convert("RGB"))
+
+
+def classify_pdf_page(page) -> Tuple[str, bool]:
+    """判断PDF页面是否需要OCR，返回 (文字层文本, 是否需要OCR)
+
+    依据文字层的字符数与文字密度，以及图片占页面面积的比例：
+    文字很少，或整页几乎被图片覆盖且文字稀疏（扫描件上的零星页眉页脚）时需要OCR；
+    带有OCR文字层的扫描件文字密度正常，直接使用文字层。
+    """
+    text = page.get_text()
+    chars = len(text.strip())
+    if chars < PAGE_MIN_TEXT_CHARS:
+        return text, True
+
+    page_rect = page.rect
+    page_area = abs(page_rect) or 1.0
+    image_area = sum(abs(page_rect & info["bbox"]) for info in page.get_image_info())
+    image_coverage = min(image_area / page_area, 1.0)
+    text_density = chars / (page_area / 1000)
+    return text, image_coverage >= SCANNED_IMAGE_COVERAGE and text_density < SCANNED_MAX_TEXT_DENSITY
+
+
+# ==================== 常驻OCR工作进程 ====================
+# 每次 pytesseract.image_to_string 都会启动一个 tesseract 进程并重新加载语言数据。
+# 安装了 tesserocr 时维护常驻的工作进程池：每个进程启动时绑定一次 libtesseract，语言模型常驻内存，
+# 之后通过进程间通信接收图像。未安装 tesserocr 时不使用进程池：pytesseract 每次调用本来就会启动
+# 一个 tesseract 进程，再经过进程池只会多一次pickle；改为在本进程的线程中调用（见 OCRManager）。
+# 进程池是每个进程各自一个（Streamlit、任务队列的子进程、批量分析的工作进程），大小见 ocr_worker_count。
+TESSEROCR_AVAILABLE = importlib.util.find_spec("tesserocr") is not None
+
+# 工作进程内的引擎（由 _init_ocr_worker 创建）
+_worker_api = None  # tesserocr.PyTessBaseAPI
+_worker_lang: Optional[str] = None
+
+_ocr_pools: Dict[str, ProcessPoolExecutor] = {}
+_ocr_pools_lock = threading.Lock()
+
+
+def _init_ocr_worker(lang: str):
+    global _worker_api, _worker_lang
+    _worker_lang = lang
+    try:
+        import tesserocr
+        _worker_api = tesserocr.PyTessBaseAPI(lang=lang)
+    except Exception:
+        _worker_api = None  # 未安装 tesserocr 或语言数据缺失，使用 pytesseract
+
+
+def _tesseract_layout(img, lang: str) -> OCRLayout:
+    """识别并返回词级版面（坐标为 img 上的像素）"""
+    if _worker_api is not None and lang == _worker_lang:
+        return _tesserocr_layout(_worker_api, img)
+    import pytesseract
+    data = pytesseract.image_to_data(img, lang=lang, output_type=pytesseract.Output.DICT)
+    return OCRLayout.from_tesseract_data(data, img.width, img.height)
+
+
+def _tesserocr_layout(api, img) -> OCRLayout:
+    """tesserocr 的结果迭代器 -> 词级版面（块/段/行编号按出现顺序从1开始，与 image_to_data 一致）"""
+    import numpy as np
+    from tesserocr import RIL, iterate_level
+
+    api.SetImage(img)
+    api.Recognize()
+    rows, texts = [], []
+    block = par = line = word = 0
+    iterator = api.GetIterator()
+    if iterator is not None:
+        for item in iterate_level(iterator, RIL.WORD):
+            if item.IsAtBeginningOf(RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if item.IsAtBeginningOf(RIL.PARA):
+                par, line = par + 1, 0
+            if item.IsAtBeginningOf(RIL.TEXTLINE):
+                line, word = line + 1, 0
+            word += 1
+            text = (item.GetUTF8Text(RIL.WORD) or '').strip()
+            box = item.BoundingBox(RIL.WORD)
+            if text and box:
+                x0, y0, x1, y1 = box
+                rows.append((block, par, line, word, x0, y0, x1 - x0, y1 - y0, item.Confidence(RIL.WORD)))
+                texts.append(text)
+    return OCRLayout(np.array(rows, dtype=WORD_DTYPE), texts, img.width, img.height)
+
+
+def render_pdf_page(page, zoom: float = PDF_OCR_ZOOM) -> Tuple[Any, bool, Tuple[float, float]]:
+    """渲染PDF页面，返回 (PIL图像, 是否需要预处理, 页面尺寸)
+
+    没有图片的页（文字转曲线等矢量内容）渲染出来是干净的白底黑字，不存在光照、倾斜和边框，不做预处理。
+    """
+    import fitz
+
+    preprocess = preprocess_enabled() and bool(page.get_image_info())
+    image = to_pil_image(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom)))
+    return image, preprocess, (page.rect.width, page.rect.height)
+
+
+def ocr_rendered_page(page_num: int, image: Any, preprocess: bool, page_size: Tuple[float, float], lang: str,
+                      zoom: float = PDF_OCR_ZOOM) -> OCRLayout:
+    """识别 render_pdf_page 渲染出的页面，返回以页面点为坐标的词级版面"""
+    try:
+        img, transform = prepare_for_tesseract_with_transform(image, preprocess)
+        return _tesseract_layout(img, lang).to_source(transform, zoom, page_size)
+    except Exception as e:
+        # 部分pytesseract异常无法在主进程中反序列化（会导致整个进程池损坏），统一转换为RuntimeError
+        raise RuntimeError(f"第{page_num + 1}页OCR失败: {e}") from None
+
+
+def ocr_pdf_page(file_path: str, page_num: int, lang: str, zoom: float = PDF_OCR_ZOOM) -> OCRLayout:
+    """渲染PDF的一页并识别（在OCR工作进程中执行），返回以页面点为坐标的词级版面"""
+    import fitz
+
+    try:
+        with fitz.open(file_path) as doc:
+            rendered = render_pdf_page(doc[page_num], zoom)
+    except Exception as e:
+        raise RuntimeError(f"第{page_num + 1}页渲染失败: {e}") from None
+    return ocr_rendered_page(page_num, *rendered, lang, zoom)
+
+
+def ocr_image(image: Any, lang: str) -> OCRLayout:
+    """预处理并识别一张图像（在OCR工作进程中执行，image 为PIL图像或numpy数组），返回以原图像素为坐标的词级版面"""
+    try:
+        image = to_pil_image(image)
+        img, transform = prepare_for_tesseract_with_transform(image)
+        return _tesseract_layout(img, lang).to_source(transform, source_size=image.size)
+    except Exception as e:
+        raise RuntimeError(f"OCR失败: {e}") from None
+
+
+def get_ocr_pool(lang: str, workers: int) -> ProcessPoolExecutor:
+    """获取（必要时创建）指定语言的常驻OCR进程池"""
+    with _ocr_pools_lock:
+        pool = _ocr_pools.get(lang)
+        if pool is None:
+            # spawn：Streamlit进程中有大量线程，fork可能复制到持有的锁
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_ocr_worker, initargs=(lang,))
+            _ocr_pools[lang] = pool
+            print(f"[DEBUG] 启动常驻OCR进程池（{lang}），工作进程: {workers}")
+        return pool
+
+
+def _discard_ocr_pool(lang: str):
+    """进程池损坏（工作进程崩溃）时丢弃，下次使用时重新创建"""
+    with _ocr_pools_lock:
+        pool = _ocr_pools.pop(lang, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def shutdown_ocr_pools():
+    with _ocr_pools_lock:
+        pools = list(_ocr_pools.values())
+        _ocr_pools.clear()
+    for pool in pools:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
 class OCREngine(Enum):
     """OCR引擎类型"""
     EASYOCR = "easyocr"
@@ -15,6 +260,20 @@ class OCREngine(Enum):
     PADDLEOCR = "paddleocr"
     DISABLED = "disabled"
 
+
+# 在主进程中加载的引擎的内存估算（MB），加载后以实测的RSS增长替换
+ENGINE_MEMORY_MB = {
+    OCREngine.EASYOCR: 1200,
+    OCREngine.PADDLEOCR: 800,
+}
+
+# 按文档类型的引擎优先级（放得进内存预算的第一个可用引擎）：
+# PDF扫描页多为印刷体，Tesseract快且可多进程并行；照片版面复杂、光照多变，深度学习模型更准
+ENGINE_PREFERENCE = {
+    "pdf": [OCREngine.TESSERACT, OCREngine.PADDLEOCR, OCREngine.EASYOCR],
+    "image": [OCREngine.PADDLEOCR, OCREngine.TESSERACT, OCREngine.EASYOCR],
+}
+
 class OCRManager:
     """OCR管理器 - 统一管理多种OCR引擎"""
     
@@ -26,7 +285,17 @@ class OCRManager:
         
         # 内存使用标记
         self.memory_check_enabled = True
-        self.max_memory_mb = 1500  # 默认最大内存限制（MB）
+        self.max_memory_mb = int(os.getenv('OCR_MEMORY_BUDGET_MB', DEFAULT_OCR_MEMORY_BUDGET_MB))  # 最大内存限制（MB）
+        self.max_pool_workers = int(os.getenv('OCR_POOL_WORKERS', 0)) or None  # OCR进程池工作进程数上限（默认不限）
+
+        # 预热池：已加载的引擎 -> 占用内存估计（MB），按最近使用排序（最前面的最久未用）
+        self._warm: "OrderedDict[OCREngine, float]" = OrderedDict()
+        self._in_use: Dict[OCREngine, int] = {}
+        self._lock = threading.RLock()
+        # 同一个 EasyOCR/PaddleOCR 模型实例不保证线程安全，逐次调用
+        self._engine_locks = {engine: threading.Lock() for engine in ENGINE_MEMORY_MB}
+        self.stats: Dict[OCREngine, Dict[str, float]] = {}
+        self._model_names: Dict[OCREngine, str] = {}
         
         # 初始化可用引擎
         self._detect_available_engines()
@@ -118,6 +387,281 @@ class OCRManager:
             return False
         return True
     
+    # ==================== 引擎预热池 ====================
+
+    def _engine_available(self, engine: OCREngine) -> bool:
+        return {
+            OCREngine.TESSERACT: self.tesseract_available,
+            OCREngine.PADDLEOCR: self.paddleocr_available,
+            OCREngine.EASYOCR: self.easyocr_available,
+        }.get(engine, False)
+
+    def _engine_memory_mb(self, engine: OCREngine) -> float:
+        """引擎占用内存估计；Tesseract 按常驻OCR进程池的工作进程数计算"""
+        if engine in self._warm:
+            return self._warm[engine]
+        if engine == OCREngine.TESSERACT:
+            return PAGE_OCR_MEMORY_MB * self.ocr_worker_count(os.cpu_count() or 1)
+        return ENGINE_MEMORY_MB[engine]
+
+    def available_memory_mb(self) -> float:
+        """可供OCR引擎使用的内存：预算减去进程中不属于已加载引擎的部分"""
+        engine_mb = sum(mb for engine, mb in self._warm.items() if engine != OCREngine.TESSERACT)
+        return self.max_memory_mb - max(0.0, self.get_memory_usage() - engine_mb)
+
+    def choose_engine(self, doc_type: str = "image") -> OCREngine:
+        """按文档类型（"pdf" 或 "image"）与可用内存选择引擎
+
+        OCR_ENGINE 指定了引擎时始终使用该引擎；否则按 ENGINE_PREFERENCE 选第一个已加载或放得进内存预算的引擎，
+        都放不下时退回最轻量的可用引擎（由 check_memory 决定是否真正加载）。
+        结果随可用内存变化，不能用作缓存键（见 candidate_engines）。
+        """
+        if self.current_engine == OCREngine.DISABLED or os.getenv('OCR_ENGINE'):
+            return self.current_engine
+        with self._lock:
+            candidates = self.candidate_engines(doc_type)
+            available_mb = self.available_memory_mb()
+            for engine in candidates:
+                if engine in self._warm or self._engine_memory_mb(engine) <= available_mb:
+                    return engine
+            if OCREngine.TESSERACT in candidates:
+                return OCREngine.TESSERACT
+            return candidates[0] if candidates else OCREngine.DISABLED
+
+    def candidate_engines(self, doc_type: str = "image") -> List[OCREngine]:
+        """choose_engine 可能选用的引擎，与可用内存无关
+
+        OCR_ENGINE 指定了引擎或OCR已禁用时只有当前引擎，否则为按 ENGINE_PREFERENCE 排列的全部可用引擎。
+        """
+        if self.current_engine == OCREngine.DISABLED or os.getenv('OCR_ENGINE'):
+            return [self.current_engine]
+        return [engine for engine in ENGINE_PREFERENCE.get(doc_type, ENGINE_PREFERENCE["image"])
+                if self._engine_available(engine)]
+
+    def engine_for_model(self, model: str, doc_type: str = "image") -> Optional[OCREngine]:
+        """engine_model_name 的逆：该名称对应的当前可用引擎，没有（已卸载或升级了版本）时返回 None"""
+        for engine in self.candidate_engines(doc_type):
+            if self.engine_model_name(engine) == model:
+                return engine
+        return None
+
+    def _load_engine(self, engine: OCREngine) -> bool:
+        if engine == OCREngine.TESSERACT:
+            return self.tesseract_available  # 工作进程在首次提交任务时启动，见 ocr_pool
+        if engine == OCREngine.PADDLEOCR:
+            return self.load_paddleocr()
+        if engine == OCREngine.EASYOCR:
+            return self.load_easyocr()
+        return False
+
+    def _unload_engine(self, engine: OCREngine):
+        if engine == OCREngine.TESSERACT:
+            shutdown_ocr_pools()
+        elif engine == OCREngine.EASYOCR:
+            self.easyocr_reader = None
+        elif engine == OCREngine.PADDLEOCR:
+            self.paddleocr_reader = None
+        self._warm.pop(engine, None)
+        self._engine_stats(engine)["evictions"] += 1
+        gc.collect()
+        print(f"[DEBUG] OCR引擎 {engine.value} 已卸载")
+
+    def acquire_engine(self, engine: OCREngine) -> bool:
+        """确保引擎已加载；加载新引擎前按LRU卸载空闲引擎，直到预热池放得进内存预算"""
+        with self._lock:
+            if engine in self._warm:
+                self._warm.move_to_end(engine)
+                return True
+            if not self._engine_available(engine):
+                return False
+
+            needed_mb = self._engine_memory_mb(engine)
+            for idle in [e for e in self._warm if not self._in_use.get(e)]:
+                if sum(self._warm.values()) + needed_mb <= self.max_memory_mb:
+                    break
+                print(f"[DEBUG] OCR内存预算不足（{self.max_memory_mb}MB），卸载最久未用的引擎 {idle.value}")
+                self._unload_engine(idle)
+
+            before_mb = self.get_memory_usage()
+            started = time.perf_counter()
+            if not self._load_engine(engine):
+                return False
+            loaded_mb = self.get_memory_usage() - before_mb
+            if engine != OCREngine.TESSERACT and loaded_mb > 0:
+                needed_mb = loaded_mb  # 用实测的RSS增长替换估算值
+            self._warm[engine] = needed_mb
+            stats = self._engine_stats(engine)
+            stats["loads"] += 1
+            stats["load_seconds"] += time.perf_counter() - started
+            return True
+
+    @contextmanager
+    def _engine_session(self, engine: OCREngine):
+        """使用期间引擎不会被卸载"""
+        with self._lock:
+            self._in_use[engine] = self._in_use.get(engine, 0) + 1
+        try:
+            yield self.acquire_engine(engine)
+        finally:
+            with self._lock:
+                self._in_use[engine] -= 1
+
+    def _engine_stats(self, engine: OCREngine) -> Dict[str, float]:
+        return self.stats.setdefault(engine, {
+            "calls": 0, "items": 0, "chars": 0, "seconds": 0.0,
+            "loads": 0, "load_seconds": 0.0, "evictions": 0,
+        })
+
+    def _record(self, engine: OCREngine, items: int, chars: int, seconds: float):
+        with self._lock:
+            stats = self._engine_stats(engine)
+            stats["calls"] += 1
+            stats["items"] += items
+            stats["chars"] += chars
+            stats["seconds"] += seconds
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """各引擎的使用统计与吞吐（items 为识别的图片/页面数）"""
+        with self._lock:
+            result = {}
+            for engine, stats in self.stats.items():
+                seconds = stats["seconds"]
+                result[engine.value] = dict(
+                    stats,
+                    loaded=engine in self._warm,
+                    memory_mb=round(self._warm.get(engine, 0.0), 1),
+                    items_per_second=round(stats["items"] / seconds, 3) if seconds else None,
+                    chars_per_second=round(stats["chars"] / seconds, 1) if seconds else None,
+                )
+            return result
+
+    def engine_model_name(self, engine: OCREngine) -> str:
+        """引擎及版本（用作OCR结果缓存的 model，升级引擎后旧结果失效）"""
+        if engine not in self._model_names:
+            version = None
+            try:
+                if engine == OCREngine.TESSERACT:
+                    import pytesseract
+                    version = pytesseract.get_tesseract_version()
+                elif engine == OCREngine.PADDLEOCR:
+                    import paddleocr
+                    version = paddleocr.__version__
+                elif engine == OCREngine.EASYOCR:
+                    import easyocr
+                    version = easyocr.__version__
+            except Exception:
+                pass
+            self._model_names[engine] = f"{engine.value}-{version}" if version else engine.value
+        return self._model_names[engine]
+
+    def ocr_worker_count(self, task_count: int) -> int:
+        """按内存预算决定并行OCR的工作进程数
+
+        内存检查未通过时串行执行；否则剩余预算（max_memory_mb - 当前进程占用）
+        按每个工作进程 PAGE_OCR_MEMORY_MB 分配，且不超过CPU核数、任务数与 OCR_POOL_WORKERS。
+        """
+        if task_count <= 1 or not self.check_memory():
+            return 1
+        headroom_mb = self.max_memory_mb - self.get_memory_usage()
+        budget_workers = int(headroom_mb // PAGE_OCR_MEMORY_MB)
+        return max(1, min(task_count, os.cpu_count() or 1, budget_workers, self.max_pool_workers or task_count))
+
+    def ocr_pool(self, lang: str) -> ProcessPoolExecutor:
+        """常驻OCR进程池，大小在首次创建时按内存预算确定（见 ocr_worker_count）"""
+        return get_ocr_pool(lang, self.ocr_worker_count(os.cpu_count() or 1))
+
+    def ocr_image(self, image: Any, lang: str) -> OCRLayout:
+        """用Tesseract识别一张图像（文件路径、PIL图像、numpy数组或 fitz.Pixmap），返回词级版面
+
+        安装了 tesserocr 时在常驻OCR进程中识别；否则直接在本线程中调用 pytesseract。
+        """
+        image = to_pil_image(image)
+        if not TESSEROCR_AVAILABLE:
+            return ocr_image(image, lang)
+        try:
+            return self.ocr_pool(lang).submit(ocr_image, image, lang).result()
+        except BrokenProcessPool:
+            _discard_ocr_pool(lang)
+            raise
+
+    def ocr_pdf_pages(self, file_path: str, page_numbers: List[int], lang: str,
+                      engine: Optional[OCREngine] = None) -> Iterator[Tuple[int, OCRLayout]]:
+        """识别多个PDF页面，按 page_numbers 的顺序逐页产出 (page_num, 词级版面)，坐标为页面的点
+
+        engine 默认按 choose_engine("pdf") 选择。Tesseract 并行识别，同时最多提交 2×并行数 个页面，页数再多内存占用也不变：
+        安装了 tesserocr 时在常驻OCR进程池中，每个工作进程自己打开PDF并渲染页面，主进程不持有页面图像；
+        否则本进程逐页渲染（PyMuPDF不支持多线程），pytesseract 调用在线程池中并行。
+        其他引擎在本进程中逐页渲染、识别。
+        """
+        engine = engine or self.choose_engine("pdf")
+        if engine != OCREngine.TESSERACT:
+            yield from self._ocr_pdf_pages_inline(file_path, page_numbers, engine)
+            return
+
+        with self._engine_session(engine) as loaded:
+            if not loaded:
+                raise RuntimeError("Tesseract OCR不可用")
+            if TESSEROCR_AVAILABLE:
+                yield from self._ocr_pdf_pages_pool(file_path, page_numbers, lang)
+            else:
+                yield from self._ocr_pdf_pages_threads(file_path, page_numbers, lang)
+
+    def _ocr_pdf_pages_inline(self, file_path: str, page_numbers: List[int],
+                              engine: OCREngine) -> Iterator[Tuple[int, OCRLayout]]:
+        import fitz
+
+        with fitz.open(file_path) as doc:
+            for page_num in page_numbers:
+                page = doc[page_num]
+                pix = page.get_pixmap(matrix=fitz.Matrix(PDF_OCR_ZOOM, PDF_OCR_ZOOM))
+                layout = self.recognize(pix, engine=engine) or OCRLayout.empty(pix.width, pix.height)
+                yield page_num, layout.to_source(zoom=PDF_OCR_ZOOM, source_size=(page.rect.width, page.rect.height))
+
+    def _ocr_pdf_pages_pool(self, file_path: str, page_numbers: List[int],
+                            lang: str) -> Iterator[Tuple[int, OCRLayout]]:
+        workers = self.ocr_worker_count(len(page_numbers))
+        print(f"[DEBUG] OCR {len(page_numbers)} 页，并行数: {workers}（常驻OCR进程池）")
+        pool = self.ocr_pool(lang)
+        try:
+            yield from self._ocr_pages_pipelined(
+                page_numbers, workers, lambda page_num: pool.submit(ocr_pdf_page, file_path, page_num, lang))
+        except BrokenProcessPool:
+            _discard_ocr_pool(lang)
+            raise
+
+    def _ocr_pdf_pages_threads(self, file_path: str, page_numbers: List[int],
+                               lang: str) -> Iterator[Tuple[int, OCRLayout]]:
+        import fitz
+
+        workers = self.ocr_worker_count(len(page_numbers))
+        print(f"[DEBUG] OCR {len(page_numbers)} 页，并行数: {workers}（pytesseract线程）")
+        with fitz.open(file_path) as doc, ThreadPoolExecutor(max_workers=workers) as executor:
+            yield from self._ocr_pages_pipelined(
+                page_numbers, workers,
+                lambda page_num: executor.submit(ocr_rendered_page, page_num, *render_pdf_page(doc[page_num]), lang))
+
+    def _ocr_pages_pipelined(self, page_numbers: List[int], workers: int,
+                             submit) -> Iterator[Tuple[int, OCRLayout]]:
+        """按页序产出识别结果，同时最多有 2×workers 个页面在识别中（submit(page_num) 返回 Future）"""
+        remaining = iter(page_numbers)
+        pending = deque((page_num, submit(page_num)) for page_num in islice(remaining, workers * 2))
+        try:
+            while pending:
+                page_num, future = pending[0]
+                started = time.perf_counter()
+                layout = future.result()
+                # 按调用方等待时间计：并行时即为实际吞吐
+                self._record(OCREngine.TESSERACT, 1, sum(map(len, layout.texts)), time.perf_counter() - started)
+                pending.popleft()
+                next_page = next(remaining, None)
+                if next_page is not None:
+                    pending.append((next_page, submit(next_page)))
+                yield page_num, layout
+        finally:
+            # 调用方提前停止或出错时取消尚未开始的页面（进程池本身保留）
+            for _, future in pending:
+                future.cancel()
+
     def load_easyocr(self, languages: List[str] = None) -> bool:
         """加载EasyOCR模型"""
         if self.easyocr_reader is not None:
@@ -186,64 +730,59 @@ class OCRManager:
             return False
     
     def unload_models(self):
-        """卸载所有OCR模型，释放内存"""
-        if self.easyocr_reader is not None:
-            del self.easyocr_reader
-            self.easyocr_reader = None
-            print("[DEBUG] EasyOCR模型已卸载")
-        
-        if self.paddleocr_reader is not None:
-            del self.paddleocr_reader
-            self.paddleocr_reader = None
-            print("[DEBUG] PaddleOCR模型已卸载")
+        """卸载所有空闲的OCR引擎，释放内存"""
+        with self._lock:
+            for engine in [e for e in self._warm if not self._in_use.get(e)]:
+                self._unload_engine(engine)
         
         # 强制垃圾回收
         gc.collect()
         print("[DEBUG] 内存已释放")
     
-    def readtext_easyocr(self, image_path: str) -> List[Tuple]:
-        """使用EasyOCR识别文字"""
-        if not self.load_easyocr():
+    def readtext_easyocr(self, image: Any) -> List[Tuple]:
+        """使用EasyOCR识别文字（image 可为文件路径、PIL图像、numpy数组或 fitz.Pixmap）"""
+        if not self.acquire_engine(OCREngine.EASYOCR):
             return []
         
         try:
-            results = self.easyocr_reader.readtext(image_path)
+            with self._engine_locks[OCREngine.EASYOCR]:
+                results = self.easyocr_reader.readtext(to_rgb_array(image))
             return results
         except Exception as e:
             print(f"[DEBUG] EasyOCR识别失败: {str(e)}")
             return []
     
-    def readtext_tesseract(self, image_path: str) -> List[Tuple]:
-        """使用Tesseract识别文字"""
-        if not self.tesseract_available:
+    def readtext_tesseract(self, image: Any) -> List[Tuple]:
+        """使用Tesseract识别文字（image 可为文件路径、PIL图像、numpy数组或 fitz.Pixmap）"""
+        if not self.acquire_engine(OCREngine.TESSERACT):
             return []
         
         try:
-            import pytesseract
-            from PIL import Image
+            # 在常驻OCR进程中预处理并识别（引擎与语言模型已加载）
+            layout = self.ocr_image(image, self.tesseract_lang())
             
-            # 读取图片
-            img = Image.open(image_path)
-            
-            # 识别文字
-            text = pytesseract.image_to_string(img, lang='chi_sim+eng' if os.getenv('ENABLE_CHINESE_OCR', '').lower() in ('1', 'true', 'yes') else 'eng')
-            
-            # 转换为EasyOCR格式的返回结果
-            # Tesseract只返回文字，没有坐标信息
-            if text.strip():
-                return [(None, text.strip(), None)]  # (bbox, text, confidence)
-            return []
+            # 转换为EasyOCR格式的返回结果：每行一项 (四边形, 文字, 置信度0~1)
+            results = []
+            for line in layout.lines():
+                x0, y0, width, height = line["box"]
+                bbox = [[x0, y0], [x0 + width, y0], [x0 + width, y0 + height], [x0, y0 + height]]
+                results.append((bbox, line["text"], line["conf"] / 100 if line["conf"] >= 0 else 1.0))
+            return results
         except Exception as e:
             print(f"[DEBUG] Tesseract识别失败: {str(e)}")
             return []
     
-    def readtext_paddleocr(self, image_path: str) -> List[Tuple]:
-        """使用PaddleOCR识别文字"""
-        if not self.load_paddleocr():
+    def readtext_paddleocr(self, image: Any) -> List[Tuple]:
+        """使用PaddleOCR识别文字（image 可为文件路径、PIL图像、numpy数组或 fitz.Pixmap）"""
+        if not self.acquire_engine(OCREngine.PADDLEOCR):
             return []
         
         try:
-            results = self.paddleocr_reader.ocr(image_path, cls=True)
+            image = to_rgb_array(image)
+            if not isinstance(image, str):
+                image = image[:, :, ::-1]  # PaddleOCR 的数组输入按OpenCV的BGR顺序解释
+            with self._engine_locks[OCREngine.PADDLEOCR]:
+                results = self.paddleocr_reader.ocr(image, cls=True)
             
             # 转换为EasyOCR格式
             formatted_results = []
@@ -258,21 +797,59 @@ class OCRManager:
             print(f"[DEBUG] PaddleOCR识别失败: {str(e)}")
             return []
     
-    def readtext(self, image_path: str) -> List[Tuple]:
-        """统一的OCR识别接口，自动选择引擎"""
-        if self.current_engine == OCREngine.DISABLED:
+    def tesseract_lang(self) -> str:
+        """Tesseract识别语言（ENABLE_CHINESE_OCR 开启时加入简体中文）"""
+        return 'chi_sim+eng' if os.getenv('ENABLE_CHINESE_OCR', '').lower() in ('1', 'true', 'yes') else 'eng'
+
+    def recognize(self, image: Any, doc_type: str = "image", engine: Optional[OCREngine] = None,
+                  lang: Optional[str] = None) -> Optional[OCRLayout]:
+        """识别并返回词级版面（坐标为原图像素），OCR不可用或失败时返回 None
+
+        Tesseract 给出词级的框、置信度与块/段/行编号；EasyOCR/PaddleOCR 只有行级结果，每行作为一个词。
+        """
+        engine = engine or self.choose_engine(doc_type)
+        if engine == OCREngine.TESSERACT:
+            with self._engine_session(engine) as loaded:
+                if not loaded:
+                    return None
+                started = time.perf_counter()
+                try:
+                    layout = self.ocr_image(image, lang or self.tesseract_lang())
+                except Exception as e:
+                    print(f"[DEBUG] Tesseract识别失败: {str(e)}")
+                    return None
+                self._record(engine, 1, sum(map(len, layout.texts)), time.perf_counter() - started)
+                return layout
+        if engine in (OCREngine.PADDLEOCR, OCREngine.EASYOCR):
+            image = to_pil_image(image)
+            return OCRLayout.from_boxes(self.readtext(image, engine=engine), image.width, image.height)
+        print("[DEBUG] 没有可用的OCR引擎")
+        return None
+
+    def readtext(self, image: Any, doc_type: str = "image", engine: Optional[OCREngine] = None) -> List[Tuple]:
+        """统一的OCR识别接口，按文档类型与可用内存自动选择引擎（见 choose_engine）
+
+        image 可为文件路径、PIL图像、numpy数组（RGB）或 fitz.Pixmap，内存图像不落盘。
+        返回 [(bbox, text, confidence)]。
+        """
+        engine = engine or self.choose_engine(doc_type)
+        if engine == OCREngine.DISABLED:
             print("[DEBUG] OCR已禁用")
             return []
-        
-        if self.current_engine == OCREngine.TESSERACT:
-            return self.readtext_tesseract(image_path)
-        elif self.current_engine == OCREngine.PADDLEOCR:
-            return self.readtext_paddleocr(image_path)
-        elif self.current_engine == OCREngine.EASYOCR:
-            return self.readtext_easyocr(image_path)
-        else:
+
+        readers = {
+            OCREngine.TESSERACT: self.readtext_tesseract,
+            OCREngine.PADDLEOCR: self.readtext_paddleocr,
+            OCREngine.EASYOCR: self.readtext_easyocr,
+        }
+        if engine not in readers:
             print("[DEBUG] 没有可用的OCR引擎")
             return []
+        with self._engine_session(engine):
+            started = time.perf_counter()
+            results = readers[engine](image)
+            self._record(engine, 1, sum(len(result[1]) for result in results), time.perf_counter() - started)
+        return results
     
     def is_available(self) -> bool:
         """检查OCR是否可用"""
@@ -283,3 +860,16 @@ class OCRManager:
         if self.current_engine:
             return self.current_engine.value
         return "none"
+
+
+_shared_manager: Optional[OCRManager] = None
+_shared_manager_lock = threading.Lock()
+
+
+def get_ocr_manager() -> OCRManager:
+    """进程内共用的OCR管理器（界面、存储管理器与上传组件共享同一个引擎预热池）"""
+    global _shared_manager
+    with _shared_manager_lock:
+        if _shared_manager is None:
+            _shared_manager = OCRManager()
+        return _shared_manager
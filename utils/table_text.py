@@ -0,0 +1,173 @@
+"""大表格的定长文本表示 - 分块读取，内存与耗时不随行数增长
+
+原先Excel/CSV整表 df.to_string() 后再截断到1000或8000字符：50万行的CSV会先生成数百MB带空格填充的文本。
+TableTextRenderer 逐块接收 DataFrame（pd.read_csv(chunksize=...) 等），只保留固定大小的状态：
+- 结构：列名与类型
+- 列概况：非空数、空值数；数值列的最小/最大/均值；文本列的若干示例值
+- 前 HEAD_ROWS 行、后 TAIL_ROWS 行
+- 按位置分层的样本：每 stride 行取一行，样本超过 2×SAMPLE_ROWS 时隔一取一、stride 翻倍，
+  结果在全表范围内均匀分布（每层一行），且对同一文件是确定的（便于缓存）
+
+render() 输出不超过 budget 个字符，各部分按顺序写入，超出预算的部分省略。
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+TEXT_BUDGET_CHARS = 8000
+HEAD_ROWS = 5
+TAIL_ROWS = 5
+SAMPLE_ROWS = 20
+MAX_CELL_CHARS = 40  # 单元格文本超过该长度时截断
+MAX_COLUMNS = 30  # 行数据最多显示的列数
+EXAMPLE_VALUES = 3  # 文本列保留的示例值个数
+CSV_CHUNK_ROWS = 50_000
+
+
+class _ColumnProfile:
+    """一列的增量统计（固定大小）"""
+
+    def __init__(self, dtype: str):
+        self.dtype = dtype
+        self.count = 0
+        self.nulls = 0
+        self.numeric_count = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.examples: List[str] = []
+
+    def update(self, values: pd.Series):
+        if self.dtype != str(values.dtype):
+            self.dtype = "mixed" if self.count else str(values.dtype)
+        nulls = int(values.isna().sum())
+        self.nulls += nulls
+        self.count += len(values) - nulls
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            numbers = values.to_numpy(dtype=np.float64, na_value=np.nan)
+            numbers = numbers[np.isfinite(numbers)]
+            if numbers.size:
+                self.numeric_count += numbers.size
+                self.total += float(numbers.sum())
+                low, high = float(numbers.min()), float(numbers.max())
+                self.minimum = low if self.minimum is None else min(self.minimum, low)
+                self.maximum = high if self.maximum is None else max(self.maximum, high)
+        elif len(self.examples) < EXAMPLE_VALUES:
+            for value in values.dropna().astype(str).unique()[:EXAMPLE_VALUES]:
+                if value not in self.examples and len(self.examples) < EXAMPLE_VALUES:
+                    self.examples.append(_clip(value))
+
+    def describe(self) -> str:
+        parts = [self.dtype, f"non-null {self.count}"]
+        if self.nulls:
+            parts.append(f"null {self.nulls}")
+        if self.numeric_count:
+            parts.append(f"min {self.minimum:g}, max {self.maximum:g}, mean {self.total / self.numeric_count:g}")
+        elif self.examples:
+            parts.append("e.g. " + ", ".join(self.examples))
+        return "; ".join(parts)
+
+
+def _clip(value: Any) -> str:
+    text = f"{value:.6g}" if isinstance(value, (float, np.floating)) else str(value).replace('\n', ' ')
+    return text if len(text) <= MAX_CELL_CHARS else text[:MAX_CELL_CHARS - 1] + "…"
+
+
+class TableTextRenderer:
+    """逐块汇总表格，输出定长文本"""
+
+    def __init__(self, head_rows: int = HEAD_ROWS, tail_rows: int = TAIL_ROWS, sample_rows: int = SAMPLE_ROWS):
+        self.head_rows, self.tail_rows, self.sample_rows = head_rows, tail_rows, sample_rows
+        self.columns: List[str] = []
+        self.profiles: Dict[str, _ColumnProfile] = {}
+        self.row_count = 0
+        self._head: List[pd.DataFrame] = []
+        self._head_count = 0
+        self._tail: deque = deque()
+        self._tail_count = 0
+        self._sample: List[pd.DataFrame] = []
+        self._stride = 1
+
+    def update(self, chunk: pd.DataFrame):
+        """加入一块数据（各块的列应相同）"""
+        if not self.columns:
+            self.columns = [str(column) for column in chunk.columns]
+            self.profiles = {name: _ColumnProfile(str(dtype)) for name, dtype in zip(self.columns, chunk.dtypes)}
+        if chunk.empty:
+            return
+        chunk = chunk.copy(deep=False)
+        chunk.columns = self.columns[:len(chunk.columns)]
+        chunk.index = pd.RangeIndex(self.row_count, self.row_count + len(chunk))
+
+        for name in chunk.columns:
+            self.profiles[name].update(chunk[name])
+
+        if self._head_count < self.head_rows:
+            self._head.append(chunk.iloc[:self.head_rows - self._head_count])
+            self._head_count += len(self._head[-1])
+
+        self._tail.append(chunk.iloc[-self.tail_rows:])
+        self._tail_count += len(self._tail[-1])
+        while self._tail_count - len(self._tail[0]) >= self.tail_rows:
+            self._tail_count -= len(self._tail.popleft())
+
+        # 分层样本：全局行号为 stride 整数倍的行
+        offset = (-self.row_count) % self._stride
+        self._sample.append(chunk.iloc[offset::self._stride])
+        self.row_count += len(chunk)
+        while sum(len(part) for part in self._sample) > 2 * self.sample_rows:
+            self._stride *= 2
+            self._sample = [part[part.index % self._stride == 0] for part in self._sample]
+
+    def _rows_text(self, frames: List[pd.DataFrame]) -> str:
+        if not frames:
+            return ""
+        rows = pd.concat(frames)
+        rows = rows[~rows.index.duplicated()].iloc[:, :MAX_COLUMNS]
+        return rows.apply(lambda column: column.map(_clip)).to_string()
+
+    def sample(self) -> pd.DataFrame:
+        """分层样本（约 sample_rows 行，按行号排序）"""
+        if not self._sample:
+            return pd.DataFrame(columns=self.columns)
+        rows = pd.concat(self._sample)
+        if len(rows) <= self.sample_rows:
+            return rows
+        # 在保留的行中等间距取 sample_rows 行，首尾都包含（按步长切片再截断会漏掉表格末尾）
+        positions = np.unique(np.linspace(0, len(rows) - 1, self.sample_rows).round().astype(int))
+        return rows.iloc[positions]
+
+    def render(self, budget: int = TEXT_BUDGET_CHARS) -> str:
+        """定长文本表示（不超过 budget 个字符）"""
+        if not self.columns:
+            return ""
+        sections = [f"Rows: {self.row_count}, Columns: {len(self.columns)}",
+                    "Columns:\n" + "\n".join(f"- {_clip(name)}: {self.profiles[name].describe()}"
+                                             for name in self.columns)]
+        if self.row_count:
+            sections.append(f"First {self._head_count} rows:\n{self._rows_text(self._head)}")
+            if self.row_count > self._head_count:
+                # 行数较少时不重复前几行
+                tail = [part[part.index >= self._head_count] for part in self._tail]
+                tail_count = sum(len(part) for part in tail)
+                sections.append(f"Last {tail_count} rows:\n{self._rows_text(tail)}")
+            if self.row_count > self.head_rows + self.tail_rows:
+                sample = self.sample()
+                sections.append(f"Sample of {len(sample)} rows (evenly spaced):\n{self._rows_text([sample])}")
+
+        text = ""
+        for section in sections:
+            if text and len(text) + 2 + len(section) > budget:
+                break
+            text = f"{text}\n\n{section}" if text else section
+        return text[:budget]
+
+
+def render_table_text(chunks: Iterable[pd.DataFrame], budget: int = TEXT_BUDGET_CHARS) -> str:
+    """逐块汇总后输出定长文本"""
+    renderer = TableTextRenderer()
+    for chunk in chunks:
+        renderer.update(chunk)
+    return renderer.render(budget)
@@ -0,0 +1,357 @@
+"""Excel工作簿按需读取 - 只读元数据列出工作表，单元格按工作表/区域流式读取
+
+原先 extract_excel_csv 与预览页 pd.read_excel(file_path) 只读取第一个工作表，
+而且要先把整个工作簿解析为对象模型；包含多个工作表的农场台账打开很慢，其余工作表也看不到。
+Workbook 不加载单元格即可列出全部工作表及其行列数，需要时再读取指定的工作表或单元格区域：
+- sheets()       名称与行列数（xlsx 来自各工作表XML开头的 <dimension> 元素，遇到单元格数据即停止读取）
+- iter_frames()  第一行为表头，每次产出 chunk_rows 行的DataFrame，内存只占一块
+- read_range()   读取 "A1:D20" 这样的区域，读到区域末行即停止
+
+读取引擎按速度选择已安装的：python-calamine（Rust实现，xlsx/xls 均可） >
+openpyxl 只读流式模式（xlsx） / xlrd 按需加载工作表（xls）。
+"""
+import posixpath
+import re
+import zipfile
+from itertools import islice
+from xml.etree import ElementTree
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+    CALAMINE_AVAILABLE = True
+except ImportError:
+    CalamineWorkbook = None
+    CALAMINE_AVAILABLE = False
+
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    openpyxl = None
+    OPENPYXL_AVAILABLE = False
+
+try:
+    import xlrd
+    XLRD_AVAILABLE = True
+except ImportError:
+    xlrd = None
+    XLRD_AVAILABLE = False
+
+CHUNK_ROWS = 50_000
+WORKBOOK_SUFFIXES = ('.xlsx', '.xlsm', '.xls')
+
+SheetRef = Union[int, str]
+
+_RANGE_PATTERN = re.compile(r'^\$?([A-Z]+)\$?(\d+)?(?::\$?([A-Z]+)\$?(\d+)?)?$')
+
+
+def select_engine(file_path: str) -> str:
+    """按文件类型选择已安装的最快引擎："calamine"、"openpyxl" 或 "xlrd" """
+    name = str(file_path).lower()
+    if not name.endswith(WORKBOOK_SUFFIXES):
+        raise ValueError(f"不支持的工作簿类型: {file_path}")
+    if CALAMINE_AVAILABLE:
+        return "calamine"
+    if name.endswith('.xls'):
+        if XLRD_AVAILABLE:
+            return "xlrd"
+        raise ImportError("读取 .xls 需要安装 python-calamine 或 xlrd")
+    if OPENPYXL_AVAILABLE:
+        return "openpyxl"
+    raise ImportError("读取 .xlsx 需要安装 python-calamine 或 openpyxl")
+
+
+def column_letter(index: int) -> str:
+    """1 -> A, 27 -> AA"""
+    letters = ""
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _column_index(letters: str) -> int:
+    index = 0
+    for char in letters:
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index
+
+
+def parse_range(cell_range: str) -> Tuple[int, int, Optional[int], Optional[int]]:
+    """"B2:D20" -> (min_row, min_col, max_row, max_col)，均从1开始；"A:C" 这样省略行号表示到最后一行"""
+    match = _RANGE_PATTERN.match(cell_range.strip().upper())
+    if not match:
+        raise ValueError(f"无法识别的单元格区域: {cell_range}")
+    first_col, first_row, last_col, last_row = match.groups()
+    min_col, min_row = _column_index(first_col), int(first_row or 1)
+    if last_col is None:  # 单个单元格，或只写了列
+        return min_row, min_col, (min_row if first_row else None), min_col
+    max_col, max_row = _column_index(last_col), (int(last_row) if last_row else None)
+    if max_col < min_col or (max_row is not None and max_row < min_row):
+        raise ValueError(f"单元格区域的起点在终点之后: {cell_range}")
+    return min_row, min_col, max_row, max_col
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit('}', 1)[-1]
+
+
+def _read_dimension(archive: zipfile.ZipFile, path: str) -> Optional[str]:
+    """工作表XML中 <dimension ref="A1:E200"> 的值；它位于 <sheetData> 之前，读到 <sheetData> 仍没有即返回 None"""
+    with archive.open(path) as source:
+        for _event, element in ElementTree.iterparse(source, events=("start",)):
+            tag = _local(element.tag)
+            if tag == "dimension":
+                return element.get("ref")
+            if tag == "sheetData":
+                return None
+    return None
+
+
+def xlsx_dimensions(file_path: str) -> Dict[str, Optional[str]]:
+    """xlsx 各工作表（按工作簿中的顺序，不含图表工作表）记录的已用区域 {名称: "A1:E200"}，不读取任何单元格
+
+    openpyxl 只读模式打开工作簿时会读取每个工作表的尺寸，文件没有 <dimension> 时（流式写入工具生成的文件常见）
+    要扫描整个工作表；这里遇到单元格数据即停止，列出工作表不必打开工作簿。
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        workbook = ElementTree.fromstring(archive.read("xl/workbook.xml"))
+        relations = ElementTree.fromstring(archive.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target", "") for rel in relations
+                   if rel.get("Type", "").endswith("/worksheet")}
+        dimensions = {}
+        for element in workbook.iter():
+            if _local(element.tag) != "sheet":
+                continue
+            rel_id = next((value for key, value in element.attrib.items() if _local(key) == "id"), None)
+            if rel_id not in targets:
+                continue
+            target = targets[rel_id]
+            path = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+            try:
+                dimensions[element.get("name")] = _read_dimension(archive, path)
+            except (KeyError, ElementTree.ParseError):
+                dimensions[element.get("name")] = None
+        return dimensions
+
+
+def _column_names(header: Sequence[Any], width: int) -> List[str]:
+    """表头行转为列名：空单元格为 "Unnamed: i"，重复的列名加 ".1"、".2"（与 pd.read_excel 一致）"""
+    names, seen = [], {}
+    for i in range(width):
+        value = header[i] if i < len(header) else None
+        name = f"Unnamed: {i}" if value is None or value == "" else (value if isinstance(value, str) else str(value))
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def _last_filled(row: Sequence[Any]) -> int:
+    for i in range(len(row) - 1, -1, -1):
+        if row[i] is not None:
+            return i + 1
+    return 0
+
+
+def _frame(rows: List[Sequence[Any]], columns: List[str]) -> pd.DataFrame:
+    width = len(columns)
+    padded = [tuple(row[:width]) + (None,) * (width - len(row)) if len(row) != width else row for row in rows]
+    return pd.DataFrame.from_records(padded, columns=columns, coerce_float=True)
+
+
+class Workbook:
+    """只读工作簿：元数据立即可用，单元格按需流式读取；用完调用 close() 或用 with"""
+
+    def __init__(self, file_path: str, engine: Optional[str] = None):
+        self.file_path = str(file_path)
+        self.engine = engine or select_engine(self.file_path)
+        self._book = None
+        self._dimensions: Optional[Dict[str, Optional[str]]] = None
+        self._sheets: Optional[List[Dict[str, Any]]] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._book is not None:
+            if self.engine == "xlrd":
+                self._book.release_resources()
+            elif hasattr(self._book, "close"):
+                self._book.close()
+        self._book = None
+
+    def _open(self):
+        if self._book is None:
+            if self.engine == "calamine":
+                self._book = CalamineWorkbook.from_path(self.file_path)
+            elif self.engine == "openpyxl":
+                # data_only：公式单元格读取保存时的计算结果（与 pd.read_excel 一致）
+                self._book = openpyxl.load_workbook(self.file_path, read_only=True, data_only=True)
+            elif self.engine == "xlrd":
+                self._book = xlrd.open_workbook(self.file_path, on_demand=True)
+            else:
+                raise ValueError(f"未知的工作簿引擎: {self.engine}")
+        return self._book
+
+    def _xlsx_dimensions(self) -> Dict[str, Optional[str]]:
+        if self._dimensions is None:
+            self._dimensions = {}
+            if not self.file_path.lower().endswith('.xls'):
+                try:
+                    self._dimensions = xlsx_dimensions(self.file_path)
+                except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+                    print(f"[DEBUG] Workbook: 读取工作簿元数据失败 - {str(e)}")
+        return self._dimensions
+
+    def sheet_names(self) -> List[str]:
+        """工作表名称；xlsx 直接读取工作簿元数据（各引擎序号一致，且不打开工作簿）"""
+        dimensions = self._xlsx_dimensions()
+        if dimensions:
+            return list(dimensions)
+        book = self._open()
+        if self.engine == "calamine":
+            return list(book.sheet_names)
+        if self.engine == "openpyxl":
+            return [ws.title for ws in book.worksheets]  # 不含图表工作表
+        return book.sheet_names()
+
+    def sheets(self) -> List[Dict[str, Any]]:
+        """全部工作表：[{"index", "name", "rows", "columns", "dimension"}]
+
+        行列数取自文件中记录的已用区域（<dimension>），不加载单元格；文件没有记录（xls、部分导出工具生成的xlsx）时为 None。
+        rows 包含表头行；已用区域不从A1开始时，是区域本身的行列数而不是最大行号/列号。
+        """
+        if self._sheets is not None:
+            return self._sheets
+        dimensions = self._xlsx_dimensions()
+        sheets = []
+        for index, name in enumerate(self.sheet_names()):
+            rows = columns = None
+            dimension = dimensions.get(name)
+            if dimension:
+                try:
+                    min_row, min_col, max_row, max_col = parse_range(dimension)
+                except ValueError:
+                    dimension = None
+                else:
+                    # 已用区域不一定从A1开始（如 "C3:D4" 是2行2列），行列数按区域的起止计算
+                    if max_row is not None:
+                        rows = max_row - min_row + 1
+                    columns = max_col - min_col + 1
+            sheets.append({"index": index, "name": name, "rows": rows, "columns": columns, "dimension": dimension})
+        self._sheets = sheets
+        return sheets
+
+    def sheet_name(self, sheet: SheetRef = 0) -> str:
+        """工作表序号（从0开始）或名称 -> 名称"""
+        names = self.sheet_names()
+        if isinstance(sheet, str):
+            if sheet not in names:
+                raise KeyError(f"工作表不存在: {sheet}")
+            return sheet
+        if not 0 <= sheet < len(names):
+            raise IndexError(f"工作表序号超出范围: {sheet}（共 {len(names)} 个）")
+        return names[sheet]
+
+    def iter_rows(self, sheet: SheetRef = 0, min_row: int = 1, max_row: Optional[int] = None,
+                  min_col: int = 1, max_col: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """逐行产出单元格值（空单元格为 None），行列号从1开始、包含边界；读到 max_row 即停止
+
+        calamine 引擎的限制：打开工作表时整张表的单元格都会被解析到内存（库本身不支持按区域读取），
+        这里只能用 nrows 让转换为Python对象的行数止于 max_row，列在转换后再截取；
+        大工作表只读一小块区域时，openpyxl 只读流式模式的内存占用更小。
+        """
+        name = self.sheet_name(sheet)
+        book = self._open()
+        col_slice = slice(min_col - 1, max_col)
+
+        if self.engine == "openpyxl":
+            ws = book[name]
+            if max_row is None:
+                # 部分导出工具写入的 <dimension> 不准确（如只有 "A1"），整表读取时以实际单元格为准
+                ws.reset_dimensions()
+            yield from ws.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                                    values_only=True)
+            return
+
+        if self.engine == "xlrd":
+            ws = book.sheet_by_name(name)
+            try:
+                last = ws.nrows if max_row is None else min(max_row, ws.nrows)
+                for r in range(min_row - 1, last):
+                    yield tuple(self._xlrd_value(cell, book.datemode) for cell in ws.row_slice(r, col_slice.start, max_col))
+            finally:
+                book.unload_sheet(name)
+            return
+
+        ws = book.get_sheet_by_name(name)
+        if min_row == 1 and min_col == 1 and max_row is None and hasattr(ws, "iter_rows"):
+            rows = ws.iter_rows()  # 逐行转换为Python对象（从已用区域左上角开始）
+        else:
+            rows = iter(ws.to_python(skip_empty_area=False, nrows=max_row))
+            rows = islice(rows, min_row - 1, None)
+        for row in rows:
+            yield tuple(None if value == "" else value for value in row[col_slice])
+
+    @staticmethod
+    def _xlrd_value(cell, datemode: int) -> Any:
+        if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+            return None
+        if cell.ctype == xlrd.XL_CELL_DATE:
+            try:
+                return xlrd.xldate.xldate_as_datetime(cell.value, datemode)
+            except (ValueError, OverflowError, xlrd.xldate.XLDateError):
+                return cell.value
+        if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+            return bool(cell.value)
+        if cell.ctype == xlrd.XL_CELL_ERROR:
+            return None
+        if cell.ctype == xlrd.XL_CELL_NUMBER and float(cell.value).is_integer():
+            return int(cell.value)
+        return cell.value
+
+    def iter_frames(self, sheet: SheetRef = 0, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        """第一个非空行为表头，逐块产出DataFrame；空行跳过（与 pd.read_excel 一致）
+
+        列数由表头与第一块数据中最后一个非空单元格决定，末尾只有格式、没有内容的列不会成为空列。
+        只有表头的工作表产出一个0行的DataFrame，空工作表不产出。
+        """
+        rows = (row for row in self.iter_rows(sheet) if any(value is not None for value in row))
+        header = next(rows, None)
+        if header is None:
+            return
+        batch = list(islice(rows, chunk_rows))
+        width = max([_last_filled(header)] + [_last_filled(row) for row in batch])
+        columns = _column_names(header, width)
+        while True:
+            yield _frame(batch, columns)
+            batch = list(islice(rows, chunk_rows))
+            if not batch:
+                return
+
+    def read_range(self, cell_range: str, sheet: SheetRef = 0, header: bool = False) -> pd.DataFrame:
+        """读取单元格区域，如 "A1:D20"、"B:C"
+
+        header=False 时列名为列字母、索引为行号（与Excel中看到的一致）；header=True 时区域第一行为列名。
+        使用 calamine 引擎时整张工作表仍会被解析到内存，见 iter_rows。
+        """
+        min_row, min_col, max_row, max_col = parse_range(cell_range)
+        rows = list(self.iter_rows(sheet, min_row, max_row, min_col, max_col))
+        width = max_col - min_col + 1
+        if header:
+            if not rows:
+                return pd.DataFrame(columns=_column_names((), width))
+            return _frame(rows[1:], _column_names(rows[0], width))
+        df = _frame(rows, [column_letter(i) for i in range(min_col, max_col + 1)])
+        df.index = pd.RangeIndex(min_row, min_row + len(df))
+        return df